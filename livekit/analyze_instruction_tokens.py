@@ -0,0 +1,185 @@
+"""
+Token budget report for assistant instructions.
+
+Compiles every assistant in the database the way a call does
+(services/assistant_profile.py and AgentFactory.create_agent) and reports the
+tokens of each instruction section and of the full per-turn instructions,
+flagging assistants over the budget. With --compact it also compiles the
+compacted variant (INSTRUCTION_COMPACTION_ENABLED: repeated rules removed, the
+email protocol only when an email can be collected) and shows the savings.
+
+Field classifications are read from the field_classifications collection when
+available; otherwise the calls' fallback applies (explicit askTiming asked, the
+rest extracted). The workflow is reported as
+the runtime's static part plus its largest state block, or as the flattened
+graph with WORKFLOW_RUNTIME_ENABLED=false. Per-call context is estimated with a
+sample contact.
+
+Tokens are counted with tiktoken for the assistant's model when it is installed
+(pip install tiktoken), else estimated as characters / 4.
+
+Usage:
+    python analyze_instruction_tokens.py [--budget 3000] [--compact] [--assistant-id ID]
+                                         [--file assistants.json] [--json]
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+import datetime
+
+from config.database import DatabaseClient, DatabaseConfig, get_database_client
+from services.assistant_profile import compile_assistant_profile
+from services.field_classification import fields_key, fallback_classification, FIELD_CLASSIFICATIONS_COLLECTION
+from utils.instruction_builder import build_call_context_instructions
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+SECTIONS = ("prompt", "call_mgmt", "analysis", "workflow", "wf_state", "first_msg", "data_coll", "booking", "call_ctx")
+SAMPLE_CALL_CONTEXT = {"campaign_prompt": None, "contact": {"name": "Sample Caller", "email": "caller@example.com"}}
+SAMPLE_NOW = datetime.datetime(2026, 1, 5, 15, 0, tzinfo=datetime.timezone.utc)
+
+
+class TokenCounter:
+    """Counts tokens per model with tiktoken, or estimates them from characters."""
+
+    def __init__(self):
+        self._encoders = {}
+        self.exact = tiktoken is not None
+
+    def _encoder(self, model: str):
+        if model not in self._encoders:
+            encoder = None
+            if tiktoken is not None:
+                try:
+                    encoder = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoder = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    print(f"tiktoken unavailable for {model} ({e}); estimating", file=sys.stderr)
+            self._encoders[model] = encoder
+        return self._encoders[model]
+
+    def count(self, text: str, model: str) -> int:
+        if not text:
+            return 0
+        encoder = self._encoder(model)
+        if encoder is None:
+            return (len(text) + 3) // 4
+        return len(encoder.encode(text))
+
+
+async def load_assistants(args) -> list:
+    """Flattened assistant configs from a JSON export or the database."""
+    if args.file:
+        with open(args.file) as f:
+            docs = json.load(f)
+        docs = docs if isinstance(docs, list) else [docs]
+        flattener = DatabaseClient(DatabaseConfig(url="", db_name="", enabled=False))
+        return [flattener._flatten_assistant(doc) for doc in docs]
+
+    db_client = get_database_client()
+    if not db_client.is_available():
+        sys.exit("MongoDB is not available; set MONGODB_URI or pass --file")
+    query = {}
+    if args.assistant_id:
+        from bson import ObjectId
+        query = {"_id": ObjectId(args.assistant_id)}
+    return [db_client._flatten_assistant(doc) async for doc in db_client.db["assistants"].find(query)]
+
+
+async def load_classification(db_client, structured_data: list) -> dict:
+    """Stored classification of an assistant's fields, or the fallback calls use on a miss."""
+    if db_client is not None and db_client.is_available():
+        doc = await db_client.db[FIELD_CLASSIFICATIONS_COLLECTION].find_one(
+            {"_id": fields_key(structured_data), "status": "done"}, {"classification": 1}
+        )
+        if doc and doc.get("classification"):
+            return doc["classification"]
+    return fallback_classification(structured_data)
+
+
+def analyze(config: dict, compact: bool, classification: dict, counter: TokenCounter) -> dict:
+    """Tokens per section and per-turn total of one compiled assistant."""
+    profile = compile_assistant_profile(config, compact=compact)
+    template = profile.instruction_template
+    model = profile.llm_model
+    calendar_available = bool(config.get("cal_api_key") and config.get("cal_event_type_id"))
+
+    analysis = template.analysis_instructions(classification) if template.structured_data else ""
+    call_blocks = build_call_context_instructions({**config, "call_context": SAMPLE_CALL_CONTEXT}, SAMPLE_NOW)
+    instructions = template.render(analysis, calendar_available, call_blocks)
+
+    state_block = ""
+    if profile.workflow is not None:
+        # The largest state is the worst turn
+        blocks = [profile.workflow.state_instructions(state_id) for state_id in profile.workflow.states]
+        state_block = max(blocks, key=len, default="")
+        instructions += "\n\n" + state_block
+
+    texts = {
+        "prompt": config.get("prompt", ""),
+        "call_mgmt": profile.call_management_instructions,
+        "analysis": analysis,
+        "workflow": profile.workflow_instructions,
+        "wf_state": state_block,
+        "first_msg": profile.first_message_instructions,
+        "data_coll": profile.data_collection_instructions,
+        "booking": profile.booking_instructions if calendar_available else profile.booking_unavailable_instructions,
+        "call_ctx": "\n\n".join(block for block in call_blocks if block),
+    }
+    sections = {name: counter.count(texts[name], model) for name in SECTIONS}
+    return {"model": model, "sections": sections, "total": counter.count(instructions, model)}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=int, default=3000, help="Per-turn instruction token budget")
+    parser.add_argument("--compact", action="store_true", help="Also report the compacted instructions")
+    parser.add_argument("--assistant-id", help="Only this assistant")
+    parser.add_argument("--file", help="JSON export of assistant documents instead of the database")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    counter = TokenCounter()
+    db_client = None if args.file else get_database_client()
+    rows = []
+    for config in await load_assistants(args):
+        structured_data = (config.get("analysisSettings") or {}).get("structuredData") or []
+        classification = await load_classification(db_client, structured_data) if structured_data else fallback_classification([])
+        row = {"id": config.get("id"), "name": config.get("name", ""), **analyze(config, False, classification, counter)}
+        if args.compact:
+            row["compact"] = analyze(config, True, classification, counter)
+        row["over_budget"] = row["total"] > args.budget
+        rows.append(row)
+
+    rows.sort(key=lambda row: row["total"], reverse=True)
+    if args.json:
+        print(json.dumps({"budget": args.budget, "exact_tokens": counter.exact, "assistants": rows}, indent=2))
+    else:
+        header = f"{'assistant':<28} " + " ".join(f"{name:>9}" for name in SECTIONS) + f" {'total':>7}"
+        if args.compact:
+            header += f" {'compact':>8} {'saved':>6}"
+        print(header)
+        for row in rows:
+            line = f"{(row['name'] or row['id'])[:28]:<28} " + " ".join(f"{row['sections'][name]:>9}" for name in SECTIONS) + f" {row['total']:>7}"
+            if args.compact:
+                compact_total = row["compact"]["total"]
+                line += f" {compact_total:>8} {1 - compact_total / max(1, row['total']):>6.1%}"
+            if row["over_budget"]:
+                line += "  OVER BUDGET"
+            print(line)
+        over = sum(row["over_budget"] for row in rows)
+        method = "tiktoken" if counter.exact else "estimated as characters / 4"
+        print(f"\n{len(rows)} assistants | budget {args.budget} tokens | over budget: {over} | tokens {method}")
+
+    if any(row["over_budget"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
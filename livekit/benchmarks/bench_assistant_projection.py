@@ -0,0 +1,133 @@
+"""
+Benchmark: full assistant fetch vs projected critical-path fetch on large workflow assistants.
+
+Seeds a scratch database on a local mongod with assistants carrying large workflows,
+email templates and documents, then reports the BSON payload size and client-side
+decode + flatten time of DatabaseClient.fetch_assistant vs fetch_assistant_core.
+
+Usage:
+    python benchmarks/bench_assistant_projection.py [--uri mongodb://localhost:27017] [--nodes 300] [--rounds 200]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from config.database import DatabaseClient, DatabaseConfig, _assistant_core_pipeline
+
+BENCH_DB = "bench_assistant_projection"
+
+
+def build_assistant(nodes: int) -> dict:
+    workflow_nodes = [{
+        "id": f"node_{i}",
+        "type": "conversation",
+        "position": {"x": i * 120, "y": (i % 7) * 80},
+        "data": {
+            "label": f"Step {i}",
+            "prompt": f"In step {i}, ask the caller about their requirements and confirm details. " * 6,
+            "variables": [{"name": f"var_{i}_{j}", "description": "Extracted value " * 4} for j in range(4)],
+        },
+    } for i in range(nodes)]
+    edges = [{
+        "id": f"edge_{i}",
+        "source": f"node_{i}",
+        "target": f"node_{i + 1}",
+        "data": {"condition": f"The caller has answered step {i}"},
+    } for i in range(nodes - 1)]
+
+    return {
+        "_id": ObjectId(),
+        "name": "Bench Workflow Assistant",
+        "modelSettings": {"systemPrompt": "You are a helpful receptionist. " * 60, "model": "gpt-4o-mini"},
+        "voiceSettings": {"provider": "OpenAI", "voice": "alloy"},
+        "analysisSettings": {
+            "structuredData": [{"name": f"field_{j}", "type": "string", "description": "A field " * 5} for j in range(10)],
+            "summaryPrompt": "Summarize the call in detail. " * 80,
+            "successEvaluationPrompt": "Evaluate whether the call succeeded. " * 80,
+            "structuredDataPrompt": "Extract the structured data. " * 80,
+        },
+        "email_templates": {"post_call": {"subject": "Thanks for calling", "body": "<p>Thanks for your call.</p>" * 300}},
+        "assigned_documents": [{"name": f"doc_{i}.pdf", "url": f"https://example.com/docs/{i}.pdf", "size": 1024 * i} for i in range(50)],
+        "nodes": workflow_nodes,
+        "edges": edges,
+    }
+
+
+async def measure(label: str, fetch_raw, flatten, rounds: int) -> dict:
+    sizes, fetch_ms, decode_ms = [], [], []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        raw = await fetch_raw()
+        fetched = time.perf_counter()
+        flatten(bson.decode(raw.raw))
+        done = time.perf_counter()
+
+        sizes.append(len(raw.raw))
+        fetch_ms.append((fetched - start) * 1000)
+        decode_ms.append((done - fetched) * 1000)
+
+    fetch_ms.sort()
+    return {
+        "label": label,
+        "bytes": statistics.mean(sizes),
+        "fetch_p50_ms": fetch_ms[len(fetch_ms) // 2],
+        "fetch_p95_ms": fetch_ms[int(len(fetch_ms) * 0.95) - 1],
+        "decode_mean_ms": statistics.mean(decode_ms),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uri", default=os.getenv("MONGO_BENCH_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--nodes", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    client = DatabaseClient(DatabaseConfig(url=args.uri, db_name=BENCH_DB))
+    db = client.client[BENCH_DB]
+    client._db = db
+
+    assistant = build_assistant(args.nodes)
+    await db["assistants"].drop()
+    await db["assistants"].insert_one(assistant)
+    print(f"Seeded one assistant with {args.nodes} workflow nodes into {args.uri}/{BENCH_DB}")
+
+    raw_assistants = db.get_collection("assistants", codec_options=CodecOptions(document_class=RawBSONDocument))
+
+    async def fetch_full():
+        return await raw_assistants.find_one({"_id": assistant["_id"]})
+
+    async def fetch_core():
+        docs = await raw_assistants.aggregate(_assistant_core_pipeline(assistant["_id"])).to_list(length=1)
+        return docs[0]
+
+    # Warm the pool so neither path pays for connection setup
+    await fetch_full()
+    await fetch_core()
+
+    results = [
+        await measure("full", fetch_full, client._flatten_assistant, args.rounds),
+        await measure("core", fetch_core, lambda doc: client._flatten_assistant(doc, sections_loaded=False), args.rounds),
+    ]
+
+    print(f"{'fetch':<6} {'bytes':>10} {'fetch_p50_ms':>13} {'fetch_p95_ms':>13} {'decode_ms':>10}")
+    for r in results:
+        print(f"{r['label']:<6} {r['bytes']:>10.0f} {r['fetch_p50_ms']:>13.3f} "
+              f"{r['fetch_p95_ms']:>13.3f} {r['decode_mean_ms']:>10.3f}")
+
+    await client.client.drop_database(BENCH_DB)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+Replay check: static vs adaptive endpointing delays on recorded or synthetic turns.
+
+Each turn is a user utterance made of speech segments separated by pauses, plus
+the STT's transcription delay and whether the caller produced a false
+interruption during the reply. A turn is committed once the silence after a
+segment reaches max(min_endpointing_delay, transcription_delay); a pause inside
+the utterance that reaches it commits too early and counts as a cut-off (the
+rest of the utterance becomes the next turn). The replay is fed through
+services/endpointing.py exactly like live calls are, and compares mean response
+latency and cut-off rate with the configured (static) delays. Exits non-zero if
+the adaptive delays are not faster or raise the cut-off rate beyond the
+controller's tolerance.
+
+Trace files are JSONL, one turn per line:
+    {"pauses": [0.21, 0.35], "transcription_delay": 0.18, "false_interruption": false}
+
+Usage:
+    python benchmarks/bench_endpointing_replay.py [--trace turns.jsonl] [--turns 2000] [--seed 7]
+                                                  [--min-delay 0.4] [--max-delay 0.8]
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.endpointing import EndpointingConfig, EndpointingController
+
+ASSISTANT_ID = "bench-assistant"
+
+
+def synthetic_trace(turns: int, seed: int) -> list:
+    """Turns with a realistic spread of mid-utterance pauses (mostly short, a long tail)."""
+    rng = random.Random(seed)
+    trace = []
+    for _ in range(turns):
+        pauses = [round(rng.lognormvariate(-1.7, 0.55), 3) for _ in range(rng.choice((0, 0, 1, 1, 2, 3)))]
+        trace.append({
+            "pauses": pauses,
+            "transcription_delay": round(rng.uniform(0.08, 0.3), 3),
+            "false_interruption": rng.random() < 0.03,
+        })
+    return trace
+
+
+def load_trace(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(trace: list, controller: EndpointingController, config: dict) -> dict:
+    """Run the trace through the controller; returns latency and cut-off stats."""
+    latencies = []
+    cutoffs = 0
+    commits = 0
+    false_interruptions = 0
+    min_delays = []
+
+    for turn in trace:
+        min_delay, _ = controller.delays(config)
+        min_delays.append(min_delay)
+        threshold = max(min_delay, turn["transcription_delay"])
+
+        for pause in turn.get("pauses", []):
+            if pause >= threshold:
+                # Committed mid-utterance; the caller keeps talking right after
+                commits += 1
+                cutoffs += 1
+                controller.record_turn(config, threshold, turn["transcription_delay"])
+                controller.record_cutoff(config)
+
+        commits += 1
+        latencies.append(threshold)
+        controller.record_turn(config, threshold, turn["transcription_delay"])
+        if turn.get("false_interruption"):
+            false_interruptions += 1
+            controller.record_false_interruption(config)
+
+    return {
+        "turns": len(trace),
+        "commits": commits,
+        "mean_latency_ms": statistics.mean(latencies) * 1000,
+        "p90_latency_ms": sorted(latencies)[int(0.9 * len(latencies))] * 1000,
+        "cutoff_rate": cutoffs / commits,
+        "false_interruption_rate": false_interruptions / len(trace),
+        "final_min_delay": min_delays[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trace", help="JSONL trace of recorded turns (synthetic if omitted)")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--min-delay", type=float, default=0.4)
+    parser.add_argument("--max-delay", type=float, default=0.8)
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace) if args.trace else synthetic_trace(args.turns, args.seed)
+    assistant_config = {
+        "id": ASSISTANT_ID,
+        "voice_on_punctuation_seconds": args.min_delay,
+        "voice_on_no_punctuation_seconds": args.max_delay,
+    }
+
+    endpointing_config = EndpointingConfig.from_env()
+    static = replay(trace, EndpointingController(config=EndpointingConfig(enabled=False)), assistant_config)
+    adaptive = replay(trace, EndpointingController(config=endpointing_config), assistant_config)
+
+    print(f"{'mode':<10} {'mean_ms':>9} {'p90_ms':>9} {'cutoff_rate':>12} {'false_int':>10} {'min_delay':>10}")
+    for label, result in (("static", static), ("adaptive", adaptive)):
+        print(
+            f"{label:<10} {result['mean_latency_ms']:>9.1f} {result['p90_latency_ms']:>9.1f} "
+            f"{result['cutoff_rate']:>12.4f} {result['false_interruption_rate']:>10.4f} {result['final_min_delay']:>10.3f}"
+        )
+
+    saved = static["mean_latency_ms"] - adaptive["mean_latency_ms"]
+    print(f"\n{len(trace)} turns | mean latency saved: {saved:.1f} ms | cut-off rate change: {adaptive['cutoff_rate'] - static['cutoff_rate']:+.4f}")
+
+    ok = True
+    if saved <= 0:
+        print("FAIL: adaptive endpointing is not faster than the static delays")
+        ok = False
+    if adaptive["cutoff_rate"] > static["cutoff_rate"] + endpointing_config.tolerance:
+        print(f"FAIL: cut-off rate rose beyond the tolerance ({endpointing_config.tolerance})")
+        ok = False
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Import-time budget check for the worker module.
+
+Imports main.py in a fresh interpreter under 'python -X importtime', reports the
+modules with the largest cumulative import time and exits non-zero if importing
+main takes longer than the budget, or if a module that should be loaded lazily
+(provider plugins, OpenAI SDK, httpx, motor) is imported at startup.
+
+Usage:
+    python benchmarks/bench_import_time.py [--budget-ms 1500] [--runs 3] [--top 15]
+"""
+
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+
+WORKER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use through services/provider_registry.py or local imports
+DEFERRED_MODULES = (
+    "livekit.plugins.openai",
+    "livekit.plugins.silero",
+    "livekit.plugins.deepgram",
+    "livekit.plugins.cartesia",
+    "livekit.plugins.groq",
+    "openai",
+    "httpx",
+    "motor",
+)
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure(module: str) -> dict:
+    """Import a module in a fresh interpreter; returns {name: cumulative_us}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=WORKER_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"'import {module}' failed:\n{tail}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return cumulative
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(run.get(args.module, 0) for run in runs) / 1000
+
+    last = runs[-1]
+    print(f"{'module':<50} {'cumulative_ms':>14}")
+    for name, us in sorted(last.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<50} {us / 1000:>14.1f}")
+    print(f"\nimport {args.module}: {total_ms:.1f} ms (median of {args.runs}, budget {args.budget_ms:.0f} ms)")
+
+    eager = sorted(
+        name for name in last
+        if any(name == deferred or name.startswith(deferred + ".") for deferred in DEFERRED_MODULES)
+    )
+
+    ok = True
+    if eager:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(eager)}")
+        ok = False
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time over budget by {total_ms - args.budget_ms:.1f} ms")
+        ok = False
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Concurrency check: hundreds of simultaneous minute deductions against a local mongod.
+
+Seeds users in a scratch database and fires concurrent deductions through the old
+read-modify-write path, the atomic $inc path and the coalescing MinutesLedger.
+Reports lost updates, wall time and round trips; exits non-zero if the atomic
+paths lose any update.
+
+Usage:
+    python benchmarks/bench_minutes_ledger.py [--uri mongodb://localhost:27017] [--deductions 500] [--users 5]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo import monitoring
+
+from config.database import DatabaseClient, DatabaseConfig, minutes_to_deduct
+from integrations.minutes_ledger import MinutesLedger
+
+BENCH_DB = "bench_minutes_ledger"
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server (one per round trip)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in ("find", "update", "findAndModify"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def legacy_deduct(client: DatabaseClient, user_id: str, minutes: float) -> None:
+    """The previous find_one + $set implementation, kept here for comparison."""
+    users = client.db["users"]
+    user = await users.find_one({"_id": ObjectId(user_id)})
+    new_used = (user.get("minutes_used", 0) or 0) + minutes_to_deduct(minutes)
+    await users.update_one({"_id": ObjectId(user_id)}, {"$set": {"minutes_used": new_used}})
+
+
+async def run(label: str, deduct, client: DatabaseClient, user_ids: list, durations: list, counter: CommandCounter) -> bool:
+    await client.db["users"].update_many({}, {"$set": {"minutes_used": 0}})
+    counter.count = 0
+
+    start = time.perf_counter()
+    await asyncio.gather(*(deduct(user_id, minutes) for user_id, minutes in durations))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    expected = {user_id: 0 for user_id in user_ids}
+    for user_id, minutes in durations:
+        expected[user_id] += minutes_to_deduct(minutes)
+
+    lost = 0
+    async for user in client.db["users"].find({}, {"minutes_used": 1}):
+        lost += expected[str(user["_id"])] - user["minutes_used"]
+
+    print(f"{label:<10} {len(durations):>11} {lost:>13} {elapsed_ms:>9.1f} {counter.count:>12}")
+    return lost == 0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uri", default=os.getenv("MONGO_BENCH_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--deductions", type=int, default=500)
+    parser.add_argument("--users", type=int, default=5)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    client = DatabaseClient(DatabaseConfig(url=args.uri, db_name=BENCH_DB, max_pool_size=100))
+    client._db = client.client[BENCH_DB]
+
+    await client.db["users"].drop()
+    result = await client.db["users"].insert_many([
+        {"email": f"bench{i}@example.com", "minutes_used": 0, "minutes_limit": 10_000_000, "is_active": True}
+        for i in range(args.users)
+    ])
+    user_ids = [str(oid) for oid in result.inserted_ids]
+
+    # A few hot tenants, call durations between 10 seconds and 20 minutes
+    rng = random.Random(42)
+    durations = [(rng.choice(user_ids), rng.uniform(0.15, 20.0)) for _ in range(args.deductions)]
+
+    ledger = MinutesLedger(client, window_seconds=0.05)
+
+    print(f"{'path':<10} {'deductions':>11} {'lost_minutes':>13} {'wall_ms':>9} {'round_trips':>12}")
+    await run("legacy", lambda u, m: legacy_deduct(client, u, m), client, user_ids, durations, counter)
+    ok = await run("atomic", client.deduct_minutes, client, user_ids, durations, counter)
+    ok = await run("ledger", ledger.deduct, client, user_ids, durations, counter) and ok
+
+    await client.client.drop_database(BENCH_DB)
+    if not ok:
+        print("FAIL: atomic deductions lost updates")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
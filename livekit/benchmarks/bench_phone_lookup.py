@@ -0,0 +1,137 @@
+"""
+Benchmark: DID -> assistant resolution, sequential find_one chain vs single $lookup aggregation.
+
+Seeds a scratch database on a local mongod, then resolves every number through both
+DatabaseClient paths and reports latency percentiles and server round trips per lookup.
+
+Usage:
+    python benchmarks/bench_phone_lookup.py [--uri mongodb://localhost:27017] [--numbers 500] [--rounds 5]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo import monitoring
+
+from config.database import DatabaseClient, DatabaseConfig
+
+BENCH_DB = "bench_phone_lookup"
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server (one per round trip)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in ("find", "aggregate", "getMore"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def seed(db, numbers: int) -> list:
+    await db["assistants"].drop()
+    await db["phonenumbers"].drop()
+    await db["phone_numbers"].drop()
+
+    assistants = []
+    for i in range(numbers):
+        assistants.append({
+            "_id": ObjectId(),
+            "name": f"Bench Assistant {i}",
+            "modelSettings": {"systemPrompt": "You are a helpful assistant. " * 40, "model": "gpt-4o-mini"},
+            "voiceSettings": {"provider": "OpenAI", "voice": "alloy"},
+            "analysisSettings": {"structuredData": [{"name": f"field_{j}", "type": "string"} for j in range(10)]},
+        })
+    await db["assistants"].insert_many(assistants)
+
+    # Half the numbers live in the legacy 'phone_numbers' collection, which forces
+    # the sequential path into its worst case of three round trips
+    phone_docs, legacy_docs, lookups = [], [], []
+    for i, assistant in enumerate(assistants):
+        number = f"+1555{i:07d}"
+        lookups.append(number)
+        doc = {"number": number, "inboundAssistantId": assistant["_id"]}
+        if i % 2:
+            legacy_docs.append({**doc, "inboundAssistantId": str(assistant["_id"])})
+        else:
+            phone_docs.append(doc)
+    await db["phonenumbers"].insert_many(phone_docs)
+    await db["phonenumbers"].create_index("number", unique=True)
+    await db["phone_numbers"].insert_many(legacy_docs)
+    await db["phone_numbers"].create_index("number", unique=True)
+    return lookups
+
+
+async def run_path(label: str, resolve, lookups: list, rounds: int, counter: CommandCounter) -> dict:
+    durations = []
+    counter.count = 0
+    for _ in range(rounds):
+        for number in lookups:
+            start = time.perf_counter()
+            config = await resolve(number)
+            durations.append((time.perf_counter() - start) * 1000)
+            if not config:
+                raise RuntimeError(f"{label}: lookup failed for {number}")
+
+    durations.sort()
+    total = len(durations)
+    return {
+        "label": label,
+        "lookups": total,
+        "mean_ms": statistics.mean(durations),
+        "p50_ms": durations[total // 2],
+        "p95_ms": durations[int(total * 0.95) - 1],
+        "round_trips_per_lookup": counter.count / total,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uri", default=os.getenv("MONGO_BENCH_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--numbers", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    client = DatabaseClient(DatabaseConfig(url=args.uri, db_name=BENCH_DB))
+    db = client.client[BENCH_DB]
+    client._db = db
+
+    print(f"Seeding {args.numbers} numbers into {args.uri}/{BENCH_DB}")
+    lookups = await seed(db, args.numbers)
+
+    # Warm the pool so neither path pays for connection setup
+    await client._fetch_assistant_by_phone_sequential(lookups[0])
+    await client.fetch_assistant_by_phone(lookups[0])
+
+    results = [
+        await run_path("sequential", client._fetch_assistant_by_phone_sequential, lookups, args.rounds, counter),
+        await run_path("aggregation", client.fetch_assistant_by_phone, lookups, args.rounds, counter),
+    ]
+
+    print(f"{'path':<12} {'lookups':>8} {'mean_ms':>9} {'p50_ms':>8} {'p95_ms':>8} {'round_trips':>12}")
+    for r in results:
+        print(f"{r['label']:<12} {r['lookups']:>8} {r['mean_ms']:>9.3f} {r['p50_ms']:>8.3f} "
+              f"{r['p95_ms']:>8.3f} {r['round_trips_per_lookup']:>12.2f}")
+
+    await client.client.drop_database(BENCH_DB)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,181 @@
+"""
+Prompt prefix stability check and TTFT comparison against a prefix-caching stub.
+
+Builds the instructions of a sample assistant for a series of calls with
+different callers, campaigns and times, once with the assembled layout
+(utils/instruction_builder.assemble_instructions: static per-assistant prefix,
+per-call context last) and once with the previous layout (caller context
+prepended, time before the static blocks). Exits non-zero if the static prefix
+is not byte-identical across calls, or if the assembled layout is not faster on
+the stub.
+
+The stub models provider prompt caching the way OpenAI documents it: prompts of
+at least 1024 tokens reuse the longest previously seen prefix in 128-token
+steps, and time to first token grows with the uncached tokens. Tokens are
+estimated as characters / 4.
+
+Usage:
+    python benchmarks/bench_prompt_prefix.py [--calls 50] [--base-ms 150] [--per-token-us 40]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import datetime
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.instruction_builder import (
+    assemble_instructions,
+    build_call_context_instructions,
+    build_call_management_instructions,
+    build_collection_requirements,
+    build_time_context,
+    build_first_message_instructions,
+    build_workflow_instructions,
+    CALL_CONTEXT_HEADER,
+    DATA_COLLECTION_TOOLS_INSTRUCTIONS,
+    EMAIL_COLLECTION_PROTOCOL,
+    BOOKING_INSTRUCTIONS,
+)
+
+MIN_CACHED_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+
+class PrefixCachingStub:
+    """In-process LLM stub whose TTFT depends on how much of the prompt is cached."""
+
+    def __init__(self, base_ms: float, per_token_us: float):
+        self.base_ms = base_ms
+        self.per_token_us = per_token_us
+        self._seen = set()
+
+    async def first_token(self, prompt: str) -> float:
+        tokens = len(prompt) // 4
+        cached = 0
+        if tokens >= MIN_CACHED_TOKENS:
+            for end in range(CACHE_STEP_TOKENS, tokens + 1, CACHE_STEP_TOKENS):
+                digest = hashlib.sha256(prompt[:end * 4].encode("utf-8")).digest()
+                if digest in self._seen:
+                    cached = end
+                self._seen.add(digest)
+
+        start = time.perf_counter()
+        await asyncio.sleep((self.base_ms + (tokens - cached) * self.per_token_us / 1000) / 1000)
+        return (time.perf_counter() - start) * 1000
+
+
+def sample_assistant() -> dict:
+    prompt = (
+        "You are Ava, the front desk assistant of Bright Smile Dental. "
+        + " ".join(
+            f"Policy {i}: answer questions about {topic} clearly, briefly and politely, and offer to book a visit when it helps."
+            for i, topic in enumerate(["cleanings", "whitening", "implants", "insurance", "payment plans", "emergencies"] * 6)
+        )
+    )
+    return {
+        "id": "bench",
+        "prompt": prompt,
+        "first_message": "Hi, this is Ava from Bright Smile Dental. How can I help you today?",
+        "end_call_message": "Thanks for calling Bright Smile Dental. Goodbye!",
+        "idle_messages": ["Are you still there?", "I'm still here if you need anything."],
+        "max_call_duration": 10,
+        "cal_api_key": "cal_live_x",
+        "cal_event_type_id": "123",
+        "cal_timezone": "America/New_York",
+        "dataCollectionSettings": {"collectName": True, "collectEmail": True},
+        "nodes": [
+            {"id": "start", "type": "start", "data": {"title": "Greeting", "input_prompt": "Greet the caller and ask how you can help."}},
+            {"id": "book", "type": "task", "data": {"title": "Booking", "input_prompt": "Collect the preferred day and time and book it."}},
+        ],
+        "edges": [{"source": "start", "target": "book", "data": {"condition": "caller wants an appointment"}}],
+    }
+
+
+def static_blocks(config: dict) -> list:
+    """Per-assistant blocks in the order AgentFactory.create_agent uses."""
+    return [
+        config["prompt"],
+        build_call_management_instructions(config),
+        "DATA COLLECTION FIELDS:\n- budget: monthly budget (type: string)",
+        build_workflow_instructions(config),
+        build_first_message_instructions(config),
+        DATA_COLLECTION_TOOLS_INSTRUCTIONS + "\n\n" + EMAIL_COLLECTION_PROTOCOL,
+        BOOKING_INSTRUCTIONS,
+    ]
+
+
+def call_config(base: dict, rng: random.Random, call: int) -> tuple:
+    config = dict(base)
+    config["call_context"] = {
+        "campaign_prompt": "Mention the spring whitening offer." if call % 2 else None,
+        "contact": {"name": f"Caller {call}", "email": f"caller{call}@example.com"},
+    }
+    now = datetime.datetime(2026, 3, 1, 9, 0, tzinfo=datetime.timezone.utc) + datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+    return config, now
+
+
+def assembled_layout(config: dict, now: datetime.datetime) -> str:
+    return assemble_instructions(static_blocks(config), build_call_context_instructions(config, now))
+
+
+def legacy_layout(config: dict, now: datetime.datetime) -> str:
+    """The layout before the assembler: caller first, time and campaign ahead of the static blocks."""
+    call_context = config["call_context"]
+    contact = call_context["contact"]
+    prompt = config["prompt"]
+    if call_context.get("campaign_prompt"):
+        prompt += f"\n\nCAMPAIGN INSTRUCTIONS:\n{call_context['campaign_prompt']}"
+    prompt = f"CONTEXT: You are calling {contact['name']}. Their email is {contact['email']}.\n\n{prompt}"
+    prompt += "\n\n" + build_collection_requirements(config)
+    prompt += "\n\nCONTEXT:\n" + build_time_context(config, now)
+    blocks = static_blocks(config)
+    return prompt + "\n\n" + "\n\n".join(block for block in blocks[1:] if block)
+
+
+async def run(layout, configs, stub: PrefixCachingStub) -> list:
+    return [await stub.first_token(layout(config, now)) for config, now in configs]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--base-ms", type=float, default=150.0)
+    parser.add_argument("--per-token-us", type=float, default=40.0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = sample_assistant()
+    configs = [call_config(base, rng, call) for call in range(args.calls)]
+
+    prefixes = {layout.split("\n\n" + CALL_CONTEXT_HEADER)[0] for layout in (assembled_layout(c, n) for c, n in configs)}
+    prefix = next(iter(prefixes))
+    print(f"static prefix: {len(prefix)} chars (~{len(prefix) // 4} tokens) | distinct prefixes over {args.calls} calls: {len(prefixes)}")
+
+    assembled = asyncio.run(run(assembled_layout, configs, PrefixCachingStub(args.base_ms, args.per_token_us)))
+    legacy = asyncio.run(run(legacy_layout, configs, PrefixCachingStub(args.base_ms, args.per_token_us)))
+
+    print(f"{'layout':<10} {'first_ms':>9} {'p50_ms':>8} {'mean_ms':>8}")
+    for label, ttfts in (("legacy", legacy), ("assembled", assembled)):
+        print(f"{label:<10} {ttfts[0]:>9.1f} {statistics.median(ttfts):>8.1f} {statistics.mean(ttfts):>8.1f}")
+
+    ok = True
+    if len(prefixes) != 1:
+        print("FAIL: the static prefix differs between calls")
+        ok = False
+    if statistics.median(assembled[1:]) >= statistics.median(legacy[1:]):
+        print("FAIL: the assembled layout is not faster on the prefix-caching stub")
+        ok = False
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
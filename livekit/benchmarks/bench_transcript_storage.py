@@ -0,0 +1,118 @@
+"""
+Benchmark: inline vs compressed, chunked transcript storage in the 'calls' collection.
+
+Seeds a scratch database on a local mongod with calls of increasing length stored
+both ways, then reports call document size, stored transcript size, dashboard-style
+list query latency and full transcript read latency.
+
+Usage:
+    python benchmarks/bench_transcript_storage.py [--uri mongodb://localhost:27017] [--calls 200] [--rounds 20]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+
+from config.database import DatabaseClient, DatabaseConfig, TRANSCRIPT_CHUNKS_KEY
+from utils.transcript_codec import TRANSCRIPT_CHUNKS_COLLECTION
+
+BENCH_DB = "bench_transcript_storage"
+WORDS = ("appointment", "tomorrow", "available", "confirm", "email", "address", "thank", "you",
+         "please", "schedule", "morning", "afternoon", "booking", "price", "service", "help")
+
+
+def make_transcript(rng: random.Random, turns: int) -> list:
+    return [{
+        "role": "assistant" if i % 2 == 0 else "user",
+        "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 60))),
+    } for i in range(turns)]
+
+
+def make_client(uri: str, storage: str) -> DatabaseClient:
+    client = DatabaseClient(DatabaseConfig(url=uri, db_name=BENCH_DB, transcript_storage=storage))
+    client._db = client.client[BENCH_DB]
+    return client
+
+
+async def seed(client: DatabaseClient, transcripts: list) -> dict:
+    await client.db["calls"].drop()
+    await client.db[TRANSCRIPT_CHUNKS_COLLECTION].drop()
+
+    docs = []
+    for i, transcript in enumerate(transcripts):
+        docs.append(client.build_call_document(
+            call_id=f"bench-call-{i}", assistant_id="bench", called_did="+15550000000",
+            call_duration=len(transcript) * 6, call_status="Completed", transcription=transcript,
+        ))
+
+    call_bytes = sum(len(bson.encode({k: v for k, v in d.items() if k != TRANSCRIPT_CHUNKS_KEY})) for d in docs)
+    chunk_bytes = sum(len(bson.encode(c)) for d in docs for c in d.get(TRANSCRIPT_CHUNKS_KEY, []))
+    await client.insert_call_documents(docs)
+    return {"call_bytes": call_bytes / len(docs), "chunk_bytes": chunk_bytes / len(docs)}
+
+
+async def timed(fn, rounds: int) -> float:
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+async def bench(label: str, client: DatabaseClient, transcripts: list, rounds: int) -> dict:
+    sizes = await seed(client, transcripts)
+
+    async def list_recent():
+        # Like the dashboard list: newest 50 calls, whole documents
+        await client.db["calls"].find().sort("_id", -1).limit(50).to_list(length=50)
+
+    longest_id = f"bench-call-{len(transcripts) - 1}"
+
+    async def read_longest():
+        call = await client.db["calls"].find_one({"call_id": longest_id})
+        items = await client.fetch_call_transcript(call)
+        assert len(items) == len(transcripts[-1])
+
+    return {
+        "label": label,
+        **sizes,
+        "list_ms": await timed(list_recent, rounds),
+        "read_ms": await timed(read_longest, rounds),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uri", default=os.getenv("MONGO_BENCH_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    # From short calls up to ~1500 turns (a very long call)
+    transcripts = [make_transcript(rng, 10 + (1500 * i) // max(args.calls - 1, 1)) for i in range(args.calls)]
+
+    results = [
+        await bench("inline", make_client(args.uri, "inline"), transcripts, args.rounds),
+        await bench("chunked", make_client(args.uri, "chunked"), transcripts, args.rounds),
+    ]
+
+    print(f"{'storage':<8} {'call_doc_bytes':>15} {'chunk_bytes':>12} {'list50_ms':>10} {'read_longest_ms':>16}")
+    for r in results:
+        print(f"{r['label']:<8} {r['call_bytes']:>15.0f} {r['chunk_bytes']:>12.0f} "
+              f"{r['list_ms']:>10.2f} {r['read_ms']:>16.2f}")
+
+    await make_client(args.uri, "inline").client.drop_database(BENCH_DB)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+Per-turn workflow prompt size: flattened graph vs state machine runtime.
+
+Generates workflows of increasing size (a chain of task/question states with a
+side branch per state and an end state) and walks a call through each of them.
+For every turn it measures the workflow part of the instructions, once as
+build_workflow_instructions() renders it (whole graph, every turn) and once as
+services/workflow_runtime.py does (static runtime description plus the current
+state's block). Tokens are estimated as characters / 4. Exits non-zero if the
+runtime's per-turn size grows with the graph or every walked transition is not
+accepted.
+
+Usage:
+    python benchmarks/bench_workflow_tokens.py [--sizes 5,20,50,100] [--seed 7]
+"""
+
+import os
+import sys
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.instruction_builder import build_workflow_instructions
+from services.workflow_runtime import compile_workflow, WorkflowRuntime, WORKFLOW_RUNTIME_INSTRUCTIONS
+
+TOPICS = ["billing", "scheduling", "insurance", "directions", "pricing", "cancellations", "refunds", "warranty"]
+
+
+def sample_workflow(size: int, rng: random.Random) -> dict:
+    """A main path of `size` states, each with an off-path branch back to it, and an end state."""
+    nodes = [{"id": "start", "type": "start", "data": {
+        "title": "Greeting",
+        "input_prompt": "Greet the caller warmly and ask how you can help today.",
+        "first_dialogue": "Hi, thanks for calling. How can I help?",
+    }}]
+    edges = []
+    previous = "start"
+    for i in range(1, size):
+        topic = rng.choice(TOPICS)
+        if i % 3 == 0:
+            node = {"id": f"q{i}", "type": "question", "data": {
+                "title": f"Ask about {topic}",
+                "question": f"What would you like to know about {topic}?",
+                "fieldName": f"{topic}_{i}",
+            }}
+        else:
+            node = {"id": f"t{i}", "type": "task", "data": {
+                "title": f"Handle {topic}",
+                "input_prompt": f"Answer the caller's questions about {topic} using the policy, and summarise the next steps clearly.",
+            }}
+        nodes.append(node)
+        edges.append({"source": previous, "target": node["id"], "data": {"description": f"the caller is done with the previous step and asks about {topic}"}})
+        edges.append({"source": node["id"], "target": "start", "data": {"description": "the caller wants to start over"}})
+        previous = node["id"]
+    nodes.append({"id": "end", "type": "end", "data": {"title": "Goodbye", "input_prompt": "Thank the caller and say goodbye."}})
+    edges.append({"source": previous, "target": "end", "label": "the caller has no further questions"})
+    return {"nodes": nodes, "edges": edges}
+
+
+def walk(config: dict) -> tuple:
+    """Per-turn (flattened, runtime) workflow sizes along the main path, and rejected transitions."""
+    flattened = build_workflow_instructions(config)
+    runtime = WorkflowRuntime(compile_workflow(config))
+    flat_sizes, runtime_sizes, rejected = [], [], 0
+
+    while True:
+        flat_sizes.append(len(flattened))
+        runtime_sizes.append(len(runtime.instructions(WORKFLOW_RUNTIME_INSTRUCTIONS)))
+        forward = [t for t in runtime.current.transitions if t.to != "start"]
+        if not forward:
+            break
+        changed, _ = runtime.transition(forward[0].to)
+        rejected += not changed
+    return flat_sizes, runtime_sizes, rejected
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="5,20,50,100")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    runtime_means = []
+    rejected_total = 0
+
+    print(f"{'states':>6} {'turns':>6} {'flat_tokens':>12} {'runtime_tokens':>15} {'runtime_max':>12} {'saved':>7}")
+    for size in sizes:
+        flat, runtime, rejected = walk(sample_workflow(size, rng))
+        rejected_total += rejected
+        flat_mean = statistics.mean(flat) / 4
+        runtime_mean = statistics.mean(runtime) / 4
+        runtime_means.append(runtime_mean)
+        print(f"{size + 1:>6} {len(flat):>6} {flat_mean:>12.0f} {runtime_mean:>15.0f} {max(runtime) / 4:>12.0f} {1 - runtime_mean / flat_mean:>7.1%}")
+
+    ok = True
+    if rejected_total:
+        print(f"FAIL: {rejected_total} transitions along graph edges were rejected")
+        ok = False
+    if max(runtime_means) > 1.25 * min(runtime_means):
+        print("FAIL: per-turn runtime instructions grow with the graph size")
+        ok = False
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,38 @@ Database configuration and connection utilities for MongoDB.
 """
 
 import os
+import time
+import asyncio
 import logging
 import datetime
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, List, TYPE_CHECKING
 from dataclasses import dataclass
 
+from utils.latency_logger import increment_counter, set_gauge, observe
+from utils.transcript_codec import (
+    encode_transcript,
+    iter_transcript,
+    TRANSCRIPT_CHUNKS_COLLECTION,
+    DEFAULT_CHUNK_SIZE,
+)
+
 try:
-    from motor.motor_asyncio import AsyncIOMotorClient
     from bson import ObjectId
 except ImportError:
-    AsyncIOMotorClient = None
     ObjectId = None
 
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+try:
+    from pymongo import monitoring, ReturnDocument
+    from pymongo.errors import BulkWriteError
+except ImportError:
+    monitoring = None
+    ReturnDocument = None
+    BulkWriteError = None
+
 
 @dataclass
 class DatabaseConfig:
@@ -22,6 +42,16 @@ class DatabaseConfig:
     url: str
     db_name: str
     enabled: bool = True
+    max_pool_size: int = 10
+    min_pool_size: int = 1
+    max_idle_time_ms: int = 300000
+    connect_timeout_ms: int = 5000
+    server_selection_timeout_ms: int = 5000
+    wait_queue_timeout_ms: int = 0  # 0 = wait indefinitely (driver default)
+    keepalive_seconds: float = 30.0  # 0 disables the keepalive ping
+    transcript_storage: str = "inline"  # inline | chunked | auto
+    transcript_inline_max_bytes: int = 64 * 1024  # auto: chunk transcripts larger than this
+    transcript_chunk_size: int = DEFAULT_CHUNK_SIZE
     
     @classmethod
     def from_env(cls) -> "DatabaseConfig":
@@ -38,17 +68,174 @@ class DatabaseConfig:
         return cls(
             url=url,
             db_name=db_name,
-            enabled=bool(url)
+            enabled=bool(url),
+            max_pool_size=int(os.getenv("MONGO_MAX_POOL_SIZE", "10")),
+            min_pool_size=int(os.getenv("MONGO_MIN_POOL_SIZE", "1")),
+            max_idle_time_ms=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+            connect_timeout_ms=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+            server_selection_timeout_ms=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            wait_queue_timeout_ms=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")),
+            keepalive_seconds=float(os.getenv("MONGO_KEEPALIVE_SECONDS", "30")),
+            transcript_storage=os.getenv("CALL_TRANSCRIPT_STORAGE", "inline").lower(),
+            transcript_inline_max_bytes=int(os.getenv("CALL_TRANSCRIPT_INLINE_MAX_BYTES", str(64 * 1024))),
+            transcript_chunk_size=int(os.getenv("CALL_TRANSCRIPT_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE))),
         )
 
+    def client_options(self) -> Dict[str, Any]:
+        """Connection pool options passed to the Motor client."""
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "maxIdleTimeMS": self.max_idle_time_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+        }
+        if self.wait_queue_timeout_ms > 0:
+            options["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        return options
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener if monitoring else object):
+    """
+    Exports connection pool telemetry as process-wide metrics.
+
+    - mongo.pool.checkout_wait_ms: time spent waiting for a pooled connection
+    - mongo.pool.in_use / mongo.pool.open: connections checked out / open
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._in_use = 0
+        self._open = 0
+
+    def _adjust(self, attr: str, gauge: str, delta: int) -> None:
+        with self._lock:
+            value = max(getattr(self, attr) + delta, 0)
+            setattr(self, attr, value)
+        set_gauge(gauge, value)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        increment_counter("mongo.pool.cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._adjust("_open", "mongo.pool.open", 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._adjust("_open", "mongo.pool.open", -1)
+
+    def connection_check_out_started(self, event):
+        # Checkout happens synchronously on the driver thread running the operation
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        increment_counter("mongo.pool.checkout_failures")
+        self._record_wait()
+
+    def connection_checked_out(self, event):
+        self._record_wait()
+        self._adjust("_in_use", "mongo.pool.in_use", 1)
+
+    def connection_checked_in(self, event):
+        self._adjust("_in_use", "mongo.pool.in_use", -1)
+
+    def _record_wait(self) -> None:
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            self._local.started = None
+            observe("mongo.pool.checkout_wait_ms", (time.perf_counter() - started) * 1000)
+
+
+# Side-collection documents carried with a call document until it is inserted
+TRANSCRIPT_CHUNKS_KEY = "_transcript_chunks"
+
+
+def minutes_to_deduct(minutes: float) -> int:
+    """Billable whole minutes for a call duration in minutes (rounded up)."""
+    return int(minutes) + (1 if minutes % 1 > 0 else 0)
+
+
+# Assistant fields only needed after the call or by specific features.
+# The critical-path fetch leaves them out and they are loaded lazily.
+ASSISTANT_HEAVY_FIELDS = [
+    "nodes",
+    "edges",
+    "email_templates",
+    "assigned_documents",
+    "analysisSettings.summaryPrompt",
+    "analysisSettings.successEvaluationPrompt",
+    "analysisSettings.structuredDataPrompt",
+]
+
+
+def _assistant_core_pipeline(assistant_oid) -> List[Dict[str, Any]]:
+    """Aggregation returning an assistant without its heavy fields, plus its workflow node count."""
+    return [
+        {"$match": {"_id": assistant_oid}},
+        {"$limit": 1},
+        {"$addFields": {"_workflow_node_count": {
+            "$cond": [{"$isArray": "$nodes"}, {"$size": "$nodes"}, 0]
+        }}},
+        {"$project": {field: 0 for field in ASSISTANT_HEAVY_FIELDS}},
+    ]
+
+
+def _phone_to_assistant_pipeline(phone_number: str) -> List[Dict[str, Any]]:
+    """
+    Aggregation resolving number -> inboundAssistantId -> assistant document.
+    
+    Runs against 'phonenumbers' and unions 'phone_numbers', preferring the
+    former like the sequential lookup does.
+    """
+    return [
+        {"$match": {"number": phone_number}},
+        {"$limit": 1},
+        {"$addFields": {"_source": 0}},
+        {"$unionWith": {
+            "coll": "phone_numbers",
+            "pipeline": [
+                {"$match": {"number": phone_number}},
+                {"$limit": 1},
+                {"$addFields": {"_source": 1}},
+            ],
+        }},
+        {"$sort": {"_source": 1}},
+        {"$limit": 1},
+        # inboundAssistantId is an ObjectId from mongoose but may be a string in 'phone_numbers'
+        {"$addFields": {"_assistant_oid": {"$convert": {
+            "input": "$inboundAssistantId", "to": "objectId", "onError": None, "onNull": None
+        }}}},
+        {"$lookup": {
+            "from": "assistants",
+            "localField": "_assistant_oid",
+            "foreignField": "_id",
+            "as": "assistant",
+        }},
+        {"$project": {"number": 1, "inboundAssistantId": 1, "assistant": 1}},
+    ]
+
 
 class DatabaseClient:
     """MongoDB database client wrapper."""
     
     def __init__(self, config: DatabaseConfig = None):
         self.config = config or DatabaseConfig.from_env()
-        self._client: Optional[AsyncIOMotorClient] = None
+        self._client: Optional["AsyncIOMotorClient"] = None
         self._db = None
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._transcript_index_ready = False
         self._initialize_client()
     
     def _initialize_client(self):
@@ -57,12 +244,20 @@ class DatabaseClient:
             logging.warning("Database client disabled - no MongoDB configuration")
             return
         
-        if not AsyncIOMotorClient:
+        # Motor is imported here rather than at module load to keep worker startup fast
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient
+        except ImportError:
             logging.warning("MongoDB client not available - install motor")
             return
         
         try:
-            self._client = AsyncIOMotorClient(self.config.url)
+            event_listeners = [PoolMetricsListener()] if monitoring else []
+            self._client = AsyncIOMotorClient(
+                self.config.url,
+                event_listeners=event_listeners,
+                **self.config.client_options(),
+            )
             # Use get_default_database() if URI has db, else use config.db_name
             try:
                 self._db = self._client.get_default_database()
@@ -76,7 +271,7 @@ class DatabaseClient:
             self._db = None
     
     @property
-    def client(self) -> Optional[AsyncIOMotorClient]:
+    def client(self) -> Optional["AsyncIOMotorClient"]:
         """Get the MongoDB client instance."""
         return self._client
     
@@ -88,6 +283,55 @@ class DatabaseClient:
     def is_available(self) -> bool:
         """Check if database client is available."""
         return self._client is not None and self._db is not None
+
+    async def warmup(self) -> bool:
+        """
+        Connect eagerly (DNS SRV, TLS, auth) so the first call does not pay for it.
+
+        Also starts the keepalive ping. Must run on the loop that serves jobs.
+
+        Returns:
+            True if the server answered the ping
+        """
+        if not self.is_available():
+            return False
+
+        start = time.perf_counter()
+        try:
+            await self._client.admin.command("ping")
+        except Exception as e:
+            logging.warning(f"MONGO_WARMUP_FAILED | error={str(e)}")
+            return False
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        observe("mongo.warmup_ms", duration_ms)
+        logging.info(f"MONGO_WARMUP_OK | duration_ms={duration_ms:.1f} | max_pool_size={self.config.max_pool_size} | min_pool_size={self.config.min_pool_size}")
+        self.start_keepalive()
+        return True
+
+    def start_keepalive(self) -> None:
+        """Ping periodically so idle pooled connections are not dropped by NAT/LB timeouts."""
+        if self.config.keepalive_seconds <= 0 or not self.is_available():
+            return
+        if self._keepalive_task is not None and not self._keepalive_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._keepalive_task = loop.create_task(self._keepalive())
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.keepalive_seconds)
+            try:
+                await self._client.admin.command("ping")
+                increment_counter("mongo.keepalive.pings")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                increment_counter("mongo.keepalive.failures")
+                logging.warning(f"MONGO_KEEPALIVE_FAILED | error={str(e)}")
     
     async def fetch_assistant(self, assistant_id: str) -> Optional[Dict[str, Any]]:
         """Fetch assistant configuration from database."""
@@ -114,12 +358,94 @@ class DatabaseClient:
             logging.error(f"Error fetching assistant from database: {e}")
             return None
 
+    async def fetch_assistant_core(self, assistant_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the fields needed to start a session, leaving out ASSISTANT_HEAVY_FIELDS.
+        
+        The result has sections_loaded=False; see fetch_assistant_sections().
+        """
+        if not self.is_available():
+            logging.warning("Database client not available")
+            return None
+        
+        if not ObjectId.is_valid(assistant_id):
+            logging.warning(f"Invalid assistant_id format: {assistant_id}")
+            return None
+        
+        try:
+            docs = await self._db["assistants"].aggregate(
+                _assistant_core_pipeline(ObjectId(assistant_id))
+            ).to_list(length=1)
+        except Exception as e:
+            logging.warning(f"ASSISTANT_CORE_FETCH_FAILED | error={e} | falling back to full document")
+            return await self.fetch_assistant(assistant_id)
+        
+        if not docs:
+            logging.warning(f"Assistant not found in database: {assistant_id}")
+            return None
+        
+        logging.info(f"Assistant core fetched from database: {assistant_id}")
+        return self._flatten_assistant(docs[0], sections_loaded=False)
+
+    async def fetch_assistant_sections(self, assistant_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch only the heavy assistant fields, flattened like _flatten_assistant()."""
+        if not self.is_available() or not ObjectId.is_valid(assistant_id):
+            return None
+        
+        projection = {field: 1 for field in ASSISTANT_HEAVY_FIELDS}
+        projection["updatedAt"] = 1
+        try:
+            doc = await self._db["assistants"].find_one({"_id": ObjectId(assistant_id)}, projection)
+        except Exception as e:
+            logging.error(f"Error fetching assistant sections from database: {e}")
+            return None
+        
+        if not doc:
+            return None
+        sections = self._flatten_sections(doc)
+        sections["updated_at"] = doc.get("updatedAt")
+        return sections
+
     async def fetch_assistant_by_phone(self, phone_number: str) -> Optional[Dict[str, Any]]:
-        """Fetch assistant configuration by phone number."""
+        """Fetch assistant configuration by phone number in a single round trip."""
         if not self.is_available():
             logging.warning("Database client not available")
             return None
             
+        try:
+            results = await self._db["phonenumbers"].aggregate(
+                _phone_to_assistant_pipeline(phone_number)
+            ).to_list(length=1)
+        except Exception as e:
+            # $unionWith needs MongoDB 4.4+, keep the old path working on older servers
+            logging.warning(f"PHONE_LOOKUP_AGGREGATION_FAILED | error={e} | falling back to sequential lookup")
+            return await self._fetch_assistant_by_phone_sequential(phone_number)
+        
+        try:
+            if not results:
+                logging.warning(f"No assistant found for phone number: {phone_number}")
+                return None
+            
+            phone_doc = results[0]
+            assistant_id = phone_doc.get("inboundAssistantId")
+            if not assistant_id:
+                logging.warning(f"Phone number {phone_number} has no inbound assistant assigned")
+                return None
+            
+            assistants = phone_doc.get("assistant") or []
+            if not assistants:
+                logging.warning(f"Assistant not found in database: {assistant_id}")
+                return None
+            
+            logging.info(f"Assistant fetched by phone number: {phone_number} -> {assistant_id}")
+            return self._flatten_assistant(assistants[0])
+            
+        except Exception as e:
+            logging.error(f"Error fetching assistant by phone: {e}")
+            return None
+
+    async def _fetch_assistant_by_phone_sequential(self, phone_number: str) -> Optional[Dict[str, Any]]:
+        """Resolve number -> assistant with one query per collection (pre-aggregation path)."""
         try:
             # Look up phone number to get assistant ID
             # Assuming 'phonenumbers' collection based on mongoose model 'PhoneNumber'
@@ -144,7 +470,7 @@ class DatabaseClient:
             logging.error(f"Error fetching assistant by phone: {e}")
             return None
 
-    def _flatten_assistant(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+    def _flatten_assistant(self, doc: Dict[str, Any], sections_loaded: bool = True) -> Dict[str, Any]:
         """Map MongoDB schema to flat dictionary expected by LiveKit agent."""
         model_settings = doc.get("modelSettings", {})
         voice_settings = doc.get("voiceSettings", {})
@@ -158,6 +484,7 @@ class DatabaseClient:
             "prompt": model_settings.get("systemPrompt") or doc.get("systemPrompt", ""),
             "first_message": model_settings.get("firstMessage") or doc.get("firstMessage", ""),
             "user_id": str(doc.get("userId", "")),
+            "updated_at": doc.get("updatedAt"),
             
             # Model Settings
             "llm_provider_setting": model_settings.get("provider", "OpenAI"),
@@ -187,26 +514,110 @@ class DatabaseClient:
             "transfer_country_code": advanced_settings.get("transferCountryCode", "+1"),
             "transfer_sentence": advanced_settings.get("transferSentence", ""),
             "transfer_condition": advanced_settings.get("transferCondition", ""),
+            "learned_endpointing": advanced_settings.get("learnedEndpointing"),
             
             # Analysis
             "analysisSettings": analysis_settings, # Pass through full settings object
             "structured_data_fields": analysis_settings.get("structuredData", []),
-            "analysis_summary_prompt": analysis_settings.get("summaryPrompt", ""),
-            "analysis_evaluation_prompt": analysis_settings.get("successEvaluationPrompt", ""),
-            "analysis_structured_data_prompt": analysis_settings.get("structuredDataPrompt", ""),
             
             # N8N
             "n8n_webhook_url": n8n_settings.get("webhookUrl", ""),
             
+            "dataCollectionSettings": doc.get("dataCollectionSettings", {}),
+
+            # Heavy sections (left out of the critical-path fetch)
+            "sections_loaded": sections_loaded,
+            "workflow_node_count": doc.get("_workflow_node_count", len(doc.get("nodes") or [])),
+        }
+        flat.update(self._flatten_sections(doc))
+        return flat
+
+    def _flatten_sections(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten the fields listed in ASSISTANT_HEAVY_FIELDS."""
+        analysis_settings = doc.get("analysisSettings", {})
+        return {
+            # Analysis prompts
+            "analysis_summary_prompt": analysis_settings.get("summaryPrompt", ""),
+            "analysis_evaluation_prompt": analysis_settings.get("successEvaluationPrompt", ""),
+            "analysis_structured_data_prompt": analysis_settings.get("structuredDataPrompt", ""),
+            
             # Email & Documents
             "email_templates": doc.get("email_templates", {}),
             "assigned_documents": doc.get("assigned_documents", []),
-            "dataCollectionSettings": doc.get("dataCollectionSettings", {}),
             "nodes": doc.get("nodes", []),
             "edges": doc.get("edges", [])
         }
-        return flat
     
+    def build_call_document(
+        self,
+        call_id: str,
+        assistant_id: str,
+        called_did: str,
+        call_duration: int,
+        call_status: str,
+        transcription: list,
+        participant_identity: Optional[str] = None,
+        recording_sid: Optional[str] = None,
+        call_sid: Optional[str] = None,
+        user_id: Optional[str] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        call_summary: Optional[str] = None,
+        structured_data: Optional[Dict[str, Any]] = None,
+        analysis: Optional[Dict[str, Any]] = None,
+        client_name: Optional[str] = None,
+        client_email: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the 'calls' document for a finished call.
+        
+        The _id is assigned here so retried inserts of the same document are idempotent.
+        """
+        call_data = {
+            "_id": ObjectId(),
+            "assistant_id": assistant_id,
+            "phone_number": called_did,
+            "duration": call_duration,
+            "status": call_status, # 'completed'
+            "transcript": transcription,
+            "participant_identity": participant_identity or "",
+            "call_sid": call_sid or "",
+            "recording_sid": recording_sid or "",
+            "call_outcome": call_status, 
+            "start_time": start_time or datetime.datetime.now(),
+            "end_time": end_time or datetime.datetime.now(),
+            "summary": call_summary or "",
+            "structured_data": structured_data or {},
+            "analysis": analysis or {},
+            "client_name": client_name or "",
+            "client_email": client_email or "",
+            "call_id": call_id,
+            "created_at": datetime.datetime.now(),
+            "updated_at": datetime.datetime.now()
+        }
+        
+        if user_id and ObjectId.is_valid(user_id):
+            call_data["user_id"] = ObjectId(user_id)
+
+        if self._should_chunk_transcript(transcription):
+            chunks, summary = encode_transcript(transcription, chunk_size=self.config.transcript_chunk_size)
+            del call_data["transcript"]
+            call_data["transcript_summary"] = summary
+            call_data[TRANSCRIPT_CHUNKS_KEY] = [
+                {"_id": ObjectId(), "call_ref": call_data["_id"], "n": n, "data": chunk}
+                for n, chunk in enumerate(chunks)
+            ]
+        return call_data
+
+    def _should_chunk_transcript(self, transcription: list) -> bool:
+        mode = self.config.transcript_storage
+        if mode == "chunked":
+            return True
+        if mode == "auto":
+            size = sum(len(str(item.get("content", ""))) for item in transcription)
+            return size > self.config.transcript_inline_max_bytes
+        return False
+
     async def save_call_history(
         self,
         call_id: str,
@@ -233,52 +644,139 @@ class DatabaseClient:
             return False
         
         try:
-            call_data = {
-                "assistant_id": assistant_id,
-                "phone_number": called_did,
-                "duration": call_duration,
-                "status": call_status, # 'completed'
-                "transcript": transcription,
-                "participant_identity": participant_identity or "",
-                "call_sid": call_sid or "",
-                "recording_sid": recording_sid or "",
-                "call_outcome": call_status, 
-                "start_time": start_time or datetime.datetime.now(),
-                "end_time": end_time or datetime.datetime.now(),
-                "summary": call_summary or "",
-                "structured_data": structured_data or {},
-                "analysis": analysis or {},
-                "client_name": client_name or "",
-                "client_email": client_email or "",
-                "call_id": call_id,
-                "created_at": datetime.datetime.now(),
-                "updated_at": datetime.datetime.now()
-            }
-            
-            if user_id and ObjectId.is_valid(user_id):
-                call_data["user_id"] = ObjectId(user_id)
-            if ObjectId.is_valid(assistant_id):
-                 # We could fetch assistant to get user_id, or trust it's not strictly required by Foreign Key constraint in Mongo (it's ref but not enforced like SQL)
-                 pass
-
-            # Insert into 'calls' collection
-            result = await self._db["calls"].insert_one(call_data)
+            call_data = self.build_call_document(
+                call_id=call_id,
+                assistant_id=assistant_id,
+                called_did=called_did,
+                call_duration=call_duration,
+                call_status=call_status,
+                transcription=transcription,
+                participant_identity=participant_identity,
+                recording_sid=recording_sid,
+                call_sid=call_sid,
+                user_id=user_id,
+                start_time=start_time,
+                end_time=end_time,
+                call_summary=call_summary,
+                structured_data=structured_data,
+                analysis=analysis,
+                client_name=client_name,
+                client_email=client_email,
+            )
+
+            # Insert into 'calls' collection (and transcript chunks, if any)
+            written = await self.insert_call_documents([call_data])
             
-            if result.inserted_id:
-                logging.info(f"Call history saved: {call_id} -> {result.inserted_id}")
+            if written:
+                logging.info(f"Call history saved: {call_data['call_id']} -> {written[0]}")
                 return True
             else:
-                logging.error(f"Failed to save call history: {call_id}")
+                logging.error(f"Failed to save call history: {call_data['call_id']}")
                 return False
                 
         except Exception as e:
             logging.error(f"Error saving call history: {e}")
             return False
+
+    async def insert_call_documents(self, docs: List[Dict[str, Any]], failures: Optional[Dict[Any, int]] = None) -> List[Any]:
+        """
+        Insert prebuilt call documents in one unordered batch.
+        
+        Documents that already exist (duplicate _id from a retried batch or a
+        replayed spool) count as written.
+        
+        Args:
+            docs: Call documents with their _id set
+            failures: Filled with _id -> server error code for documents that were rejected
+        
+        Returns:
+            The _ids that are now stored
+        
+        Raises:
+            Exception: On connection errors or non-duplicate write errors, with
+                nothing reported as written for the failed documents
+        """
+        if not docs:
+            return []
+        
+        # Chunks go first so a stored call document always has its transcript
+        chunks = [chunk for doc in docs for chunk in doc.get(TRANSCRIPT_CHUNKS_KEY, [])]
+        if chunks:
+            await self._insert_transcript_chunks(chunks)
+        chunked = {doc["_id"] for doc in docs if doc.get(TRANSCRIPT_CHUNKS_KEY)}
+        docs = [{k: v for k, v in doc.items() if k != TRANSCRIPT_CHUNKS_KEY} for doc in docs]
+        
+        try:
+            await self._db["calls"].insert_many(docs, ordered=False)
+            return [doc["_id"] for doc in docs]
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            failed = {err["index"] for err in write_errors if err.get("code") != 11000}
+            if failed:
+                logging.error(f"CALL_HISTORY_BATCH_PARTIAL_FAILURE | failed={len(failed)} | first_error={write_errors[0].get('errmsg')}")
+                await self._delete_transcript_chunks([docs[i]["_id"] for i in failed if docs[i]["_id"] in chunked])
+            if failures is not None:
+                for err in write_errors:
+                    if err.get("index") in failed:
+                        failures[docs[err["index"]]["_id"]] = err.get("code")
+            return [doc["_id"] for i, doc in enumerate(docs) if i not in failed]
+        except Exception:
+            await self._delete_transcript_chunks(list(chunked))
+            raise
     
+    async def _insert_transcript_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        collection = self._db[TRANSCRIPT_CHUNKS_COLLECTION]
+        if not self._transcript_index_ready:
+            await collection.create_index([("call_ref", 1), ("n", 1)], unique=True)
+            self._transcript_index_ready = True
+        try:
+            await collection.insert_many(chunks, ordered=False)
+        except BulkWriteError as e:
+            # Chunks from a retried batch or replayed spool already exist
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+
+    async def _delete_transcript_chunks(self, call_ids: List[Any]) -> None:
+        """Drop the chunks of call documents that were not stored.
+
+        A retry or replay inserts them again from the document (which keeps its
+        chunks, also in the dead-letter file), so nothing points at them meanwhile.
+        """
+        if not call_ids:
+            return
+        try:
+            await self._db[TRANSCRIPT_CHUNKS_COLLECTION].delete_many({"call_ref": {"$in": call_ids}})
+        except Exception as e:
+            logging.warning(f"CALL_TRANSCRIPT_CHUNKS_CLEANUP_FAILED | calls={len(call_ids)} | error={str(e)}")
+
+    async def iter_call_transcript(self, call_doc: Dict[str, Any]):
+        """Stream the transcript items of a call document, inline or chunked."""
+        summary = call_doc.get("transcript_summary") or {}
+        if summary.get("storage") != "chunked":
+            for item in call_doc.get("transcript") or []:
+                yield item
+            return
+        
+        cursor = self._db[summary.get("collection", TRANSCRIPT_CHUNKS_COLLECTION)].find(
+            {"call_ref": call_doc["_id"]}, {"n": 1, "data": 1}
+        ).sort("n", 1)
+        async for item in iter_transcript(cursor, summary["codec"]):
+            yield item
+
+    async def fetch_call_transcript(self, call_doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Rebuild the full transcript of a call document."""
+        return [item async for item in self.iter_call_transcript(call_doc)]
+
     async def deduct_minutes(self, user_id: str, minutes: float) -> Dict[str, Any]:
         """
         Deduct minutes from user's account after a call.
+        
+        Minutes are rounded up, then added with a single atomic $inc.
         """
+        return await self.increment_minutes_used(user_id, minutes_to_deduct(minutes))
+
+    async def increment_minutes_used(self, user_id: str, minutes: int) -> Dict[str, Any]:
+        """Atomically add whole minutes to minutes_used and return the new totals."""
         if not self.is_available():
             logging.warning("Database client not available for minutes deduction")
             return {"success": False, "error": "Database not available"}
@@ -287,32 +785,25 @@ class DatabaseClient:
             if not ObjectId.is_valid(user_id):
                  return {"success": False, "error": "Invalid user_id"}
 
-            minutes_to_deduct = int(minutes) + (1 if minutes % 1 > 0 else 0)
-            
-            # Find and update in one go (atomic) - but we need to check limit first
-            # Or just fetch then update (less atomic but simple)
-            
-            user = await self._db["users"].find_one({"_id": ObjectId(user_id)})
+            # One round trip; concurrent deductions cannot overwrite each other. A pipeline
+            # update because $inc fails on users whose minutes_used is null
+            user = await self._db["users"].find_one_and_update(
+                {"_id": ObjectId(user_id)},
+                [{"$set": {"minutes_used": {"$add": [{"$ifNull": ["$minutes_used", 0]}, minutes]}}}],
+                projection={"minutes_used": 1, "minutes_limit": 1},
+                return_document=ReturnDocument.AFTER,
+            )
             if not user:
                  return {"success": False, "error": "User not found"}
 
             current_limit = user.get("minutes_limit", 0) or 0
-            current_used = user.get("minutes_used", 0) or 0
-            
-            new_used = current_used + minutes_to_deduct
+            new_used = user.get("minutes_used", 0) or 0
             remaining = max(0, current_limit - new_used)
-            
-            # Update
-            await self._db["users"].update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": {"minutes_used": new_used}}
-            )
-            
             exceeded = new_used > current_limit if current_limit > 0 else False
             
             return {
                 "success": True,
-                "minutes_deducted": minutes_to_deduct,
+                "minutes_deducted": minutes,
                 "minutes_used": new_used,
                 "minutes_limit": current_limit,
                 "remaining_minutes": remaining,
@@ -335,7 +826,10 @@ class DatabaseClient:
             if not ObjectId.is_valid(user_id):
                  return {"available": True, "error": "Invalid user_id"}
 
-            user = await self._db["users"].find_one({"_id": ObjectId(user_id)})
+            user = await self._db["users"].find_one(
+                {"_id": ObjectId(user_id)},
+                {"minutes_limit": 1, "minutes_used": 1, "is_active": 1}
+            )
             if not user:
                  return {"available": True, "error": "User not found - allowing call"}
 
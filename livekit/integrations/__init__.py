@@ -4,11 +4,24 @@ Integration modules for external services.
 
 from .calendar_api import Calendar, CalComCalendar, AvailableSlot, SlotUnavailableError
 from .mongo_client import MongoClient
+from .assistant_cache import AssistantConfigCache, get_assistant_cache
+from .did_index import DidRoutingIndex, get_did_index, normalize_e164
+from .call_history_writer import CallHistoryWriter, get_call_history_writer
+from .minutes_ledger import MinutesLedger, get_minutes_ledger
 
 __all__ = [
     "Calendar",
     "CalComCalendar", 
     "AvailableSlot",
     "SlotUnavailableError",
-    "MongoClient"
+    "MongoClient",
+    "AssistantConfigCache",
+    "get_assistant_cache",
+    "DidRoutingIndex",
+    "get_did_index",
+    "normalize_e164",
+    "CallHistoryWriter",
+    "get_call_history_writer",
+    "MinutesLedger",
+    "get_minutes_ledger"
 ]
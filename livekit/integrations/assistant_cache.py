@@ -0,0 +1,239 @@
+"""
+Process-wide cache of flattened assistant configurations.
+
+Entries are bounded by TTL and size, and invalidated by a MongoDB change stream
+on the ``assistants`` collection (polling on ``updatedAt`` when change streams
+are not available, e.g. on a standalone mongod).
+"""
+
+import os
+import time
+import asyncio
+import logging
+import datetime
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, List
+
+from utils.latency_logger import increment_counter
+
+logger = logging.getLogger(__name__)
+
+# Assistant fields written by the workers themselves; updates touching only these don't invalidate
+LEARNED_FIELD_PREFIXES = ("advancedSettings.learnedEndpointing",)
+
+
+@dataclass
+class AssistantCacheConfig:
+    """Assistant cache configuration settings."""
+    enabled: bool = True
+    ttl_seconds: float = 300.0
+    max_entries: int = 1000
+    poll_interval_seconds: float = 15.0
+
+    @classmethod
+    def from_env(cls) -> "AssistantCacheConfig":
+        return cls(
+            enabled=os.getenv("ASSISTANT_CACHE_ENABLED", "true").lower() == "true",
+            ttl_seconds=float(os.getenv("ASSISTANT_CACHE_TTL_SECONDS", "300")),
+            max_entries=int(os.getenv("ASSISTANT_CACHE_MAX_ENTRIES", "1000")),
+            poll_interval_seconds=float(os.getenv("ASSISTANT_CACHE_POLL_INTERVAL_SECONDS", "15")),
+        )
+
+
+@dataclass
+class _CacheEntry:
+    config: Dict[str, Any]
+    updated_at: Any
+    stored_at: float
+
+
+class AssistantConfigCache:
+    """LRU + TTL cache of flattened assistant configs keyed by assistant id."""
+
+    def __init__(self, config: Optional[AssistantCacheConfig] = None):
+        self.config = config or AssistantCacheConfig.from_env()
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._watch_task: Optional[asyncio.Task] = None
+        self._invalidation_listeners: List[Callable[[str, str], None]] = []
+
+    def get(self, assistant_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached config, or None on miss/expiry."""
+        if not self.config.enabled:
+            return None
+
+        entry = self._entries.get(assistant_id)
+        if entry is None:
+            increment_counter("assistant_cache.misses")
+            return None
+
+        if time.monotonic() - entry.stored_at > self.config.ttl_seconds:
+            # Expired entries count as both stale and a miss
+            del self._entries[assistant_id]
+            increment_counter("assistant_cache.stale")
+            increment_counter("assistant_cache.misses")
+            return None
+
+        self._entries.move_to_end(assistant_id)
+        increment_counter("assistant_cache.hits")
+        # Callers mutate the top-level config (prompt injection, model mapping)
+        return dict(entry.config)
+
+    def put(self, assistant_id: str, config: Dict[str, Any]) -> None:
+        """Store a flattened config, evicting least recently used entries."""
+        if not self.config.enabled or not config:
+            return
+
+        self._entries[assistant_id] = _CacheEntry(
+            config=dict(config),
+            updated_at=config.get("updated_at"),
+            stored_at=time.monotonic(),
+        )
+        self._entries.move_to_end(assistant_id)
+
+        while len(self._entries) > self.config.max_entries:
+            evicted_id, _ = self._entries.popitem(last=False)
+            increment_counter("assistant_cache.evictions")
+            logger.debug(f"ASSISTANT_CACHE_EVICTED | assistant_id={evicted_id}")
+
+    def merge(self, assistant_id: str, fields: Dict[str, Any], updated_at: Any = None) -> bool:
+        """Add lazily loaded fields to a cached config of the same version."""
+        entry = self._entries.get(assistant_id)
+        if entry is None or entry.updated_at != updated_at:
+            return False
+        entry.config.update(fields)
+        return True
+
+    def invalidate(self, assistant_id: str, reason: str = "manual") -> None:
+        """Drop a cached config and notify invalidation listeners."""
+        if self._entries.pop(assistant_id, None) is not None:
+            increment_counter("assistant_cache.invalidations")
+            logger.info(f"ASSISTANT_CACHE_INVALIDATED | assistant_id={assistant_id} | reason={reason}")
+
+        for listener in self._invalidation_listeners:
+            try:
+                listener(assistant_id, reason)
+            except Exception as e:
+                logger.error(f"ASSISTANT_CACHE_LISTENER_ERROR | assistant_id={assistant_id} | error={str(e)}")
+
+    def add_invalidation_listener(self, listener: Callable[[str, str], None]) -> None:
+        """Register a callback invoked with (assistant_id, reason) on every change."""
+        if listener not in self._invalidation_listeners:
+            self._invalidation_listeners.append(listener)
+
+    def clear(self) -> None:
+        """Drop all cached configs."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache size and configuration."""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.config.max_entries,
+            "ttl_seconds": self.config.ttl_seconds,
+            "watching": self._watch_task is not None and not self._watch_task.done(),
+        }
+
+    # -------- invalidation
+
+    def ensure_watcher(self, db) -> None:
+        """Start the change-stream/polling watcher on the running loop if needed."""
+        if not self.config.enabled or db is None:
+            return
+        if self._watch_task is not None and not self._watch_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._watch_task = loop.create_task(self._watch(db))
+
+    async def stop_watcher(self) -> None:
+        """Cancel the background watcher."""
+        if self._watch_task is None or self._watch_task.done():
+            return
+        self._watch_task.cancel()
+        try:
+            await self._watch_task
+        except asyncio.CancelledError:
+            pass
+
+    async def _watch(self, db) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                await self._watch_change_stream(db)
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if _is_change_stream_unsupported(e):
+                    logger.warning(f"ASSISTANT_CACHE_CHANGE_STREAM_UNAVAILABLE | error={str(e)} | falling back to polling")
+                    await self._poll_updates(db)
+                    return
+                # Anything cached may have missed an update while the stream was down
+                logger.error(f"ASSISTANT_CACHE_CHANGE_STREAM_ERROR | error={str(e)} | retry_in={backoff}s")
+                self.clear()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def _watch_change_stream(self, db) -> None:
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        async with db["assistants"].watch(pipeline) as stream:
+            logger.info("ASSISTANT_CACHE_CHANGE_STREAM_STARTED")
+            async for change in stream:
+                if _only_learned_fields(change):
+                    continue
+                doc_id = (change.get("documentKey") or {}).get("_id")
+                if doc_id is not None:
+                    self.invalidate(str(doc_id), reason=change.get("operationType", "change"))
+
+    async def _poll_updates(self, db) -> None:
+        last_seen = datetime.datetime.utcnow()
+        try:
+            latest = await db["assistants"].find_one({}, {"updatedAt": 1}, sort=[("updatedAt", -1)])
+            if latest and isinstance(latest.get("updatedAt"), datetime.datetime):
+                last_seen = latest["updatedAt"]
+        except Exception as e:
+            logger.warning(f"ASSISTANT_CACHE_POLL_INIT_FAILED | error={str(e)}")
+
+        logger.info(f"ASSISTANT_CACHE_POLLING_STARTED | interval={self.config.poll_interval_seconds}s")
+        while True:
+            await asyncio.sleep(self.config.poll_interval_seconds)
+            try:
+                cursor = db["assistants"].find({"updatedAt": {"$gt": last_seen}}, {"_id": 1, "updatedAt": 1})
+                async for doc in cursor:
+                    self.invalidate(str(doc["_id"]), reason="poll")
+                    if isinstance(doc.get("updatedAt"), datetime.datetime) and doc["updatedAt"] > last_seen:
+                        last_seen = doc["updatedAt"]
+            except Exception as e:
+                logger.error(f"ASSISTANT_CACHE_POLL_ERROR | error={str(e)}")
+
+
+def _only_learned_fields(change: Dict[str, Any]) -> bool:
+    """Whether an update only wrote values the worker learns itself (e.g. endpointing delays)."""
+    if change.get("operationType") != "update":
+        return False
+    description = change.get("updateDescription") or {}
+    fields = list((description.get("updatedFields") or {}).keys()) + list(description.get("removedFields") or [])
+    return bool(fields) and all(name.startswith(LEARNED_FIELD_PREFIXES) for name in fields)
+
+
+def _is_change_stream_unsupported(error: Exception) -> bool:
+    """Change streams need a replica set / sharded cluster (code 40573)."""
+    code = getattr(error, "code", None)
+    if code in (40573, 40324):
+        return True
+    return "replica set" in str(error).lower()
+
+
+# Global assistant cache instance
+_assistant_cache: Optional[AssistantConfigCache] = None
+
+
+def get_assistant_cache() -> AssistantConfigCache:
+    """Get the global assistant config cache."""
+    global _assistant_cache
+    if _assistant_cache is None:
+        _assistant_cache = AssistantConfigCache()
+    return _assistant_cache
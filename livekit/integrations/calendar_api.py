@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import os
+import json
+import time
+import asyncio
 import datetime
 import logging
 import hashlib
-import time
 from dataclasses import dataclass
 from typing import Protocol, Optional
 from zoneinfo import ZoneInfo
@@ -46,6 +49,136 @@ BASE_URL_V1 = "https://api.cal.com/v1/"
 BASE_URL_V2 = "https://api.cal.com/v2/"
 
 
+# Event type metadata (length) cache
+_EVENT_TYPE_TTL = float(os.getenv("CALCOM_EVENT_TYPE_TTL_SECONDS", "3600"))
+# Entries older than this are still used but refreshed in the background
+_EVENT_TYPE_REFRESH_AFTER = float(os.getenv("CALCOM_EVENT_TYPE_REFRESH_SECONDS", "600"))
+_EVENT_TYPE_MAX_ENTRIES = 1000
+
+
+@dataclass
+class EventTypeMetadata:
+    length_minutes: int
+    # False when Cal.com rejected the key or does not know the event type
+    valid: bool
+    fetched_at: float
+
+
+class EventTypeCache:
+    """Event type metadata per (api key hash, event_type_id), with TTL and background refresh."""
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple[str, str], EventTypeMetadata] = {}
+        self._refreshing: dict[tuple[str, str], asyncio.Task] = {}
+        self._log = logging.getLogger("cal.com")
+        # Own session: a refresh can outlive the call (and the job session) that started it
+        self._http = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def _key(api_key: str, event_type_id) -> tuple[str, str]:
+        # The raw key never becomes part of a dict key that could end up in a log or dump
+        return hashlib.sha256(api_key.encode()).hexdigest()[:16], str(event_type_id).strip()
+
+    def get(self, api_key: str, event_type_id) -> Optional[EventTypeMetadata]:
+        metadata = self._entries.get(self._key(api_key, event_type_id))
+        if metadata is None or time.time() - metadata.fetched_at > _EVENT_TYPE_TTL:
+            return None
+        return metadata
+
+    def needs_refresh(self, metadata: EventTypeMetadata) -> bool:
+        return time.time() - metadata.fetched_at > _EVENT_TYPE_REFRESH_AFTER
+
+    def _session(self):
+        """The cache's session, created lazily on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.closed or self._http_loop is not loop:
+            import aiohttp
+            self._http = aiohttp.ClientSession()
+            self._http_loop = loop
+        return self._http
+
+    def refresh(self, api_key: str, event_type_id) -> "asyncio.Task[EventTypeMetadata]":
+        """Fetch (or join the in-flight fetch of) an event type."""
+        key = self._key(api_key, event_type_id)
+        task = self._refreshing.get(key)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._fetch(key, api_key, event_type_id))
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+            self._refreshing[key] = task
+        return task
+
+    def refresh_in_background(self, api_key: str, event_type_id, on_done=None) -> None:
+        try:
+            task = self.refresh(api_key, event_type_id)
+        except RuntimeError:
+            # No running loop; initialize() can still fetch it
+            return
+
+        def done(t: asyncio.Task) -> None:
+            if t.cancelled():
+                return
+            if t.exception() is not None:
+                self._log.warning("Cal.com: event type refresh failed: %s", str(t.exception()))
+                return
+            if on_done is not None:
+                on_done(t.result())
+
+        task.add_done_callback(done)
+
+    async def _fetch(self, key: tuple[str, str], api_key: str, event_type_id) -> EventTypeMetadata:
+        url = f"{BASE_URL_V2}event-types/{key[1]}"
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "cal-api-version": CAL_EVENT_TYPES_VERSION,
+            "Content-Type": "application/json",
+        }
+        start = time.perf_counter()
+        http = self._session()
+        # Cal.com answers 500 for some event types on the first try; retry once
+        for attempt in range(2):
+            async with http.get(url, headers=headers) as resp:
+                txt = await resp.text()
+                if resp.status >= 500 and attempt == 0:
+                    self._log.warning(f"Cal.com: could not fetch event type ({resp.status}), retrying")
+                    continue
+                if resp.status in (401, 403, 404):
+                    self._log.error(f"Cal.com: event type {key[1]} not accessible ({resp.status}) {txt}")
+                    metadata = EventTypeMetadata(length_minutes=30, valid=False, fetched_at=time.time())
+                    break
+                if not resp.ok:
+                    raise Exception(f"Cal.com event type fetch failed: {resp.status} - {txt}")
+                try:
+                    data = json.loads(txt)
+                except ValueError:
+                    raise Exception("Cal.com event type response not valid JSON")
+
+                length = (data.get("data") or {}).get("lengthInMinutes")
+                if not (isinstance(length, int) and length > 0):
+                    self._log.warning("Cal.com: no valid length found, using default 30 minutes")
+                    length = 30
+                metadata = EventTypeMetadata(length_minutes=length, valid=True, fetched_at=time.time())
+                break
+
+        self._entries[key] = metadata
+        if len(self._entries) > _EVENT_TYPE_MAX_ENTRIES:
+            oldest = min(self._entries, key=lambda k: self._entries[k].fetched_at)
+            del self._entries[oldest]
+        self._log.info(
+            "CALCOM_EVENT_TYPE_CACHED | event_type_id=%s | length=%d | valid=%s | fetch_ms=%.1f",
+            key[1], metadata.length_minutes, metadata.valid, (time.perf_counter() - start) * 1000,
+        )
+        return metadata
+
+
+_event_type_cache = EventTypeCache()
+
+
+def get_event_type_cache() -> EventTypeCache:
+    """Get the process-wide Cal.com event type cache."""
+    return _event_type_cache
+
+
 class SlotUnavailableError(Exception):
     def __init__(self, message: str) -> None:
         super().__init__(message)
@@ -132,7 +265,7 @@ class CalComCalendar(Calendar):
         self._username = username
         self._event_type_slug = event_type_slug
         self._org_slug = org_slug
-        self._event_length = 30  # will be updated in initialize()
+        self._event_length = 30  # replaced by the event type's length once known
 
         try:
             self._http = http_context.http_session()
@@ -140,6 +273,9 @@ class CalComCalendar(Calendar):
             import aiohttp
             self._http = aiohttp.ClientSession()
 
+        if self._event_type_id:
+            self._load_event_type()
+
     def _validate_timezone(self, timezone: str) -> ZoneInfo:
         """Validate and normalize timezone string to IANA format."""
         # Common timezone abbreviations mapping
@@ -192,76 +328,38 @@ class CalComCalendar(Calendar):
     # -------- init: fetch event type length with v2
 
     async def initialize(self) -> None:
+        """Fetch the event type length now (the call path relies on the background refresh instead)."""
         if not self._event_type_id:
             self._log.info("Cal.com: initialize skipped (no event_type_id). Default 30 min length.")
             return
 
-        url = f"{BASE_URL_V2}event-types/{self._event_type_id}"
-        self._log.info(f"Cal.com: Fetching event type from {url}")
-        
-        try:
-            async with self._http.get(url, headers=self._headers_v2(CAL_EVENT_TYPES_VERSION)) as resp:
-                txt = await resp.text()
-                if not resp.ok:
-                    self._log.warning(f"Cal.com: could not fetch event type ({resp.status}) {txt}")
-                    # If it's a 500 error, try different formats
-                    if resp.status == 500:
-                        # Try string format if it's currently an int
-                        if isinstance(self._event_type_id, int):
-                            self._log.info("Cal.com: Retrying with string format for event type ID")
-                            url_str = f"{BASE_URL_V2}event-types/{str(self._event_type_id)}"
-                            async with self._http.get(url_str, headers=self._headers_v2(CAL_EVENT_TYPES_VERSION)) as resp2:
-                                txt2 = await resp2.text()
-                                if not resp2.ok:
-                                    self._log.error("Cal.com: retry also failed (%s) %s", resp2.status, txt2)
-                                    raise Exception(f"Cal.com event type fetch failed: {resp2.status} - {txt2}")
-                                # Parse the retry response, not the original
-                                try:
-                                    data = await resp2.json()
-                                except Exception:
-                                    self._log.error("Cal.com: event type response not JSON: %s", txt2)
-                                    raise Exception("Cal.com event type response not valid JSON")
-                        else:
-                            # If it's already a string, try converting to int
-                            try:
-                                int_id = int(self._event_type_id)
-                                self._log.info("Cal.com: Retrying with integer format for event type ID")
-                                url_int = f"{BASE_URL_V2}event-types/{int_id}"
-                                async with self._http.get(url_int, headers=self._headers_v2(CAL_EVENT_TYPES_VERSION)) as resp2:
-                                    txt2 = await resp2.text()
-                                    if not resp2.ok:
-                                        self._log.error("Cal.com: retry also failed (%s) %s", resp2.status, txt2)
-                                        raise Exception(f"Cal.com event type fetch failed: {resp2.status} - {txt2}")
-                                    # Parse the retry response, not the original
-                                    try:
-                                        data = await resp2.json()
-                                    except Exception:
-                                        self._log.error("Cal.com: event type response not JSON: %s", txt2)
-                                        raise Exception("Cal.com event type response not valid JSON")
-                            except (ValueError, TypeError):
-                                # Can't convert to int, just fail
-                                raise Exception(f"Cal.com event type fetch failed: {resp.status} - {txt}")
-                    else:
-                        raise Exception(f"Cal.com event type fetch failed: {resp.status} - {txt}")
-                        
-                else:
-                    # Happy path: parse resp
-                    try:
-                        data = await resp.json()
-                    except Exception:
-                        self._log.error("Cal.com: event type response not JSON: %s", txt)
-                        raise Exception("Cal.com event type response not valid JSON")
-
-                self._log.info("Cal.com: Event type data received: %s", data)
-                length = (data.get("data") or {}).get("lengthInMinutes")
-                if isinstance(length, int) and length > 0:
-                    self._event_length = length
-                    self._log.info("Cal.com: event length set to %d minutes", self._event_length)
-                else:
-                    self._log.warning("Cal.com: no valid length found, using default 30 minutes")
-        except Exception as e:
-            self._log.error("Cal.com: Error during initialization: %s", str(e))
-            raise Exception(f"Cal.com calendar initialization failed: {str(e)}")
+        metadata = _event_type_cache.get(self._api_key, self._event_type_id)
+        if metadata is None:
+            try:
+                metadata = await _event_type_cache.refresh(self._api_key, self._event_type_id)
+            except Exception as e:
+                self._log.error("Cal.com: Error during initialization: %s", str(e))
+                raise Exception(f"Cal.com calendar initialization failed: {str(e)}")
+        if not metadata.valid:
+            raise Exception(f"Cal.com calendar initialization failed: event type {self._event_type_id} not accessible")
+        self._apply_event_type(metadata)
+
+    def _apply_event_type(self, metadata: "EventTypeMetadata") -> None:
+        if not metadata.valid:
+            # A refresh of a stale entry found the key revoked after this call got its booking tools
+            self._log.warning("Cal.com: event type %s not accessible; booking on this call will fail", self._event_type_id)
+            return
+        if metadata.valid and metadata.length_minutes != self._event_length:
+            self._event_length = metadata.length_minutes
+            self._log.info("Cal.com: event length set to %d minutes", self._event_length)
+
+    def _load_event_type(self) -> None:
+        """Take the event length from the cache and refresh it in the background if needed."""
+        metadata = _event_type_cache.get(self._api_key, self._event_type_id)
+        if metadata is not None:
+            self._apply_event_type(metadata)
+        if metadata is None or _event_type_cache.needs_refresh(metadata):
+            _event_type_cache.refresh_in_background(self._api_key, self._event_type_id, self._apply_event_type)
 
     # -------- availability: v1 /slots
 
@@ -0,0 +1,374 @@
+"""
+Write-behind writer for call history documents.
+
+A call document is appended to a local append-only spool file (fsynced) before
+it is acknowledged, then inserted into 'calls' in batches by a background task.
+Spool files left behind by crashed or killed worker processes are replayed on
+startup, and again whenever Mongo recovers from an outage.
+
+Network errors and timeouts are retried. Documents Mongo will never accept
+(validation errors, documents over 16 MB) are moved to a dead-letter file
+under <spool dir>/dead_letter instead, so they cannot block the documents
+queued behind them.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
+
+from utils.latency_logger import increment_counter, set_gauge, observe
+
+try:
+    from bson import json_util
+    from bson.errors import InvalidDocument
+except ImportError:
+    json_util = None
+    InvalidDocument = None
+
+try:
+    from pymongo.errors import DocumentTooLarge, OperationFailure
+except ImportError:
+    DocumentTooLarge = None
+    OperationFailure = None
+
+logger = logging.getLogger(__name__)
+
+SPOOL_PREFIX = "calls-"
+SPOOL_SUFFIX = ".jsonl"
+REPLAY_SUFFIX = ".replaying"
+DEAD_LETTER_DIR = "dead_letter"
+
+# Server error codes worth retrying (pymongo's retryable write codes, plus timeouts and write concern)
+RETRYABLE_WRITE_CODES = {6, 7, 50, 64, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+
+@dataclass
+class CallHistoryWriterConfig:
+    """Call history writer configuration settings."""
+    enabled: bool = True
+    spool_dir: str = "data/call_history_spool"
+    batch_size: int = 50
+    flush_interval_seconds: float = 0.5
+    max_backoff_seconds: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "CallHistoryWriterConfig":
+        return cls(
+            enabled=os.getenv("CALL_HISTORY_WRITE_BEHIND", "true").lower() == "true",
+            spool_dir=os.getenv("CALL_HISTORY_SPOOL_DIR", "data/call_history_spool"),
+            batch_size=int(os.getenv("CALL_HISTORY_BATCH_SIZE", "50")),
+            flush_interval_seconds=float(os.getenv("CALL_HISTORY_FLUSH_INTERVAL_SECONDS", "0.5")),
+            max_backoff_seconds=float(os.getenv("CALL_HISTORY_MAX_BACKOFF_SECONDS", "30")),
+        )
+
+
+class CallHistoryWriter:
+    """Durable, batching writer for the 'calls' collection."""
+
+    def __init__(self, db_client, config: Optional[CallHistoryWriterConfig] = None):
+        self.db_client = db_client
+        self.config = config or CallHistoryWriterConfig.from_env()
+        self._queue: List[Dict[str, Any]] = []
+        self._spool_path: Optional[str] = None
+        self._spool_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # -------- public API
+
+    async def submit(self, call_doc: Dict[str, Any]) -> bool:
+        """
+        Durably accept a call document for writing.
+
+        Returns once the document is on disk in the spool; the insert into
+        Mongo happens in the background.
+        """
+        line = json_util.dumps(call_doc) + "\n"
+        try:
+            async with self._spool_lock:
+                await asyncio.to_thread(self._append_to_spool, line)
+                self._queue.append(call_doc)
+        except Exception as e:
+            # Without a spool the document is still written, just not crash-safe
+            logger.error(f"CALL_HISTORY_SPOOL_ERROR | call_id={call_doc.get('call_id')} | error={str(e)}")
+            self._queue.append(call_doc)
+
+        self._drained.clear()
+        set_gauge("call_history.queue_depth", len(self._queue))
+        increment_counter("call_history.submitted")
+        self._ensure_flush_task()
+        self._wakeup.set()
+        return True
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted document is stored in Mongo."""
+        if not self._queue:
+            return True
+        self._ensure_flush_task()
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    # -------- background flushing
+
+    def _ensure_flush_task(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        backoff = 1.0
+        recovering = False
+        while True:
+            if not self._queue:
+                await self._wakeup.wait()
+            self._wakeup.clear()
+            # Let concurrent shutdowns join the same batch
+            await asyncio.sleep(self.config.flush_interval_seconds)
+
+            try:
+                await self._flush_batches()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                increment_counter("call_history.flush_failures")
+                logger.error(f"CALL_HISTORY_FLUSH_FAILED | queued={len(self._queue)} | error={str(e)} | retry_in={backoff}s")
+                recovering = True
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.config.max_backoff_seconds)
+                continue
+
+            backoff = 1.0
+            if recovering:
+                recovering = False
+                # Other processes may have died with spooled documents during the outage
+                await self.replay_spool()
+
+    async def _flush_batches(self) -> None:
+        while self._queue:
+            batch = self._queue[:self.config.batch_size]
+            start = time.perf_counter()
+            written, retry = await self._insert_batch(batch)
+            observe("call_history.flush_ms", (time.perf_counter() - start) * 1000)
+            increment_counter("call_history.written", len(written))
+
+            self._queue = retry + self._queue[len(batch):]
+            set_gauge("call_history.queue_depth", len(self._queue))
+            logger.info(f"CALL_HISTORY_FLUSHED | written={len(written)} | queued={len(self._queue)}")
+            if retry:
+                raise RuntimeError(f"{len(retry)} call documents were not written")
+
+        async with self._spool_lock:
+            if not self._queue:
+                # Everything in the spool is now in Mongo
+                await asyncio.to_thread(self._discard_spool)
+                self._drained.set()
+
+    async def _insert_batch(self, batch: List[Dict[str, Any]]) -> Tuple[set, List[Dict[str, Any]]]:
+        """
+        Insert a batch, dead-lettering documents that can never be written.
+
+        Returns:
+            (_ids written, documents to retry)
+
+        Raises:
+            Exception: Retryable errors that failed the whole batch (e.g. Mongo is down)
+        """
+        failures: Dict[Any, Any] = {}
+        try:
+            written = set(await self.db_client.insert_call_documents(batch, failures))
+        except Exception as e:
+            if not _is_permanent_error(e):
+                raise
+            # One bad document fails the whole batch client-side; find it
+            written = set()
+            for doc in batch:
+                try:
+                    written.update(await self.db_client.insert_call_documents([doc], failures))
+                except Exception as doc_error:
+                    if not _is_permanent_error(doc_error):
+                        raise
+                    failures[doc["_id"]] = doc_error
+
+        retry, dead = [], []
+        for doc in batch:
+            if doc["_id"] in written:
+                continue
+            failure = failures.get(doc["_id"])
+            if failure is None or (isinstance(failure, int) and failure in RETRYABLE_WRITE_CODES):
+                retry.append(doc)
+            else:
+                dead.append((doc, failure))
+        if dead:
+            await asyncio.to_thread(self._dead_letter, dead)
+        return written, retry
+
+    def _dead_letter(self, failed: List[Tuple[Dict[str, Any], Any]]) -> None:
+        """Append documents Mongo rejected for good to this process's dead-letter file."""
+        directory = os.path.join(self.config.spool_dir, DEAD_LETTER_DIR)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{SPOOL_PREFIX}{os.getpid()}{SPOOL_SUFFIX}")
+        with open(path, "a", encoding="utf-8") as f:
+            for doc, failure in failed:
+                error = f"code {failure}" if isinstance(failure, int) else (str(failure) or type(failure).__name__)
+                f.write(json_util.dumps({"error": error, "failed_at": time.time(), "document": doc}) + "\n")
+                logger.error(f"CALL_HISTORY_DEAD_LETTERED | call_id={doc.get('call_id')} | error={error[:200]}")
+            f.flush()
+            os.fsync(f.fileno())
+        increment_counter("call_history.dead_lettered", len(failed))
+
+    # -------- spool files
+
+    def _append_to_spool(self, line: str) -> None:
+        if self._spool_path is None:
+            os.makedirs(self.config.spool_dir, exist_ok=True)
+            name = f"{SPOOL_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}{SPOOL_SUFFIX}"
+            self._spool_path = os.path.join(self.config.spool_dir, name)
+        with open(self._spool_path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _discard_spool(self) -> None:
+        if self._spool_path is None:
+            return
+        try:
+            os.remove(self._spool_path)
+        except FileNotFoundError:
+            pass
+        self._spool_path = None
+
+    async def replay_spool(self) -> int:
+        """
+        Insert documents from spool files left behind by dead worker processes.
+
+        Returns:
+            Number of documents replayed
+        """
+        if not os.path.isdir(self.config.spool_dir):
+            return 0
+
+        replayed = 0
+        for name in sorted(os.listdir(self.config.spool_dir)):
+            path = os.path.join(self.config.spool_dir, name)
+            claimed = self._claim_spool_file(path, name)
+            if claimed is None:
+                continue
+
+            try:
+                docs = await asyncio.to_thread(_read_spool_file, claimed)
+                for i in range(0, len(docs), self.config.batch_size):
+                    batch = docs[i:i + self.config.batch_size]
+                    # Documents Mongo rejects for good are dead-lettered, not retried
+                    written, retry = await self._insert_batch(batch)
+                    replayed += len(written)
+                    if retry:
+                        raise RuntimeError(f"{len(retry)} call documents were not written")
+                os.remove(claimed)
+            except Exception as e:
+                # Retryable (Mongo unavailable): release the file so a later replay picks it
+                # up again, and stop - the remaining files would fail the same way
+                logger.error(f"CALL_HISTORY_REPLAY_FAILED | file={name} | error={str(e)}")
+                os.rename(claimed, claimed[:-len(REPLAY_SUFFIX)].rsplit(".", 1)[0])
+                break
+
+        if replayed:
+            increment_counter("call_history.replayed", replayed)
+            logger.info(f"CALL_HISTORY_REPLAYED | documents={replayed}")
+        return replayed
+
+    def _claim_spool_file(self, path: str, name: str) -> Optional[str]:
+        """Rename an orphaned spool file to '<spool>.<pid>.replaying' so only one process replays it."""
+        if path == self._spool_path or not name.startswith(SPOOL_PREFIX):
+            return None
+
+        if name.endswith(REPLAY_SUFFIX):
+            # Claimed by another replayer; take it over only if that process died
+            base, pid = path[:-len(REPLAY_SUFFIX)].rsplit(".", 1)
+            if not pid.isdigit() or _pid_alive(int(pid)):
+                return None
+        elif name.endswith(SPOOL_SUFFIX):
+            # Still being written by a live worker process
+            pid = name[len(SPOOL_PREFIX):].split("-", 1)[0]
+            if pid.isdigit() and int(pid) != os.getpid() and _pid_alive(int(pid)):
+                return None
+            base = path
+        else:
+            return None
+
+        claimed = f"{base}.{os.getpid()}{REPLAY_SUFFIX}"
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            # Another process claimed it first
+            return None
+        return claimed
+
+
+def _is_permanent_error(error: Exception) -> bool:
+    """Whether an insert error will repeat on every retry (bad document rather than bad connection)."""
+    if InvalidDocument is not None and isinstance(error, InvalidDocument):
+        return True
+    if DocumentTooLarge is not None and isinstance(error, DocumentTooLarge):
+        return True
+    if OperationFailure is not None and isinstance(error, OperationFailure):
+        if error.has_error_label("RetryableWriteError"):
+            return False
+        write_errors = (error.details or {}).get("writeErrors") if isinstance(error.details, dict) else None
+        if write_errors:
+            # Bulk write (e.g. transcript chunks): permanent only if no document can succeed on retry
+            return all(err.get("code") not in RETRYABLE_WRITE_CODES for err in write_errors)
+        return error.code is not None and error.code not in RETRYABLE_WRITE_CODES
+    return False
+
+
+def _read_spool_file(path: str) -> List[Dict[str, Any]]:
+    docs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                docs.append(json_util.loads(line))
+            except ValueError:
+                # A torn final line from a crash mid-write was never acknowledged
+                logger.warning(f"CALL_HISTORY_SPOOL_CORRUPT_LINE | file={os.path.basename(path)}")
+    return docs
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Global call history writer
+_call_history_writer: Optional[CallHistoryWriter] = None
+
+
+def get_call_history_writer(db_client=None) -> Optional[CallHistoryWriter]:
+    """Get the global call history writer, or None when write-behind is disabled."""
+    global _call_history_writer
+    if _call_history_writer is None:
+        config = CallHistoryWriterConfig.from_env()
+        if not config.enabled or db_client is None or json_util is None:
+            return None
+        _call_history_writer = CallHistoryWriter(db_client, config)
+    return _call_history_writer
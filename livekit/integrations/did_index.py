@@ -0,0 +1,234 @@
+"""
+In-memory DID routing index: E.164-normalized phone number -> inbound assistant id.
+
+Loaded once per job process (in the background of its first call) from the 'phonenumbers' and
+'phone_numbers' collections and kept fresh by a change stream, or by periodic
+reloads when change streams are not available. Routes resolved by the database
+fallback are remembered with their assistant and dropped when the assistant
+cache reports a change to that assistant, or on the next full load.
+"""
+
+import os
+import re
+import asyncio
+import logging
+from typing import Optional, Dict, Any, Tuple
+
+from integrations.assistant_cache import get_assistant_cache
+from utils.latency_logger import increment_counter
+
+logger = logging.getLogger(__name__)
+
+# 'phonenumbers' is the mongoose collection and wins over the legacy one
+PRIMARY_COLLECTION = "phonenumbers"
+LEGACY_COLLECTION = "phone_numbers"
+
+
+def normalize_e164(number: Optional[str], default_country_code: str = "1") -> Optional[str]:
+    """
+    Normalize a phone number to E.164 ('+<country><national>').
+
+    Accepts '+', '00' and national formats, punctuation and tel:/sip: URIs, so
+    '+1 (201) 765-6193', '12017656193', '2017656193' and 'sip:+12017656193@host'
+    all map to '+12017656193' with the default country code '1'.
+
+    Args:
+        number: Raw phone number
+        default_country_code: Country code assumed for national formats
+
+    Returns:
+        E.164 number or None if it cannot be normalized
+    """
+    if not number:
+        return None
+
+    raw = str(number).strip()
+    if raw.lower().startswith(("tel:", "sip:")):
+        raw = raw.split(":", 1)[1].split("@", 1)[0]
+
+    digits = re.sub(r"\D", "", raw)
+    if not digits:
+        return None
+
+    if raw.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif default_country_code == "1" and len(digits) == 10:
+        digits = "1" + digits
+    elif default_country_code != "1" and digits.startswith("0"):
+        # National trunk prefix, e.g. UK '020 7946 0958' -> '+44 20 7946 0958'
+        digits = default_country_code + digits[1:]
+
+    if not 7 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+class DidRoutingIndex:
+    """Maps normalized DIDs to inbound assistant ids."""
+
+    def __init__(self, default_country_code: Optional[str] = None, reload_interval_seconds: Optional[float] = None):
+        self.default_country_code = (default_country_code or os.getenv("DID_DEFAULT_COUNTRY_CODE", "1")).lstrip("+")
+        self.reload_interval_seconds = reload_interval_seconds or float(os.getenv("DID_INDEX_RELOAD_INTERVAL_SECONDS", "60"))
+        # Per collection: e164 -> assistant id, plus phone doc id -> e164 for deletes
+        self._routes: Dict[str, Dict[str, str]] = {PRIMARY_COLLECTION: {}, LEGACY_COLLECTION: {}}
+        self._doc_keys: Dict[Tuple[str, str], str] = {}
+        # Routes resolved outside the index: e164 -> owning assistant id
+        self._learned: Dict[str, str] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+        self.loaded = False
+        get_assistant_cache().add_invalidation_listener(self._on_assistant_changed)
+
+    def normalize(self, number: Optional[str]) -> Optional[str]:
+        return normalize_e164(number, self.default_country_code)
+
+    def lookup(self, number: str) -> Optional[str]:
+        """Return the assistant id routed to this number, if known."""
+        key = self.normalize(number)
+        if not key:
+            return None
+        assistant_id = (
+            self._routes[PRIMARY_COLLECTION].get(key)
+            or self._routes[LEGACY_COLLECTION].get(key)
+            or self._learned.get(key)
+        )
+        increment_counter("did_index.hits" if assistant_id else "did_index.misses")
+        return assistant_id
+
+    def learn(self, number: str, assistant_id: str) -> None:
+        """Record a mapping resolved outside the index (e.g. by a database fallback)."""
+        key = self.normalize(number)
+        if key and assistant_id and not self.lookup_exists(key):
+            self._learned[key] = str(assistant_id)
+
+    def lookup_exists(self, key: str) -> bool:
+        return key in self._routes[PRIMARY_COLLECTION] or key in self._routes[LEGACY_COLLECTION] or key in self._learned
+
+    def __len__(self) -> int:
+        return len(self._routes[PRIMARY_COLLECTION]) + len(self._routes[LEGACY_COLLECTION]) + len(self._learned)
+
+    def _on_assistant_changed(self, assistant_id: str, reason: str) -> None:
+        # The assistant may have given up the number; the next call resolves it again
+        stale = [key for key, owner in self._learned.items() if owner == assistant_id]
+        for key in stale:
+            del self._learned[key]
+        if stale:
+            logger.info(f"DID_INDEX_LEARNED_DROPPED | assistant_id={assistant_id} | reason={reason} | numbers={len(stale)}")
+
+    # -------- incremental updates
+
+    def apply_document(self, collection: str, doc: Dict[str, Any]) -> None:
+        """Insert or update the route for a phone number document."""
+        doc_key = (collection, str(doc.get("_id")))
+        self.remove_document(collection, doc.get("_id"))
+
+        key = self.normalize(doc.get("number"))
+        assistant_id = doc.get("inboundAssistantId")
+        if not key or not assistant_id:
+            return
+        # The document is authoritative from now on
+        self._learned.pop(key, None)
+        self._routes[collection][key] = str(assistant_id)
+        self._doc_keys[doc_key] = key
+
+    def remove_document(self, collection: str, doc_id: Any) -> None:
+        """Drop the route previously added for a phone number document."""
+        key = self._doc_keys.pop((collection, str(doc_id)), None)
+        if key:
+            self._routes[collection].pop(key, None)
+            self._learned.pop(key, None)
+
+    # -------- loading
+
+    async def load(self, db) -> None:
+        """(Re)build the whole index from both phone number collections."""
+        routes = {PRIMARY_COLLECTION: {}, LEGACY_COLLECTION: {}}
+        doc_keys = {}
+        for collection in (PRIMARY_COLLECTION, LEGACY_COLLECTION):
+            cursor = db[collection].find(
+                {"inboundAssistantId": {"$nin": [None, ""]}},
+                {"number": 1, "inboundAssistantId": 1},
+            )
+            async for doc in cursor:
+                key = self.normalize(doc.get("number"))
+                if key:
+                    routes[collection][key] = str(doc["inboundAssistantId"])
+                    doc_keys[(collection, str(doc["_id"]))] = key
+
+        self._routes = routes
+        self._doc_keys = doc_keys
+        self._learned = {}
+        self.loaded = True
+        logger.info(f"DID_INDEX_LOADED | numbers={len(self)}")
+
+    def ensure_watcher(self, db) -> None:
+        """Load (if needed) and keep the index fresh on the running loop."""
+        if db is None:
+            return
+        if self._watch_task is not None and not self._watch_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._watch_task = loop.create_task(self._watch(db))
+
+    async def _watch(self, db) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                if not self.loaded:
+                    await self.load(db)
+                await self._watch_change_stream(db)
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                code = getattr(e, "code", None)
+                if code in (40573, 40324) or "replica set" in str(e).lower():
+                    logger.warning(f"DID_INDEX_CHANGE_STREAM_UNAVAILABLE | error={str(e)} | falling back to periodic reload")
+                    await self._reload_periodically(db)
+                    return
+                logger.error(f"DID_INDEX_WATCH_ERROR | error={str(e)} | retry_in={backoff}s")
+                # Reload after reconnecting in case changes were missed
+                self.loaded = False
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def _watch_change_stream(self, db) -> None:
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": [PRIMARY_COLLECTION, LEGACY_COLLECTION]},
+            "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+        }}]
+        async with db.watch(pipeline, full_document="updateLookup") as stream:
+            logger.info("DID_INDEX_CHANGE_STREAM_STARTED")
+            async for change in stream:
+                collection = (change.get("ns") or {}).get("coll")
+                doc_id = (change.get("documentKey") or {}).get("_id")
+                full_doc = change.get("fullDocument")
+                if change.get("operationType") == "delete" or not full_doc:
+                    self.remove_document(collection, doc_id)
+                else:
+                    self.apply_document(collection, full_doc)
+                increment_counter("did_index.updates")
+
+    async def _reload_periodically(self, db) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval_seconds)
+            try:
+                await self.load(db)
+            except Exception as e:
+                logger.error(f"DID_INDEX_RELOAD_ERROR | error={str(e)}")
+
+
+# Global DID routing index
+_did_index: Optional[DidRoutingIndex] = None
+
+
+def get_did_index() -> DidRoutingIndex:
+    """Get the global DID routing index."""
+    global _did_index
+    if _did_index is None:
+        _did_index = DidRoutingIndex()
+    return _did_index
@@ -0,0 +1,90 @@
+"""
+Minutes ledger: atomic, coalesced deductions from users' minute balances.
+
+Deductions for the same user that arrive within a short window are summed and
+applied with a single $inc, so a hot tenant ending many calls at once costs one
+round trip instead of one per call.
+"""
+
+import os
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+
+from config.database import minutes_to_deduct
+from utils.latency_logger import increment_counter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingDeduction:
+    future: asyncio.Future
+    minutes: int = 0
+    count: int = 0
+
+
+class MinutesLedger:
+    """Coalesces per-user minute deductions into one atomic update per window."""
+
+    def __init__(self, db_client, window_seconds: Optional[float] = None):
+        self.db_client = db_client
+        self.window_seconds = (
+            window_seconds if window_seconds is not None
+            else float(os.getenv("MINUTES_LEDGER_WINDOW_MS", "50")) / 1000
+        )
+        self._pending: Dict[str, _PendingDeduction] = {}
+
+    async def deduct(self, user_id: str, minutes: float) -> Dict[str, Any]:
+        """
+        Deduct a call's minutes (rounded up) from the user's balance.
+
+        Returns:
+            The same shape as DatabaseClient.deduct_minutes, with totals after
+            every deduction coalesced into the same update
+        """
+        whole_minutes = minutes_to_deduct(minutes)
+        if self.window_seconds <= 0:
+            return await self.db_client.increment_minutes_used(user_id, whole_minutes)
+
+        pending = self._pending.get(user_id)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = _PendingDeduction(future=loop.create_future())
+            self._pending[user_id] = pending
+            loop.create_task(self._commit_after_window(user_id))
+
+        pending.minutes += whole_minutes
+        pending.count += 1
+
+        # Shield so one cancelled caller does not cancel the shared update
+        result = await asyncio.shield(pending.future)
+        return {**result, "minutes_deducted": whole_minutes}
+
+    async def _commit_after_window(self, user_id: str) -> None:
+        await asyncio.sleep(self.window_seconds)
+        pending = self._pending.pop(user_id)
+
+        try:
+            result = await self.db_client.increment_minutes_used(user_id, pending.minutes)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+
+        increment_counter("minutes_ledger.commits")
+        if pending.count > 1:
+            increment_counter("minutes_ledger.coalesced", pending.count - 1)
+            logger.info(f"MINUTES_LEDGER_COALESCED | user={user_id} | deductions={pending.count} | minutes={pending.minutes}")
+        pending.future.set_result(result)
+
+
+# Global minutes ledger
+_minutes_ledger: Optional[MinutesLedger] = None
+
+
+def get_minutes_ledger(db_client) -> MinutesLedger:
+    """Get the global minutes ledger."""
+    global _minutes_ledger
+    if _minutes_ledger is None:
+        _minutes_ledger = MinutesLedger(db_client)
+    return _minutes_ledger
@@ -2,14 +2,26 @@
 MongoDB client wrapper for database operations.
 """
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from config.database import DatabaseClient, get_database_client
+from integrations.assistant_cache import get_assistant_cache
+from integrations.did_index import get_did_index
+from integrations.call_history_writer import get_call_history_writer
 from utils.latency_logger import measure_latency_context
 try:
     from bson import ObjectId
 except ImportError:
     ObjectId = None
+try:
+    from pymongo import ReturnDocument
+except ImportError:
+    ReturnDocument = None
+
+# Background loads of heavy assistant sections, keyed by (assistant id, updated_at)
+_section_loads: Dict[Tuple[str, str], asyncio.Task] = {}
+
 
 class MongoClient:
     """MongoDB client wrapper for LiveKit voice agent."""
@@ -38,12 +50,70 @@ class MongoClient:
             self.logger.warning("Database client not available")
             return None
         
+        cache = get_assistant_cache()
+        cache.ensure_watcher(self.db)
+        cached = cache.get(assistant_id)
+        if cached is not None:
+            self.logger.info(f"ASSISTANT_CACHE_HIT | assistant_id={assistant_id}")
+            self.prefetch_assistant_sections(cached)
+            return cached
+        
         call_id = f"mongo_fetch_{assistant_id}"
         
         async with measure_latency_context("mongo_fetch_assistant", call_id, {
             "assistant_id": assistant_id
         }):
-            return await self.db_client.fetch_assistant(assistant_id)
+            config = await self.db_client.fetch_assistant_core(assistant_id)
+        
+        if config:
+            cache.put(assistant_id, config)
+            self.prefetch_assistant_sections(config)
+        return config
+
+    def prefetch_assistant_sections(self, config: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """Start loading the heavy sections left out of the core fetch, if needed."""
+        if config.get("sections_loaded", True) or not config.get("id"):
+            return None
+        
+        key = (config["id"], str(config.get("updated_at")))
+        task = _section_loads.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(
+                self._load_assistant_sections(config["id"], config.get("updated_at"))
+            )
+            _section_loads[key] = task
+            task.add_done_callback(lambda _: _section_loads.pop(key, None))
+        return task
+
+    async def _load_assistant_sections(self, assistant_id: str, updated_at: Any) -> Optional[Dict[str, Any]]:
+        async with measure_latency_context("mongo_fetch_assistant_sections", f"mongo_sections_{assistant_id}", {
+            "assistant_id": assistant_id
+        }):
+            sections = await self.db_client.fetch_assistant_sections(assistant_id)
+        
+        if sections is None:
+            return None
+        # A newer version is handled by cache invalidation; only cache matching versions
+        if sections.pop("updated_at", None) == updated_at:
+            get_assistant_cache().merge(assistant_id, {**sections, "sections_loaded": True}, updated_at)
+        return sections
+
+    async def ensure_assistant_sections(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in the lazily loaded heavy sections on this config (in place)."""
+        if config.get("sections_loaded", True):
+            return config
+        
+        task = self.prefetch_assistant_sections(config)
+        try:
+            sections = await task if task else None
+        except Exception as e:
+            self.logger.error(f"ASSISTANT_SECTIONS_LOAD_FAILED | assistant_id={config.get('id')} | error={str(e)}")
+            sections = None
+        
+        if sections:
+            config.update(sections)
+            config["sections_loaded"] = True
+        return config
             
     async def fetch_assistant_by_phone(self, phone_number: str) -> Optional[Dict[str, Any]]:
         """Fetch assistant configuration by phone number."""
@@ -51,11 +121,33 @@ class MongoClient:
             self.logger.warning("Database client not available")
             return None
             
+        # Index hit: a dict lookup plus a (usually cached) config fetch
+        did_index = get_did_index()
+        did_index.ensure_watcher(self.db)
+        assistant_id = did_index.lookup(phone_number)
+        if assistant_id:
+            config = await self.fetch_assistant(assistant_id)
+            if config:
+                return config
+            
         call_id = f"mongo_fetch_phone_{phone_number}"
         async with measure_latency_context("mongo_fetch_assistant_by_phone", call_id, {
             "phone_number": phone_number
         }):
-            return await self.db_client.fetch_assistant_by_phone(phone_number)
+            config = await self.db_client.fetch_assistant_by_phone(phone_number)
+        
+        if config and config.get("id"):
+            get_assistant_cache().put(config["id"], config)
+            did_index.learn(phone_number, config["id"])
+        return config
+    
+    async def load_did_index(self) -> int:
+        """Build the DID routing index now (called by the first call's background warmup)."""
+        if not self.is_available():
+            return 0
+        did_index = get_did_index()
+        await did_index.load(self.db)
+        return len(did_index)
     
     async def save_call_history(
         self,
@@ -82,31 +174,59 @@ class MongoClient:
             self.logger.warning("Database client not available")
             return False
         
+        call_doc = self.db_client.build_call_document(
+            call_id=call_id,
+            assistant_id=assistant_id,
+            called_did=called_did,
+            call_duration=call_duration,
+            call_status=call_status,
+            transcription=transcription,
+            participant_identity=participant_identity,
+            recording_sid=recording_sid,
+            call_sid=call_sid,
+            user_id=user_id,
+            start_time=start_time,
+            end_time=end_time,
+            call_summary=call_summary,
+            structured_data=structured_data,
+            analysis=analysis,
+            client_name=client_name,
+            client_email=client_email
+        )
+        
         async with measure_latency_context("mongo_save_call_history", call_id, {
             "assistant_id": assistant_id,
             "call_duration": call_duration,
             "transcription_length": len(transcription),
             "has_recording": bool(recording_sid)
         }):
-            return await self.db_client.save_call_history(
-                call_id=call_id,
-                assistant_id=assistant_id,
-                called_did=called_did,
-                call_duration=call_duration,
-                call_status=call_status,
-                transcription=transcription,
-                participant_identity=participant_identity,
-                recording_sid=recording_sid,
-                call_sid=call_sid,
-                user_id=user_id,
-                start_time=start_time,
-                end_time=end_time,
-                call_summary=call_summary,
-                structured_data=structured_data,
-                analysis=analysis,
-                client_name=client_name,
-                client_email=client_email
-            )
+            writer = get_call_history_writer(self.db_client)
+            if writer is not None:
+                # Acknowledged once spooled to disk; inserted in the background
+                return await writer.submit(call_doc)
+            
+            try:
+                written = await self.db_client.insert_call_documents([call_doc])
+                return bool(written)
+            except Exception as e:
+                self.logger.error(f"Error saving call history: {e}")
+                return False
+
+    async def flush_call_history(self, timeout: Optional[float] = None) -> bool:
+        """Wait until call history submitted by this process is stored in Mongo."""
+        writer = get_call_history_writer(self.db_client)
+        if writer is None:
+            return True
+        return await writer.flush(timeout=timeout)
+
+    async def replay_call_history_spool(self) -> int:
+        """Insert call history left in the spool by dead worker processes."""
+        if not self.is_available():
+            return 0
+        writer = get_call_history_writer(self.db_client)
+        if writer is None:
+            return 0
+        return await writer.replay_spool()
 
     async def save_n8n_spreadsheet_id(self, assistant_id: str, spreadsheet_id: str) -> bool:
         """Save N8N spreadsheet ID for assistant."""
@@ -136,3 +256,87 @@ class MongoClient:
         except Exception as e:
             self.logger.error(f"Error saving N8N spreadsheet ID: {e}")
             return False
+
+    async def add_learned_endpointing_counts(
+        self, assistant_id: str, configured_min: float, configured_max: float, counts: Dict[str, float]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Add a call's endpointing counters to the assistant (see services/endpointing.py).
+
+        Returns:
+            The learned state after the increment, or None if it could not be saved
+        """
+        if not self.is_available():
+            return None
+
+        if ObjectId is None or ReturnDocument is None or not ObjectId.is_valid(assistant_id):
+            return None
+
+        prefix = "advancedSettings.learnedEndpointing"
+        same_settings = {f"{prefix}.configured_min_delay": configured_min, f"{prefix}.configured_max_delay": configured_max}
+        try:
+            # updatedAt is left alone: learned delays are not an edit of the assistant
+            for _ in range(2):
+                doc = await self.db["assistants"].find_one_and_update(
+                    {"_id": ObjectId(assistant_id), **same_settings},
+                    # window_epoch += 0 creates it on state saved before it existed
+                    {"$inc": {**{f"{prefix}.{name}": value for name, value in counts.items()}, f"{prefix}.window_epoch": 0}},
+                    projection={prefix: 1},
+                    return_document=ReturnDocument.AFTER,
+                )
+                if doc is not None:
+                    return doc["advancedSettings"]["learnedEndpointing"]
+
+                # Nothing learned yet, or the configured delays were edited: start over from
+                # this call's counts unless another worker just did. A null advancedSettings
+                # cannot take a dotted $set, so it becomes an empty object first
+                await self.db["assistants"].update_one(
+                    {"_id": ObjectId(assistant_id), "advancedSettings": {"$type": "null"}},
+                    {"$set": {"advancedSettings": {}}}
+                )
+                learned = {
+                    "configured_min_delay": configured_min,
+                    "configured_max_delay": configured_max,
+                    "min_delay": configured_min,
+                    "max_delay": configured_max,
+                    "window_epoch": 0,
+                    **counts,
+                }
+                result = await self.db["assistants"].update_one(
+                    {"_id": ObjectId(assistant_id), "$or": [{name: {"$ne": value}} for name, value in same_settings.items()]},
+                    {"$set": {prefix: learned}}
+                )
+                if result.modified_count:
+                    self.logger.info(f"LEARNED_ENDPOINTING_RESET | assistant_id={assistant_id} | min_delay={configured_min}")
+                    return learned
+            return None
+        except Exception as e:
+            self.logger.error(f"LEARNED_ENDPOINTING_SAVE_FAILED | assistant_id={assistant_id} | error={str(e)}")
+            return None
+
+    async def close_learned_endpointing_window(
+        self, assistant_id: str, epoch: int, set_fields: Dict[str, Any], inc_fields: Dict[str, float]
+    ) -> bool:
+        """Save the delays decided for a full window; False if another worker closed it first."""
+        if not self.is_available():
+            return False
+
+        if ObjectId is None or not ObjectId.is_valid(assistant_id):
+            return False
+
+        prefix = "advancedSettings.learnedEndpointing"
+        try:
+            result = await self.db["assistants"].update_one(
+                {"_id": ObjectId(assistant_id), f"{prefix}.window_epoch": epoch},
+                {
+                    "$set": {f"{prefix}.{name}": value for name, value in set_fields.items()},
+                    "$inc": {f"{prefix}.{name}": value for name, value in inc_fields.items()},
+                }
+            )
+            if not result.modified_count:
+                return False
+            self.logger.info(f"LEARNED_ENDPOINTING_SAVED | assistant_id={assistant_id} | min_delay={set_fields.get('min_delay')} | epoch={epoch + 1}")
+            return True
+        except Exception as e:
+            self.logger.error(f"LEARNED_ENDPOINTING_SAVE_FAILED | assistant_id={assistant_id} | error={str(e)}")
+            return False
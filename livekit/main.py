@@ -7,14 +7,14 @@ from __future__ import annotations
 
 import logging
 import os
+import socket
 import sys
 import json
+import time
 import asyncio
 import datetime
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
-import httpx
-from openai import AsyncOpenAI
 
 # Load environment variables from the livekit/.env file
 load_dotenv("livekit/.env")
@@ -36,6 +36,7 @@ from livekit.agents import (
     RoomOutputOptions,
     AutoSubscribe,
 )
+from livekit.agents import llm as agents_llm, stt as agents_stt, tts as agents_tts
 
 try:
     from livekit.agents import BackgroundAudioPlayer, AudioConfig, BuiltinAudioClip
@@ -46,42 +47,21 @@ except ImportError:
     BuiltinAudioClip = None  # type: ignore
     BACKGROUND_AUDIO_SUPPORTED = False
 
-# Plugin imports
-from livekit.plugins import openai, silero
-from livekit.agents.tts import FallbackAdapter
-
-
-
-
-
-
-
-
-
-try:
-    from livekit.plugins import deepgram as lk_deepgram
-    DEEPGRAM_AVAILABLE = True
-except ImportError:
-    lk_deepgram = None
-    DEEPGRAM_AVAILABLE = False
-
-try:
-    from livekit.plugins import cartesia as lk_cartesia
-    CARTESIA_AVAILABLE = True
-except ImportError:
-    lk_cartesia = None
-    CARTESIA_AVAILABLE = False
-except Exception:
-    lk_cartesia = None
-    CARTESIA_AVAILABLE = False
-
-
-
 # Local imports
 from services.call_outcome_service import CallOutcomeService
 from services.agent_factory import AgentFactory
 from services.config_resolver import ConfigResolver
+from services.assistant_profile import AssistantProfile, get_assistant_profile
+from services.quota_gate import get_quota_gate
+from services.provider_pool import get_provider_pool, close_instance
+from services.provider_health import get_provider_health
+from services.endpointing import get_endpointing_controller
+from services.worker_load import get_worker_load, get_loop_lag_monitor
+from services.audio_cache import VoiceSpec, get_audio_cache
+from services.setup_pipeline import SetupPipeline, SetupAborted
+from services.provider_registry import load_plugin, load_provider, plugin_available, load_all_plugins
 from integrations.mongo_client import MongoClient
+from integrations.minutes_ledger import get_minutes_ledger
 from integrations.calendar_api import CalComCalendar, CalendarResult, CalendarError
 from config.database import get_database_client
 from utils.logging_hardening import configure_safe_logging
@@ -89,9 +69,11 @@ from utils.latency_logger import (
     measure_latency_context, 
     get_tracker, 
     clear_tracker,
+    log_metrics_snapshot,
+    observe,
     LatencyProfiler
 )
-from utils.data_extractors import extract_phone_from_room, extract_name_from_summary, extract_call_sid_from_metadata
+from utils.data_extractors import extract_phone_from_room, extract_name_from_summary, extract_call_sid_from_metadata, get_room_name, get_room_metadata
 
 # Configure logging with security hardening
 configure_safe_logging(level=logging.INFO)
@@ -158,21 +140,47 @@ def _build_background_ambient_config(setting: Optional[str]):
     return None
 
 # ---- Shared OpenAI client & HTTP transport (used by all OpenAI calls) ----
-_HTTP_TIMEOUT = httpx.Timeout(connect=5.0, read=60.0, write=30.0, pool=30.0)  # Increased read timeout
-_HTTP_CLIENT = httpx.AsyncClient(timeout=_HTTP_TIMEOUT)
-
-_OPENAI_CLIENT = AsyncOpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    http_client=_HTTP_CLIENT,  # ensures streaming reads don't hit short defaults
-    timeout=60.0,              # increased overall guard for better reliability
-    max_retries=5,             # increased retries for better resilience (was 3)
-    default_headers={
-        "User-Agent": "LiveKit-Agent/1.0",
-    },
-)
+# Built on first use so importing the worker doesn't load the OpenAI SDK and httpx
+_OPENAI_CLIENT = None
+_OPENAI_PLUGIN_CLIENT = None
+
+
+def get_openai_client():
+    """Shared AsyncOpenAI client (created on first use)."""
+    global _OPENAI_CLIENT
+    if _OPENAI_CLIENT is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_timeout = httpx.Timeout(connect=5.0, read=60.0, write=30.0, pool=30.0)  # Increased read timeout
+        _OPENAI_CLIENT = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(timeout=http_timeout),  # ensures streaming reads don't hit short defaults
+            timeout=60.0,              # increased overall guard for better reliability
+            max_retries=5,             # increased retries for better resilience (was 3)
+            default_headers={
+                "User-Agent": "LiveKit-Agent/1.0",
+            },
+        )
+    return _OPENAI_CLIENT
+
+
+def get_openai_plugin_client():
+    """Shared OpenAI client for the LiveKit plugins.
+
+    Plugins retry through the agent framework, so their client must not retry on its own;
+    with_options() keeps the same HTTP transport (and its warmed connections).
+    """
+    global _OPENAI_PLUGIN_CLIENT
+    if _OPENAI_PLUGIN_CLIENT is None:
+        _OPENAI_PLUGIN_CLIENT = get_openai_client().with_options(max_retries=0)
+    return _OPENAI_PLUGIN_CLIENT
 # --------------------------------------------------------------------------
 
 
+# Upper bound on waiting for the end-call message to play out before hanging up
+END_CALL_MESSAGE_TIMEOUT_SECONDS = float(os.getenv("END_CALL_MESSAGE_TIMEOUT_SECONDS", "15"))
+
 # Global pre-warmed components
 _PREWARMED_VAD = None
 _PREWARMED_LOCK = asyncio.Lock()
@@ -189,19 +197,117 @@ class CallHandler:
         
         # Track idle message counts per session
         self._idle_message_counts = {}
+
+        # LLM/TTS/STT instances built for this call, and the shared transports they lease
+        self._provider_pool = get_provider_pool()
+        self._provider_leases = []
+        self._call_providers = []
+        self._provider_health = get_provider_health()
+
+        # Endpointing delays learned from earlier turns of each assistant
+        self._endpointing = get_endpointing_controller(self.mongo)
+
+        # Pre-synthesized audio for fixed phrases (greeting, ...)
+        self._audio_cache = get_audio_cache()
+        self._clip_tts = None
         
         # Latency monitoring variables
         self.end_of_utterance_delay = 0
         self.llm_latency = 0
         self.tts_latency = 0
 
+    def _lease(self, key, factory):
+        """Lease a pooled transport (HTTP session, API client) for this call (released on shutdown)."""
+        transport = self._provider_pool.acquire(key, factory)
+        self._provider_leases.append((key, transport))
+        return transport
+
+    def _http_session(self, provider: str):
+        """Shared aiohttp session for a provider's plugins; keeps its connections warm between calls."""
+        import aiohttp
+        return self._lease(("http", provider), aiohttp.ClientSession)
+
+    def _openai_compatible_client(self, provider: str, base_url: str, api_key: str):
+        """Shared client for an OpenAI-compatible endpoint (Groq, Cerebras)."""
+        def factory():
+            import httpx
+            from openai import AsyncOpenAI
+            return AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=httpx.AsyncClient(timeout=httpx.Timeout(connect=5.0, read=60.0, write=30.0, pool=30.0)),
+                max_retries=0,  # the agent framework retries
+            )
+        return self._lease(("openai_client", provider, base_url), factory)
+
+    def _per_call(self, kind: str, provider: str, instance):
+        """Track a plugin instance built for this call; it is closed with the call."""
+        self._call_providers.append(instance)
+        # The instance's own metrics and errors feed its provider's health score
+        self._provider_health.watch(kind, provider, instance)
+        return instance
+
+    def _with_fallback(self, kind: str, instances: list, vad=None):
+        """Wrap a provider chain in LiveKit's FallbackAdapter; a single instance is used as is."""
+        instances = list(dict.fromkeys(instances))
+        if len(instances) == 1:
+            return instances[0]
+        if kind == "llm":
+            adapter = agents_llm.FallbackAdapter(llm=instances)
+        elif kind == "tts":
+            adapter = agents_tts.FallbackAdapter(tts=instances)
+        else:
+            # Non-streaming STT (Whisper) needs the VAD to be streamed
+            adapter = agents_stt.FallbackAdapter(stt=instances, vad=vad)
+        # Subscribes to its children; closed (and unsubscribed) with the call
+        self._call_providers.append(adapter)
+        return adapter
+
+    async def _release_providers(self) -> None:
+        """Close this call's plugin instances and return its transport leases to the pool."""
+        instances, self._call_providers = self._call_providers, []
+        # Adapters were added after their children, so they are closed first
+        for instance in reversed(instances):
+            await close_instance(instance, type(instance).__name__)
+        leases, self._provider_leases = self._provider_leases, []
+        for key, transport in leases:
+            if self._provider_pool.config.enabled:
+                self._provider_pool.release(key)
+            else:
+                await close_instance(transport, key[0])
+
+    def _say(self, session: AgentSession, text: str, config: Dict[str, Any]):
+        """Speak a fixed phrase, playing the cached clip when one has been rendered."""
+        audio = self._audio_cache.open_clip(VoiceSpec.from_config(config), text)
+        if audio is None:
+            return session.say(text)
+        return session.say(text, audio=audio)
+
+    def _prerender_clips(self, session: AgentSession, config: Dict[str, Any]) -> None:
+        """Render the assistant's fixed phrases (greeting, idle and end-call messages) in the background."""
+        if self._clip_tts is None:
+            return
+        spec = VoiceSpec.from_config(config)
+        for text in self._fixed_phrases(config):
+            self._audio_cache.prerender(self._clip_tts, spec, text)
+
+    @staticmethod
+    def _fixed_phrases(config: Dict[str, Any]) -> list:
+        """Static phrases the agent speaks verbatim, greeting first."""
+        phrases = [config.get("first_message", "")]
+        idle_messages = config.get("idle_messages") or []
+        if isinstance(idle_messages, list):
+            phrases.extend(m for m in idle_messages if isinstance(m, str))
+        phrases.append(config.get("end_call_message") or "")
+        return [p for p in dict.fromkeys(phrases) if p]
+
     async def _ensure_vad(self):
         """Ensure VAD is loaded (singleton-ish)."""
         global _PREWARMED_VAD
         if _PREWARMED_VAD is None:
             async with _PREWARMED_LOCK:
                 if _PREWARMED_VAD is None:
-                    _PREWARMED_VAD = silero.VAD.load()
+                    _PREWARMED_VAD = load_plugin("silero").VAD.load()
         return _PREWARMED_VAD
 
     def _on_metrics_collected(self, event: MetricsCollectedEvent):
@@ -287,7 +393,7 @@ class CallHandler:
             
             # Send the idle message
             try:
-                await session.say(idle_message)
+                await self._say(session, idle_message, config)
                 logger.info(f"IDLE_MESSAGE_SENT | count={current_count + 1}/{max_idle_messages}")
             except AttributeError:
                 # Fallback if say() not available
@@ -301,6 +407,26 @@ class CallHandler:
         except Exception as e:
             logger.error(f"IDLE_MESSAGE_HANDLER_ERROR | error={str(e)}")
 
+    async def _hang_up(self, ctx: JobContext, log_prefix: str) -> None:
+        """Hang up the call for all participants by deleting the room."""
+        try:
+            # Use delete_room API to properly hang up the call for all participants
+            # This is the recommended way per LiveKit telephony docs
+            await ctx.api.room.delete_room(
+                api.DeleteRoomRequest(
+                    room=get_room_name(ctx),
+                )
+            )
+            logger.info(f"{log_prefix}_HANGUP_SUCCESS | room deleted successfully")
+        except Exception as delete_error:
+            logger.error(f"{log_prefix}_HANGUP_FAILED | error={str(delete_error)}")
+            # Fallback to disconnect if delete_room fails
+            try:
+                await ctx.room.disconnect()
+                logger.info(f"{log_prefix}_HANGUP_FALLBACK | used room.disconnect()")
+            except Exception as disconnect_error:
+                logger.error(f"{log_prefix}_HANGUP_FALLBACK_FAILED | error={str(disconnect_error)}")
+
     def _start_max_call_duration_timer(self, ctx: JobContext, config: Dict[str, Any], session: AgentSession) -> None:
         """Automatically hang up the call once the configured max duration elapses."""
         max_call_duration_minutes = config.get("max_call_duration")
@@ -329,37 +455,20 @@ class CallHandler:
                     try:
                         logger.info(f"MAX_DURATION_END_MESSAGE | message='{end_call_message[:60]}{'...' if len(end_call_message) > 60 else ''}'")
                         try:
-                            await session.say(end_call_message)
+                            handle = self._say(session, end_call_message, config)
                         except AttributeError:
                             # Fallback if say() not available
-                            await session.generate_reply(instructions=f"Say exactly this: '{end_call_message}'")
+                            handle = session.generate_reply(instructions=f"Say exactly this: '{end_call_message}'")
                         
-                        # Wait for message to be spoken (estimate: ~3 seconds for short messages, up to 10 seconds for longer ones)
-                        message_duration = min(len(end_call_message) * 0.1, 10)  # Rough estimate: 0.1s per character, max 10s
-                        await asyncio.sleep(max(message_duration, 3))  # At least 3 seconds
-                        logger.info("MAX_DURATION_END_MESSAGE_SPOKEN | waiting complete")
+                        # Hang up as soon as the message has actually played out
+                        await asyncio.wait_for(handle.wait_for_playout(), timeout=END_CALL_MESSAGE_TIMEOUT_SECONDS)
+                        logger.info("MAX_DURATION_END_MESSAGE_SPOKEN | playout complete")
                     except Exception as message_error:
                         logger.error(f"MAX_DURATION_END_MESSAGE_ERROR | error={str(message_error)}")
                         # Continue to hangup even if message failed
                 
                 logger.info("MAX_DURATION_HANGUP | hanging up call by deleting room")
-                try:
-                    # Use delete_room API to properly hang up the call for all participants
-                    # This is the recommended way per LiveKit telephony docs
-                    await ctx.api.room.delete_room(
-                        api.DeleteRoomRequest(
-                            room=ctx.room.name,
-                        )
-                    )
-                    logger.info("MAX_DURATION_HANGUP_SUCCESS | room deleted successfully")
-                except Exception as delete_error:
-                    logger.error(f"MAX_DURATION_HANGUP_FAILED | error={str(delete_error)}")
-                    # Fallback to disconnect if delete_room fails
-                    try:
-                        await ctx.room.disconnect()
-                        logger.info("MAX_DURATION_HANGUP_FALLBACK | used room.disconnect()")
-                    except Exception as disconnect_error:
-                        logger.error(f"MAX_DURATION_HANGUP_FALLBACK_FAILED | error={str(disconnect_error)}")
+                await self._hang_up(ctx, "MAX_DURATION")
             except asyncio.CancelledError:
                 logger.info("MAX_DURATION_TIMER_CANCELLED")
                 raise
@@ -452,143 +561,33 @@ class CallHandler:
 
     async def handle_call(self, ctx: JobContext) -> None:
         """Handle incoming call with proper LiveKit patterns."""
-        call_id = ctx.room.name  # Use room name as call ID
+        call_id = get_room_name(ctx)  # Use room name as call ID
         profiler = LatencyProfiler(call_id, "call_processing")
         
         try:
-            # Measure connection latency
-            async with measure_latency_context("room_connection", call_id):
-                await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
-                # logger.info(f"CONNECTED | room={ctx.room.name}")
-
-            profiler.checkpoint("connected")
-
-            # Log job metadata for debugging
-            # logger.info(f"JOB_METADATA | metadata={ctx.job.metadata}")
-
-            # Measure call type determination and config resolution
-            async with measure_latency_context("call_type_determination", call_id):
-                call_type = self._determine_call_type(ctx)
-                assistant_config = await self.config_resolver.resolve_assistant_config(ctx, call_type)
-
-            profiler.checkpoint("config_resolved", {"call_type": call_type})
-
-            # Check if another agent is already in the room
-            # Usually only 1 agent should be present per room to avoid "ignoring" issues
-            remote_participants = [p for p in ctx.room.remote_participants.values() if p.identity.startswith("agent")]
-            if remote_participants:
-                logger.warning(f"MULTIPLE_AGENTS_DETECTED | room={ctx.room.name} | existing_agents={len(remote_participants)}")
-                # We don't necessarily kill it, but we log the warning for debugging
-
-            if not assistant_config:
-                # logger.error(f"NO_ASSISTANT_CONFIG | room={ctx.room.name}")
-                profiler.finish(success=False, error="No assistant config found")
-                return
-
-
-
-
-
-            # Create session and agent BEFORE waiting for participant to start listening immediately
-            async with measure_latency_context("session_creation", call_id):
-                
-                # --- CAMPAIGN & CONTEXT INJECTION ---
-                # Parse metadata to override prompt with campaign specifics and contact info
-                try:
-                    # Try job metadata first, then room metadata
-                    meta_source = ctx.job.metadata or ctx.room.metadata
-                    if meta_source:
-                        job_meta = json.loads(meta_source)
-                        
-                        # 1. Campaign Prompt Override
-                        campaign_prompt = job_meta.get("campaignPrompt")
-                        if campaign_prompt:
-                            logger.info(f"CAMPAIGN_PROMPT_INJECTED | length={len(campaign_prompt)}")
-                            # Append campaign prompt to end of system prompt
-                            current_prompt = assistant_config.get("prompt", "")
-                            assistant_config["prompt"] = f"{current_prompt}\n\nCAMPAIGN INSTRUCTIONS:\n{campaign_prompt}"
-
-                        # 2. Contact Info Context
-                        contact_info = job_meta.get("contactInfo")
-                        if contact_info:
-                            c_name = contact_info.get("name")
-                            c_email = contact_info.get("email")
-                            c_phone = contact_info.get("phone")
-                            
-                            context_str = f"You are calling {c_name or 'the customer'}."
-                            if c_email:
-                                context_str += f" Their email is {c_email}."
-                            
-                            logger.info(f"CONTACT_INFO_INJECTED | name={c_name}")
-                            
-                            # Prepend context so it sets the stage
-                            current_prompt = assistant_config.get("prompt", "")
-                            assistant_config["prompt"] = f"CONTEXT: {context_str}\n\n{current_prompt}"
-                            
-                except Exception as meta_error:
-                    logger.error(f"METADATA_INJECTION_ERROR | error={str(meta_error)}")
-                # ------------------------------------
-
-                session = await self._create_session(assistant_config)
-                
-                # Enforce mandatory name and email collection based on settings
-                data_collection = assistant_config.get("dataCollectionSettings", {})
-                collection_prompts = []
-                
-                if data_collection.get("collectName"):
-                    collection_prompts.append("You MUST ask for and collect the user's Name.")
-                
-                if data_collection.get("collectEmail"):
-                    collection_prompts.append("You MUST ask for and collect the user's Email address.")
-                    
-                if data_collection.get("collectPhone"):
-                    collection_prompts.append("You MUST verify the user's Phone Number.")
-
-                if collection_prompts:
-                    current_prompt = assistant_config.get("prompt", "")
-                    mandatory_instruction = "CRITICAL: " + " ".join(collection_prompts) + " You cannot proceed with assistance until you have these details."
-                    assistant_config["prompt"] = f"{current_prompt}\n\n{mandatory_instruction}"
-                
-                # Initialize agent factory with pre-warmed components
-                # Note: LLM/TTS pre-warming is now dynamic per-call
-                vad = await self._ensure_vad()
-                agent_factory = AgentFactory(
-                    prewarmed_vad=vad
-                )
-                
-                agent = await agent_factory.create_agent(assistant_config)
-
-            profiler.checkpoint("agent_created")
-
-            # Register metrics collection event handler for latency monitoring
-            session.on("metrics_collected", self._on_metrics_collected)
-            
-            # Register user state changed event handler for idle messages
-            # Note: .on() requires a synchronous callback, so we use asyncio.create_task
-            def handle_user_state_changed(event: UserStateChangedEvent):
-                asyncio.create_task(self._on_user_state_changed(event, session, assistant_config, ctx))
-            session.on("user_state_changed", handle_user_state_changed)
-
             # Register a dummy transcription handler to silence "ignoring text stream" warnings
             # These occur when server-side transcription is enabled but no callback is attached
             @ctx.room.on("transcription_received")
             def on_transcription(transcription, participant=None):
                 pass
 
-            # Start the session IMMEDIATELY to begin listening for speech
-            async with measure_latency_context("session_start", call_id):
-                # Store room name in agent for transfer operations
-                if hasattr(agent, 'set_room_name'):
-                    agent.set_room_name(ctx.room.name)
-                
-                await session.start(
-                    agent=agent,
-                    room=ctx.room,
-                    room_input_options=RoomInputOptions(close_on_disconnect=True),
-                    room_output_options=RoomOutputOptions(transcription_enabled=True)  # Enable transcription for dashboard and transcription service
-                )
+            # Connect, resolve the assistant, create the session and agent and start listening;
+            # independent steps run concurrently (per-step spans are recorded on the profiler)
+            call_type = self._determine_call_type(ctx)
+            pipeline = self._build_setup_pipeline(ctx, call_id, call_type, profiler)
+            try:
+                setup = await pipeline.run()
+            except SetupAborted as aborted:
+                profiler.finish(success=False, error=aborted.reason)
+                if aborted.hang_up:
+                    await self._hang_up(ctx, aborted.log_prefix)
+                return
+
+            assistant_config = setup["call_config"]
+            session = setup["session"]
+            agent = setup["agent"]
             # logger.info(f"SESSION_STARTED | room={ctx.room.name} | listening for speech")
-            profiler.checkpoint("session_started")
+            profiler.checkpoint("session_started", {"call_type": call_type})
 
             # Start ambient audio if configured
             await self._maybe_start_background_audio(ctx, session, assistant_config)
@@ -598,10 +597,10 @@ class CallHandler:
             force_first = os.getenv("FORCE_FIRST_MESSAGE", "true").lower() != "false"
             if force_first and first_message:
                 # logger.info(f"TRIGGERING_FIRST_MESSAGE | message='{first_message}'")
-                # Use direct TTS for static greeting to shave a round trip
+                # Play the pre-synthesized greeting when cached, else direct TTS
                 async with measure_latency_context("first_message_tts", call_id, {"message_length": len(first_message)}):
                     try:
-                        await session.say(first_message)
+                        await self._say(session, first_message, assistant_config)
                     except AttributeError:
                         # Fallback to generate_reply if say() not available
                         await session.generate_reply(
@@ -660,6 +659,8 @@ class CallHandler:
 
                 # Perform post-call analysis and save to database
                 try:
+                    # Analysis prompts and email templates are loaded lazily
+                    await self.mongo.ensure_assistant_sections(assistant_config)
                     analysis_results = await self._perform_post_call_analysis(assistant_config, session_history, agent, call_duration)
                     # logger.info(f"POST_CALL_ANALYSIS_RESULTS | summary={bool(analysis_results.get('call_summary'))} | success={analysis_results.get('call_success')} | data_fields={len(analysis_results.get('structured_data', {}))}")
                     
@@ -686,6 +687,7 @@ class CallHandler:
             await self._wait_for_session_completion(session, ctx)
 
             profiler.finish(success=True)
+            log_metrics_snapshot()
             # logger.info(f"CALL_COMPLETED | room={ctx.room.name}")
 
         except Exception as e:
@@ -693,14 +695,162 @@ class CallHandler:
             profiler.finish(success=False, error=str(e))
             raise
 
+    def _build_setup_pipeline(self, ctx: JobContext, call_id: str, call_type: str, profiler: LatencyProfiler) -> SetupPipeline:
+        """Build the call setup graph; every step receives the results of the steps before it."""
+        pipeline = SetupPipeline(call_id, profiler)
+        agent_factory = AgentFactory()
+
+        async def connect(results):
+            await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+            # Check if another agent is already in the room
+            # Usually only 1 agent should be present per room to avoid "ignoring" issues
+            remote_participants = [p for p in ctx.room.remote_participants.values() if p.identity.startswith("agent")]
+            if remote_participants:
+                logger.warning(f"MULTIPLE_AGENTS_DETECTED | room={ctx.room.name} | existing_agents={len(remote_participants)}")
+                # We don't necessarily kill it, but we log the warning for debugging
+
+        async def resolve_config(results):
+            assistant_config = await self.config_resolver.resolve_assistant_config(ctx, call_type)
+            if not assistant_config:
+                # logger.error(f"NO_ASSISTANT_CONFIG | room={ctx.room.name}")
+                raise SetupAborted("No assistant config found")
+            return assistant_config
+
+        async def compile_profile(results):
+            assistant_config = results["config"]
+            # Workflow instructions are compiled into the profile, so they need the lazily loaded nodes/edges
+            if assistant_config.get("workflow_node_count"):
+                await self.mongo.ensure_assistant_sections(assistant_config)
+            # Validated models and static instructions are shared per assistant version
+            return get_assistant_profile(assistant_config)
+
+        async def check_quota(results):
+            # Reject over-quota tenants before any LLM/TTS/STT capacity is spent
+            user_id = results["config"].get("user_id")
+            quota = await get_quota_gate(get_database_client()).check(user_id)
+            if not quota["allowed"]:
+                logger.warning(f"QUOTA_EXCEEDED | user={user_id} | remaining={quota['remaining_minutes']} | source={quota['source']} | rejecting call")
+                raise SetupAborted("Minutes quota exceeded", hang_up=True, log_prefix="QUOTA_EXCEEDED")
+            return quota
+
+        async def build_call_config(results):
+            # The call works on its own copy of the profile's config
+            return self._apply_call_context(ctx, results["profile"].call_config())
+
+        async def create_session(results):
+            # Registered first, so leases taken before a failure in setup are released too
+            ctx.add_shutdown_callback(self._release_providers)
+            session = await self._create_session(results["call_config"], results["profile"])
+            assistant_config = results["call_config"]
+
+            # Clips missing from the cache (first call on a new greeting or voice) render
+            # while the rest of setup runs, so the greeting can usually skip live TTS
+            self._prerender_clips(session, assistant_config)
+
+            # Register metrics collection event handler for latency monitoring
+            session.on("metrics_collected", self._on_metrics_collected)
+            self._endpointing.observe_session(session, assistant_config)
+
+            async def flush_endpointing():
+                # Short calls never fill a window; their turns still count towards the assistant's
+                await self._endpointing.flush(assistant_config)
+            ctx.add_shutdown_callback(flush_endpointing)
+
+            # Register user state changed event handler for idle messages
+            # Note: .on() requires a synchronous callback, so we use asyncio.create_task
+            def handle_user_state_changed(event: UserStateChangedEvent):
+                asyncio.create_task(self._on_user_state_changed(event, session, assistant_config, ctx))
+            session.on("user_state_changed", handle_user_state_changed)
+            return session
+
+        async def resolve_analysis_instructions(results):
+            # LLM classification of the structured data fields
+            return await agent_factory.resolve_analysis_instructions(results["call_config"], results["profile"])
+
+        async def resolve_calendar(results):
+            return await agent_factory.resolve_calendar(results["call_config"])
+
+        async def create_agent(results):
+            agent = await agent_factory.create_agent(
+                results["call_config"],
+                profile=results["profile"],
+                analysis_instructions=results["analysis_instructions"],
+                calendar=results["calendar"],
+            )
+            # Store room name in agent for transfer operations
+            if hasattr(agent, 'set_room_name'):
+                agent.set_room_name(get_room_name(ctx))
+            return agent
+
+        async def start_session(results):
+            # Start the session IMMEDIATELY to begin listening for speech
+            await results["session"].start(
+                agent=results["agent"],
+                room=ctx.room,
+                room_input_options=RoomInputOptions(close_on_disconnect=True),
+                room_output_options=RoomOutputOptions(transcription_enabled=True)  # Enable transcription for dashboard and transcription service
+            )
+
+        pipeline.add("connect", connect)
+        pipeline.add("config", resolve_config)
+        pipeline.add("vad", lambda results: self._ensure_vad())
+        pipeline.add("profile", compile_profile, deps=("config",))
+        pipeline.add("quota", check_quota, deps=("config",))
+        pipeline.add("call_config", build_call_config, deps=("profile",))
+        pipeline.add("session", create_session, deps=("call_config", "quota", "vad"))
+        pipeline.add("analysis_instructions", resolve_analysis_instructions, deps=("call_config", "quota"))
+        pipeline.add("calendar", resolve_calendar, deps=("call_config", "quota"), required=False)
+        pipeline.add("agent", create_agent, deps=("call_config", "analysis_instructions", "calendar"))
+        pipeline.add("session_start", start_session, deps=("connect", "session", "agent"))
+        return pipeline
+
+    def _apply_call_context(self, ctx: JobContext, assistant_config: Dict[str, Any]) -> Dict[str, Any]:
+        """Attach campaign and contact details from the job metadata as per-call context.
+
+        They are rendered after the assistant's static instructions (see
+        build_call_context_instructions), so the prompt prefix stays identical across calls.
+        """
+        call_context: Dict[str, Any] = {}
+        # --- CAMPAIGN & CONTEXT INJECTION ---
+        try:
+            # Try job metadata first, then room metadata
+            meta_source = ctx.job.metadata or get_room_metadata(ctx)
+            if meta_source:
+                job_meta = json.loads(meta_source)
+                
+                # 1. Campaign Prompt
+                campaign_prompt = job_meta.get("campaignPrompt")
+                if campaign_prompt:
+                    logger.info(f"CAMPAIGN_PROMPT_INJECTED | length={len(campaign_prompt)}")
+                    call_context["campaign_prompt"] = campaign_prompt
+
+                # 2. Contact Info Context
+                contact_info = job_meta.get("contactInfo")
+                if contact_info:
+                    logger.info(f"CONTACT_INFO_INJECTED | name={contact_info.get('name')}")
+                    call_context["contact"] = {
+                        "name": contact_info.get("name"),
+                        "email": contact_info.get("email"),
+                    }
+                    
+        except Exception as meta_error:
+            logger.error(f"METADATA_INJECTION_ERROR | error={str(meta_error)}")
+        # ------------------------------------
+
+        # Mandatory name/email/phone collection is rendered from dataCollectionSettings
+        assistant_config["call_context"] = call_context
+        return assistant_config
+
     def _determine_call_type(self, ctx: JobContext) -> str:
         """Determine the type of call based on room name and metadata."""
-        room_name = ctx.room.name.lower()
+        # Read from the job's room info, since this runs before ctx.connect() finishes
+        room_name = get_room_name(ctx).lower()
+        room_metadata_json = get_room_metadata(ctx)
         
         # Check room metadata for call type
-        if ctx.room.metadata:
+        if room_metadata_json:
             try:
-                room_metadata = json.loads(ctx.room.metadata)
+                room_metadata = json.loads(room_metadata_json)
                 if room_metadata.get("source") == "web":
                     return "web"
                 if room_metadata.get("callType") == "web":
@@ -950,7 +1100,8 @@ class CallHandler:
                     if db_client:
                         # Convert seconds to minutes (round up)
                         minutes_used = call_duration / 60.0
-                        deduction_result = await db_client.deduct_minutes(user_id, minutes_used)
+                        deduction_result = await get_minutes_ledger(db_client).deduct(user_id, minutes_used)
+                        get_quota_gate(db_client).record_usage(user_id, minutes_used, deduction_result)
                         if deduction_result.get("success"):
                             remaining = deduction_result.get("remaining_minutes", 0)
                             exceeded = deduction_result.get("exceeded_limit", False)
@@ -960,6 +1111,10 @@ class CallHandler:
                         else:
                             logger.error(f"MINUTES_DEDUCTION_FAILED | user={user_id} | error={deduction_result.get('error')}")
                 
+                # The backend looks the call up when sending the email, so wait for the write-behind flush
+                if not await self.mongo.flush_call_history(timeout=float(os.getenv("CALL_HISTORY_FLUSH_WAIT_SECONDS", "10"))):
+                    logger.warning(f"CALL_HISTORY_FLUSH_PENDING | call_id={call_id} | sending post-call email anyway")
+
                 # Send post-call email if configured
                 await self._send_post_call_email(call_sid or call_id, client_email, assistant_config)
                 
@@ -1065,6 +1220,8 @@ class CallHandler:
             backend_url = os.getenv("BACKEND_URL", "http://localhost:4000")
             email_endpoint = f"{backend_url}/api/v1/calls/{call_identifier}/send-email"
             
+            import httpx
+
             async with httpx.AsyncClient(timeout=30.0) as client:
                 response = await client.post(email_endpoint)
                 
@@ -1223,7 +1380,7 @@ class CallHandler:
                 return "Summary generation not available - API key not configured."
 
             # Use shared OpenAI client
-            client = AsyncOpenAI(api_key=openai_api_key)
+            client = get_openai_client()
             
             response = await asyncio.wait_for(
                 client.chat.completions.create(
@@ -1269,7 +1426,7 @@ class CallHandler:
                 return False
 
             # Use shared OpenAI client
-            client = AsyncOpenAI(api_key=openai_api_key)
+            client = get_openai_client()
             
             response = await asyncio.wait_for(
                 client.chat.completions.create(
@@ -1327,7 +1484,7 @@ class CallHandler:
                 return {}
 
             # Use shared OpenAI client
-            client = AsyncOpenAI(api_key=openai_api_key)
+            client = get_openai_client()
             
             # Build the extraction prompt
             extraction_prompt = prompt or "Extract the following information from the call transcript:"
@@ -1368,88 +1525,58 @@ class CallHandler:
             # logger.warning(f"AI_STRUCTURED_DATA_EXTRACTION_ERROR | error={str(e)}")
             return {}
 
-    async def _create_session(self, config: Dict[str, Any]) -> AgentSession:
+    async def _create_session(self, config: Dict[str, Any], profile: Optional[AssistantProfile] = None) -> AgentSession:
         """Create agent session using assistant's database settings."""
-        # Validate and fix model names to prevent API errors
-        from config.settings import validate_model_names
-        config = validate_model_names(config)
+        # Model names are validated once per assistant version by the compiled profile
+        if profile is None:
+            profile = get_assistant_profile(config)
         
         # re-use prewarmed VAD
         vad = await self._ensure_vad()
 
         # Get configuration from assistant data - optimized for performance
-        llm_provider = config.get("llm_provider_setting", "OpenAI")
-        llm_model = config.get("llm_model_setting", "gpt-4o-mini")  # Fast model by default
+        llm_provider = profile.llm_provider
+        llm_model = profile.llm_model  # Fast model by default
         temperature = config.get("temperature_setting", 0.1)  # Lower temperature for consistency
         max_tokens = config.get("max_token_setting", 200)  # Reduced for faster responses
 
-        voice_provider = config.get("voice_provider_setting", "OpenAI")
-        voice_model = config.get("voice_model_setting", "gpt-4o-mini-tts")
-        voice_name = config.get("voice_name_setting", "alloy")
+        voice_provider = profile.voice_provider
+        voice_model = profile.voice_model
+        voice_name = profile.voice_name
 
         # Debug logging for TTS provider selection
         logger.info(f"TTS_PROVIDER_SELECTED | provider={voice_provider} | model={voice_model} | voice={voice_name}")
 
-        # Create LLM based on provider
-        llm = self._create_llm(llm_provider, llm_model, temperature, max_tokens, config)
-
-        # Create TTS based on provider
-        tts = self._create_tts(voice_provider, voice_model, voice_name, config)
+        # Provider chains: the configured provider first and OpenAI as the fallback. A degraded
+        # primary is moved behind the healthiest provider; FallbackAdapter takes over on errors
+        # within the call. Instances belong to this call; their transports are shared.
+        llm = self._with_fallback("llm", [
+            self._per_call("llm", provider, self._create_llm(provider, llm_model, temperature, max_tokens, config))
+            for provider in self._provider_health.chain("llm", llm_provider)
+        ])
+
+        tts_chain = self._provider_health.chain("tts", voice_provider)
+        tts_instances = [
+            self._per_call("tts", provider, self._create_tts(provider, voice_model, voice_name, config))
+            for provider in tts_chain
+        ]
+        tts = self._with_fallback("tts", tts_instances)
+        # Cached clips must be rendered with the assistant's own voice, never a fallback's
+        self._clip_tts = tts_instances[0] if tts_chain[0] == voice_provider else None
 
         # Create STT - prefer Deepgram streaming for better latency, fallback to OpenAI Whisper
         language_setting = config.get("language_setting", "en")
-        
-        # Map combined language codes to Deepgram-supported codes
-        language_mapping = {
-            "en-es": "en",  # Default to English for combined languages
-            "en": "en",
-            "es": "es", 
-            "pt": "pt",
-            "fr": "fr",
-            "de": "de",
-            "nl": "nl",
-            "no": "no",
-            "ar": "ar"
-        }
-        deepgram_language = language_mapping.get(language_setting, "en")
-        
-        # Try Deepgram STT first if available and API key is set
-        stt = None
         deepgram_api_key = os.getenv("DEEPGRAM_API_KEY")
-        
-        if DEEPGRAM_AVAILABLE and deepgram_api_key:
-            try:
-                stt = lk_deepgram.STT(
-                    model="nova-3",
-                    language=deepgram_language
-                )
-                logger.info(f"DEEPGRAM_STT_CONFIGURED | model=nova-3 | language={deepgram_language}")
-            except Exception as e:
-                logger.warning(f"DEEPGRAM_STT_FAILED | error={str(e)} | falling back to OpenAI Whisper")
-                stt = None
-        
-        # Fallback to OpenAI Whisper STT if Deepgram is not available or failed
-        whisper_language = None
-        if stt is None:
-            # Map language codes for OpenAI Whisper
-            whisper_language_mapping = {
-                "en": "en", "es": "es", "pt": "pt", "fr": "fr", 
-                "de": "de", "nl": "nl", "no": "no", "ar": "ar",
-                "en-es": "en"  # Default to English for combined
-            }
-            whisper_language = whisper_language_mapping.get(language_setting, "en")
-            
-            stt = openai.STT(
-                model="whisper-1",
-                language=whisper_language
-            )
+        stt_primary = "Deepgram" if deepgram_api_key and plugin_available("deepgram") else "OpenAI"
+        if stt_primary == "OpenAI":
             logger.info(
-                "OPENAI_STT_CONFIGURED | model=whisper-1 | language=%s | reason=%s",
-                whisper_language,
-                'DEEPGRAM_NOT_AVAILABLE' if not DEEPGRAM_AVAILABLE else 'DEEPGRAM_FAILED' if deepgram_api_key else 'DEEPGRAM_API_KEY_NOT_SET'
+                "OPENAI_STT_CONFIGURED | model=whisper-1 | reason=%s",
+                'DEEPGRAM_API_KEY_NOT_SET' if not deepgram_api_key else 'DEEPGRAM_NOT_AVAILABLE'
             )
-        else:
-            logger.info("OPENAI_STT_SKIPPED | reason=DEEPGRAM_CONFIGURED")
+        stt = self._with_fallback("stt", [
+            self._per_call("stt", provider, self._create_stt(provider, language_setting))
+            for provider in self._provider_health.chain("stt", stt_primary)
+        ], vad=vad)
 
         # Get call management settings from assistant config
         max_call_duration_minutes = config.get("max_call_duration", 30)  # From DB (in seconds, convert to minutes)
@@ -1458,9 +1585,10 @@ class CallHandler:
         # Convert max call duration from seconds to minutes for session timeout
         max_call_duration_seconds = max_call_duration_minutes
 
-        # Get voice timing settings from assistant config
-        voice_on_punctuation_seconds = config.get("voice_on_punctuation_seconds", 0.4)      # From DB, default to 0.4s
-        voice_on_no_punctuation_seconds = config.get("voice_on_no_punctuation_seconds", 0.8)  # From DB, default to 0.8s
+        # Get voice timing settings from assistant config; endpointing delays start from
+        # voice_on_punctuation_seconds / voice_on_no_punctuation_seconds and are tuned per assistant
+        min_endpointing_delay, max_endpointing_delay = self._endpointing.delays(config)
+        logger.info(f"ENDPOINTING_DELAYS | min={min_endpointing_delay}s | max={max_endpointing_delay}s")
         voice_on_number_seconds = config.get("voice_on_number_seconds", 0.4)               # From DB
         voice_backoff_seconds = config.get("voice_backoff_seconds", 0.8)                      # From DB
 
@@ -1476,19 +1604,60 @@ class CallHandler:
             tts=tts,
             allow_interruptions=True,
             preemptive_generation=True,  # Enable preemptive generation for reduced latency
-            min_endpointing_delay=voice_on_punctuation_seconds,   # From assistant DB
-            max_endpointing_delay=voice_on_no_punctuation_seconds, # From assistant DB
+            min_endpointing_delay=min_endpointing_delay,   # Assistant DB, adapted from observed turns
+            max_endpointing_delay=max_endpointing_delay,   # Assistant DB, adapted from observed turns
             user_away_timeout=silence_timeout_seconds,       # Align user-away timer with idle message timeout
             min_interruption_words=min_interruption_words,    # Require N words before interrupting
             min_interruption_duration=min_interruption_duration,  # Require minimum speech duration
             false_interruption_timeout=false_interruption_timeout,  # Timeout for false interruptions
         )
 
+    def _create_stt(self, provider: str, language_setting: str):
+        """Create the STT for a provider on its shared transport."""
+        if provider == "Deepgram":
+            # Map combined language codes to Deepgram-supported codes
+            language_mapping = {
+                "en-es": "en",  # Default to English for combined languages
+                "en": "en",
+                "es": "es", 
+                "pt": "pt",
+                "fr": "fr",
+                "de": "de",
+                "nl": "nl",
+                "no": "no",
+                "ar": "ar"
+            }
+            deepgram_language = language_mapping.get(language_setting, "en")
+            lk_deepgram = load_plugin("deepgram")
+            stt = lk_deepgram.STT(
+                model="nova-3",
+                language=deepgram_language,
+                http_session=self._http_session("Deepgram"),
+            )
+            logger.info(f"DEEPGRAM_STT_CONFIGURED | model=nova-3 | language={deepgram_language}")
+            return stt
+
+        # Map language codes for OpenAI Whisper
+        whisper_language_mapping = {
+            "en": "en", "es": "es", "pt": "pt", "fr": "fr", 
+            "de": "de", "nl": "nl", "no": "no", "ar": "ar",
+            "en-es": "en"  # Default to English for combined
+        }
+        whisper_language = whisper_language_mapping.get(language_setting, "en")
+        openai = load_plugin("openai")
+        return openai.STT(
+            model="whisper-1",
+            language=whisper_language,
+            client=get_openai_plugin_client(),  # shares the connection pool warmed by _run_async_warmups
+        )
+
     # Keep the original LLM and TTS creation methods for pre-warming
     def _create_llm(self, provider: str, model: str, temperature: float, max_tokens: int, config: Dict[str, Any]):
         """Create LLM using assistant config + environment API keys."""
+        # Plugins are imported the first time an assistant asks for their provider
+        openai = load_plugin("openai")
         
-        if provider == "Groq" and GROQ_AVAILABLE:
+        if provider == "Groq" and plugin_available("groq"):
             # Use assistant's Groq settings from database
             groq_model = config.get("groq_model", "llama3-8b-8192")  # From DB
             groq_temperature = config.get("groq_temperature", 0.10)  # From DB  
@@ -1505,9 +1674,9 @@ class CallHandler:
                 }
                 mapped_model = model_mapping.get(groq_model, groq_model)
                 
-                llm = lk_groq.LLM(
+                llm = load_plugin("groq").LLM(
                     model=mapped_model,
-                    api_key=groq_api_key,  # From environment
+                    client=self._openai_compatible_client("Groq", "https://api.groq.com/openai/v1", groq_api_key),
                     temperature=groq_temperature,  # From assistant DB
                     parallel_tool_calls=False,  # Disabled to prevent parallel function call errors
                     tool_choice="auto",
@@ -1517,7 +1686,7 @@ class CallHandler:
             else:
                 logger.warning("GROQ_API_KEY_NOT_SET | falling back to OpenAI LLM")
 
-        elif provider == "Cerebras" and CEREBRAS_AVAILABLE:
+        elif provider == "Cerebras":  # OpenAI-compatible endpoint
             # Use assistant's Cerebras settings from database
             cerebras_model = config.get("llm_model_setting", "gpt-oss-120b")  # From DB
             cerebras_temperature = config.get("temperature_setting", 0.3)  # From DB
@@ -1529,8 +1698,7 @@ class CallHandler:
             if cerebras_api_key:
                 llm = openai.LLM(
                     model=cerebras_model,
-                    api_key=cerebras_api_key,  # From environment
-                    base_url="https://api.cerebras.ai/v1",
+                    client=self._openai_compatible_client("Cerebras", "https://api.cerebras.ai/v1", cerebras_api_key),
                     temperature=cerebras_temperature,  # From assistant DB
                     parallel_tool_calls=False,  # Disabled to prevent parallel function call errors
                     tool_choice="auto",
@@ -1556,12 +1724,9 @@ class CallHandler:
         }
         mapped_model = model_mapping.get(openai_model, "gpt-4o-mini")
         
-        # Get API key from environment (centralized)
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        
         llm = openai.LLM(
             model=mapped_model,
-            api_key=openai_api_key,  # From environment
+            client=get_openai_plugin_client(),  # Same API key; shares the connection pool warmed by _run_async_warmups
             temperature=float(openai_temperature),  # From assistant DB
             parallel_tool_calls=False,  # Disabled to prevent parallel function call errors
             tool_choice="auto",
@@ -1580,13 +1745,19 @@ class CallHandler:
         - Cartesia: Uses CARTESIA_API_KEY from environment, supports sonic-3 model
         - OpenAI: Default fallback TTS provider
         """
+        # Plugins are imported the first time an assistant asks for their provider
+        openai = load_plugin("openai")
+        lk_deepgram = load_provider(provider) if provider == "Deepgram" else None
+        lk_cartesia = load_provider(provider) if provider == "Cartesia" else None
+        CARTESIA_AVAILABLE = lk_cartesia is not None
+
         # Debug logging for TTS provider check
         logger.info(f"TTS_PROVIDER_CHECK | provider={provider} | CARTESIA_AVAILABLE={CARTESIA_AVAILABLE}")
         
  
     
         # Deepgram TTS implementation
-        if provider == "Deepgram" and DEEPGRAM_AVAILABLE:
+        if provider == "Deepgram" and lk_deepgram is not None:
             # Use assistant's Deepgram settings from database
             deepgram_model = config.get("voice_model_setting", "aura-asteria-en")  # From DB
             
@@ -1597,6 +1768,7 @@ class CallHandler:
                 tts = lk_deepgram.TTS(
                     model=deepgram_model,
                     api_key=deepgram_api_key,
+                    http_session=self._http_session("Deepgram"),
                 )
                 logger.info(f"DEEPGRAM_TTS_CONFIGURED | model={deepgram_model}")
                 return tts
@@ -1634,7 +1806,8 @@ class CallHandler:
                     tts_params["emotion"] = cartesia_emotion
                 
                 tts = lk_cartesia.TTS(
-                    **tts_params
+                    **tts_params,
+                    http_session=self._http_session("Cartesia"),
                 )
                 logger.info(f"CARTESIA_TTS_CONFIGURED | model={cartesia_model} | voice={cartesia_voice} | speed={cartesia_speed} | language={cartesia_language}")
                 return tts
@@ -1666,13 +1839,10 @@ class CallHandler:
         }
         mapped_voice = voice_mapping.get(voice_name.lower(), "alloy")
         
-        # Get API key from environment (centralized)
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        
         tts = openai.TTS(
             model="tts-1",
             voice=mapped_voice,
-            api_key=openai_api_key,
+            client=get_openai_plugin_client(),  # shares the connection pool warmed by _run_async_warmups
         )
         logger.info(f"OPENAI_TTS_CONFIGURED | voice={mapped_voice}")
         return tts
@@ -1692,10 +1862,168 @@ class CallHandler:
             raise
 
 
+# Hosts of the streaming providers. Their plugins connect through the pooled
+# ("http", provider) session, which is loop-bound: prewarm only resolves them and
+# the first job opens the connections (_warm_provider_http)
+_PROVIDER_HOSTS = {
+    "Deepgram": "api.deepgram.com",
+    "Cartesia": "api.cartesia.ai",
+}
+
+
+def _prewarm_step(timings: Dict[str, float], name: str, fn):
+    """Run one prewarm step, recording its duration; failures are logged, not raised."""
+    start = time.perf_counter()
+    try:
+        return fn()
+    except Exception as e:
+        logger.warning(f"PREWARM_{name.upper()}_FAILED | error={str(e)}")
+        return None
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        timings[name] = round(duration_ms, 1)
+        observe(f"prewarm.{name}_ms", duration_ms)
+
+
+def _prewarm_providers() -> list:
+    """Providers to warm, from PREWARM_PROVIDERS (comma-separated)."""
+    configured = os.getenv("PREWARM_PROVIDERS", "OpenAI,Deepgram,Cartesia")
+    return [p.strip() for p in configured.split(",") if p.strip()]
+
+
+def _import_prewarm_plugins() -> list:
+    """Import the plugin modules of the configured providers."""
+    imported = []
+    for provider in _prewarm_providers():
+        if load_provider(provider) is not None:
+            imported.append(provider)
+        else:
+            logger.warning(f"PREWARM_PLUGIN_UNAVAILABLE | provider={provider}")
+    return imported
+
+
+async def _warm_openai() -> None:
+    """Open the TLS connection of the shared OpenAI transport used by the plugins."""
+    if "OpenAI" in _prewarm_providers() and os.getenv("OPENAI_API_KEY"):
+        await get_openai_client().models.list()
+
+
+async def _warm_provider_http(provider: str) -> None:
+    """Open a keep-alive connection in the provider's pooled HTTP session, the one its plugins lease."""
+    if provider not in _prewarm_providers():
+        return
+    import aiohttp
+    pool = get_provider_pool()
+    key = ("http", provider)
+    session = pool.acquire(key, aiohttp.ClientSession)
+    try:
+        # Any answer will do; the TCP/TLS connection is what stays in the pool
+        async with session.get(f"https://{_PROVIDER_HOSTS[provider]}/") as resp:
+            await resp.read()
+    finally:
+        pool.release(key)
+
+
+def _resolve_provider_hosts() -> None:
+    for provider, host in _PROVIDER_HOSTS.items():
+        if provider not in _prewarm_providers():
+            continue
+        try:
+            socket.getaddrinfo(host, 443)
+        except OSError as e:
+            logger.warning(f"PREWARM_DNS_FAILED | host={host} | error={str(e)}")
+
+
+async def _async_warmup_step(timings: Dict[str, float], name: str, coro_fn, timeout: float):
+    """Async counterpart of _prewarm_step, run on the job loop."""
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(coro_fn(), timeout=timeout)
+    except Exception as e:
+        logger.warning(f"PREWARM_{name.upper()}_FAILED | error={str(e) or type(e).__name__}")
+        return None
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        timings[name] = round(duration_ms, 1)
+        observe(f"prewarm.{name}_ms", duration_ms)
+
+
+async def _run_async_warmups(timings: Dict[str, float]) -> None:
+    """Warm the loop-bound clients (OpenAI, Deepgram, Cartesia, Mongo) and load the DID index.
+
+    Steps are timed into the process's prewarm timing report (proc.userdata["prewarm_timings"]).
+    """
+    start = time.perf_counter()
+
+    # Concurrently, so they are ready as early as possible in the first call's setup.
+    # The Mongo pool (DNS SRV, TLS, auth) opens before the next Mongo query needs it
+    steps = [
+        _async_warmup_step(timings, "openai", _warm_openai, timeout=5.0),
+        _async_warmup_step(timings, "deepgram_http", lambda: _warm_provider_http("Deepgram"), timeout=5.0),
+        _async_warmup_step(timings, "cartesia_http", lambda: _warm_provider_http("Cartesia"), timeout=5.0),
+    ]
+    db_client = get_database_client()
+    if db_client:
+        steps.append(_async_warmup_step(timings, "mongo", db_client.warmup, timeout=10.0))
+    await asyncio.gather(*steps)
+
+    # Insert call history spooled by worker processes that died before flushing
+    replayed = await _async_warmup_step(timings, "call_history_replay", MongoClient().replay_call_history_spool, timeout=10.0)
+    if replayed:
+        logger.info(f"PREWARM_CALL_HISTORY_REPLAYED | documents={replayed}")
+
+    # Build the DID -> assistant routing index so inbound lookups skip Mongo
+    # (loaded lazily by the first inbound lookup if this fails or hasn't finished)
+    numbers = await _async_warmup_step(timings, "did_index", MongoClient().load_did_index, timeout=10.0)
+    logger.info(f"PREWARM_DID_INDEX | numbers={numbers}")
+
+    total_ms = (time.perf_counter() - start) * 1000
+    timings["async_total"] = round(total_ms, 1)
+    observe("prewarm.async_total_ms", total_ms)
+    logger.info(f"ASYNC_WARMUP_COMPLETE | pid={os.getpid()} | total_ms={total_ms:.1f} | " + " | ".join(f"{name}_ms={ms}" for name, ms in timings.items()))
+
+
+# Set once the first job of this process has started the async warmups
+_ASYNC_WARMUP_STARTED = False
+_ASYNC_WARMUP_TASK: Optional[asyncio.Task] = None
+
+
+def _start_async_warmups(timings: Dict[str, float]) -> None:
+    """Start the async warmups on the job loop, once per process.
+
+    prewarm() runs before the job process creates the loop its jobs run on, and
+    aiohttp, httpx and Motor connections belong to the loop that opened them, so
+    they cannot be opened there. They are opened here instead, in the background
+    of the first call: that call's setup is still (partly) cold, and later calls
+    of the process find the connections warm.
+    """
+    global _ASYNC_WARMUP_STARTED, _ASYNC_WARMUP_TASK
+    if _ASYNC_WARMUP_STARTED:
+        return
+    _ASYNC_WARMUP_STARTED = True
+    _ASYNC_WARMUP_TASK = asyncio.get_running_loop().create_task(_run_async_warmups(timings))
+
+
 def prewarm(proc: agents.JobProcess):
     """Pre-warm the system before handling calls."""
-    # logger.info("PREWARM_FUNCTION | system pre-warming started")
-    # Pre-warming is now handled in CallHandler.__init__
+    global _PREWARMED_VAD
+    timings: Dict[str, float] = {}
+    proc.userdata["prewarm_timings"] = timings
+    start = time.perf_counter()
+
+    vad = _prewarm_step(timings, "vad", lambda: load_plugin("silero").VAD.load())
+    if vad is not None:
+        proc.userdata["vad"] = vad
+        _PREWARMED_VAD = vad
+
+    _prewarm_step(timings, "plugins", _import_prewarm_plugins)
+    _prewarm_step(timings, "provider_dns", _resolve_provider_hosts)
+    # Connection pools (OpenAI, Deepgram, Cartesia, Mongo) and the DID index are loop-bound and
+    # open on the first job's loop, so the first call is still cold: see _start_async_warmups()
+
+    total_ms = (time.perf_counter() - start) * 1000
+    observe("prewarm.total_ms", total_ms)
+    logger.info(f"PREWARM_COMPLETE | pid={os.getpid()} | total_ms={total_ms:.1f} | " + " | ".join(f"{name}_ms={ms}" for name, ms in timings.items()))
 
 
 async def entrypoint(ctx: JobContext):
@@ -1703,6 +2031,11 @@ async def entrypoint(ctx: JobContext):
     logger.info(f"🎯 AGENT_ENTRYPOINT_CALLED | room={ctx.room.name}")
     logger.info(f"📋 Job metadata: {ctx.job.metadata}")
     logger.info(f"📋 Room metadata: {ctx.room.metadata}")
+
+    # Report this job process's event-loop lag to the worker's load function
+    get_loop_lag_monitor().ensure_started()
+    # Open the provider/Mongo connections and load the DID index on this loop, without blocking the call
+    _start_async_warmups(ctx.proc.userdata.setdefault("prewarm_timings", {}))
     
     # Create call handler and process the call
     handler = CallHandler()
@@ -1714,10 +2047,19 @@ async def entrypoint(ctx: JobContext):
 if __name__ == "__main__":
     # Get agent name from environment variable
     agent_name = os.getenv("LK_AGENT_NAME", "ai")
+
+    # download-files fetches model files for every registered plugin, so they must all be imported
+    if "download-files" in sys.argv:
+        load_all_plugins()
     # logger.info(f"🤖 Agent name: {agent_name}")
     
+    # Dispatch stops sending calls once jobs, loop lag, CPU or RSS push the load over the threshold
+    worker_load = get_worker_load()
+    
     cli.run_app(WorkerOptions(
         entrypoint_fnc=entrypoint,
         prewarm_fnc=prewarm,
         agent_name=agent_name,
+        load_fnc=worker_load,
+        load_threshold=worker_load.config.load_threshold,
     ))
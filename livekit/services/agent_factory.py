@@ -5,19 +5,25 @@ Agent factory for creating and configuring LiveKit agents.
 import os
 import json
 import asyncio
-import datetime
 import logging
 from typing import Dict, Any, Optional
-from zoneinfo import ZoneInfo
 
 from livekit.agents import Agent
 from services.unified_agent import UnifiedAgent
-from integrations.calendar_api import CalComCalendar
-from config.settings import validate_model_names
-from utils.instruction_builder import build_call_management_instructions, build_analysis_instructions, build_workflow_instructions
+from integrations.calendar_api import CalComCalendar, get_event_type_cache
+from services.assistant_profile import AssistantProfile, get_assistant_profile
+from services.field_classification import get_field_classification_cache, fallback_classification
+from services.workflow_runtime import WorkflowRuntime
+from config.database import get_database_client
+from utils.instruction_builder import build_analysis_instructions, classify_structured_data, build_call_context_instructions
 
 logger = logging.getLogger(__name__)
 
+# create_agent() resolves the calendar itself unless the caller already did
+_UNRESOLVED = object()
+# How long a call waits for Cal.com to verify an event type that is not cached yet
+CALENDAR_VERIFY_TIMEOUT_SECONDS = float(os.getenv("CALCOM_VERIFY_TIMEOUT_SECONDS", "2.0"))
+
 # Global OpenAI client for field classification
 _OPENAI_CLIENT = None
 
@@ -30,52 +36,48 @@ def get_openai_client():
     return _OPENAI_CLIENT
 
 
-class AgentFactory:
-    """Factory for creating and configuring agents."""
-    
-    def __init__(self, prewarmed_llms=None, prewarmed_tts=None, prewarmed_vad=None):
-        self._prewarmed_llms = prewarmed_llms or {}
-        self._prewarmed_tts = prewarmed_tts or {}
-        self._prewarmed_vad = prewarmed_vad
+def _split_explicit_fields(structured_data: list):
+    """Split fields into names with an explicit askTiming and fields left to classify."""
+    explicit_ask = []
+    to_classify = []
+    for field in structured_data:
+        timing = field.get("askTiming", "none")
+        if timing in ["start", "middle", "end"]:
+            explicit_ask.append(field.get("name", ""))
+        else:
+            to_classify.append(field)
+    return explicit_ask, to_classify
+
+
+async def classify_fields_with_llm(structured_data: list) -> Dict[str, list]:
+    """
+    Use LLM to classify which fields should be asked vs extracted.
+
+    Raises on failure, so a fallback is never cached as the classification.
+    """
+    explicit_ask, to_classify = _split_explicit_fields(structured_data)
+    if not to_classify:
+        return {
+            "ask_user": explicit_ask,
+            "extract_from_conversation": []
+        }
+
+    if not os.getenv("OPENAI_API_KEY"):
+        raise RuntimeError("OPENAI_API_KEY not configured for field classification")
+
+    client = get_openai_client()
+
+    # Prepare field descriptions for remaining fields
+    fields_json = json.dumps([
+        {
+            "name": field.get("name", ""),
+            "description": field.get("description", ""),
+            "type": field.get("type", "string")
+        }
+        for field in to_classify
+    ], indent=2)
     
-    async def _classify_data_fields_with_llm(self, structured_data: list) -> Dict[str, list]:
-        """Use LLM to classify which fields should be asked vs extracted."""
-        try:
-            # First, check for fields that have explicit timing set by the user
-            explicit_ask = []
-            to_classify = []
-            
-            for field in structured_data:
-                timing = field.get("askTiming", "none")
-                if timing in ["start", "middle", "end"]:
-                    explicit_ask.append(field.get("name", ""))
-                else:
-                    to_classify.append(field)
-            
-            if not to_classify:
-                return {
-                    "ask_user": explicit_ask,
-                    "extract_from_conversation": []
-                }
-
-            openai_api_key = os.getenv("OPENAI_API_KEY")
-            if not openai_api_key:
-                logger.warning("OPENAI_API_KEY not configured for field classification")
-                return {"ask_user": explicit_ask, "extract_from_conversation": [f.get("name", "") for f in to_classify]}
-
-            client = get_openai_client()
-            
-            # Prepare field descriptions for remaining fields
-            fields_json = json.dumps([
-                {
-                    "name": field.get("name", ""),
-                    "description": field.get("description", ""),
-                    "type": field.get("type", "string")
-                }
-                for field in to_classify
-            ], indent=2)
-            
-            classification_prompt = f"""You are analyzing data fields for a voice conversation system. For each field, decide whether it should be:
+    classification_prompt = f"""You are analyzing data fields for a voice conversation system. For each field, decide whether it should be:
 1. "ask_user" - Information that should be directly asked from the user during the conversation
 2. "extract_from_conversation" - Information that should be extracted/inferred from the conversation after it ends
 
@@ -92,130 +94,129 @@ Return a JSON object with two arrays. You must respond with valid JSON format on
   "extract_from_conversation": ["field_name3", "field_name4"]
 }}"""
 
-            response = await asyncio.wait_for(
-                client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": classification_prompt}],
-                    temperature=0.1,
-                    max_tokens=1000
-                ),
-                timeout=10.0
-            )
-            
-            content = response.choices[0].message.content.strip()
-            logger.info(f"FIELD_CLASSIFICATION_RESPONSE | response={content}")
-            
-            # Parse JSON response
-            try:
-                classification = json.loads(content)
-                # Combine explicit asks with LLM-suggested asks
-                classification["ask_user"] = list(set(classification.get("ask_user", []) + explicit_ask))
-                logger.info(f"FIELD_CLASSIFICATION_SUCCESS | ask_user={len(classification.get('ask_user', []))} | extract={len(classification.get('extract_from_conversation', []))}")
-                return classification
-            except json.JSONDecodeError as e:
-                logger.error(f"FIELD_CLASSIFICATION_JSON_ERROR | error={str(e)} | content={content}")
-                # Fallback to asking user for all fields
-                return {
-                    "ask_user": [field.get("name", "") for field in structured_data],
-                    "extract_from_conversation": []
-                }
-                
-        except Exception as e:
-            logger.error(f"FIELD_CLASSIFICATION_ERROR | error={str(e)}")
-            # Fallback to asking user for all fields
+    response = await asyncio.wait_for(
+        client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": classification_prompt}],
+            temperature=0.1,
+            max_tokens=1000
+        ),
+        timeout=10.0
+    )
+    
+    content = response.choices[0].message.content.strip()
+    logger.info(f"FIELD_CLASSIFICATION_RESPONSE | response={content}")
+    
+    # Parse JSON response
+    try:
+        classification = json.loads(content)
+    except json.JSONDecodeError as e:
+        logger.error(f"FIELD_CLASSIFICATION_JSON_ERROR | error={str(e)} | content={content}")
+        raise
+    # Combine explicit asks with LLM-suggested asks
+    classification["ask_user"] = list(set(classification.get("ask_user", []) + explicit_ask))
+    logger.info(f"FIELD_CLASSIFICATION_SUCCESS | ask_user={len(classification.get('ask_user', []))} | extract={len(classification.get('extract_from_conversation', []))}")
+    return classification
+
+
+class AgentFactory:
+    """Factory for creating and configuring agents."""
+    
+    async def _classify_data_fields(self, structured_data: list) -> Dict[str, list]:
+        """Classify which fields should be asked vs extracted, without waiting on the LLM."""
+        explicit_ask, to_classify = _split_explicit_fields(structured_data)
+        if not to_classify:
             return {
-                "ask_user": [field.get("name", "") for field in structured_data],
+                "ask_user": explicit_ask,
                 "extract_from_conversation": []
             }
 
-    async def create_agent(self, config: Dict[str, Any]) -> Agent:
+        if not os.getenv("OPENAI_API_KEY"):
+            logger.warning("OPENAI_API_KEY not configured for field classification")
+            return fallback_classification(structured_data)
 
-        """Create appropriate agent based on configuration."""
-        # Validate model names first
-        config = validate_model_names(config)
-        
-        instructions = config.get("prompt", "You are a helpful assistant.")
+        # Cached per field list; a miss is classified in the background and uses the fallback meanwhile
+        cache = get_field_classification_cache(get_database_client(), classify_fields_with_llm)
+        return await cache.classify(structured_data)
 
-        # Add date context only if calendar is configured
-        cal_api_key = config.get('cal_api_key')
-        cal_event_type_id = config.get('cal_event_type_id')
-        if cal_api_key and cal_event_type_id:
-            tz_name = (config.get("cal_timezone") or "Asia/Karachi")
-            try:
-                now_local = datetime.datetime.now(ZoneInfo(tz_name))
-            except Exception as e:
-                logger.warning(f"Invalid timezone '{tz_name}': {str(e)}, falling back to UTC")
-                tz_name = "UTC"
-                now_local = datetime.datetime.now(ZoneInfo(tz_name))
-            instructions += (
-                f"\n\nCONTEXT:\n"
-                f"- Current local time: {now_local.isoformat()}\n"
-                f"- Timezone: {tz_name}\n"
-                f"- When the user says a date like '7th October', always interpret it as the next FUTURE occurrence in {tz_name}. "
-                f"Never call tools with past dates; if a parsed date is in the past year, bump it to the next year."
-            )
-
-        # Add call management settings to instructions
-        call_management_config = build_call_management_instructions(config)
-        if call_management_config:
-            instructions += "\n\n" + call_management_config
+    async def resolve_analysis_instructions(self, config: Dict[str, Any], profile: Optional[AssistantProfile] = None) -> str:
+        """Classify the structured data fields and build their instructions."""
+        if profile is None:
+            return await build_analysis_instructions(config, self._classify_data_fields)
+        # Rendered once per classification by the profile's template
+        template = profile.instruction_template
+        if not template.structured_data:
+            return ""
+        classification = await classify_structured_data(template.structured_data, self._classify_data_fields)
+        return template.analysis_instructions(classification)
+
+    async def resolve_calendar(self, config: Dict[str, Any]) -> Optional[CalComCalendar]:
+        """Create and initialize the assistant's calendar, if one is configured."""
+        return await self._initialize_calendar(config)
+
+    async def create_agent(
+        self,
+        config: Dict[str, Any],
+        profile: Optional[AssistantProfile] = None,
+        analysis_instructions: Optional[str] = None,
+        calendar: Any = _UNRESOLVED,
+    ) -> Agent:
+        """Create appropriate agent based on configuration.
+
+        analysis_instructions and calendar may be resolved ahead of time (e.g. concurrently
+        with session creation); they are resolved here when not passed.
+        """
+        # Model names and static instruction blocks are compiled once per assistant version
+        if profile is None:
+            profile = get_assistant_profile(config)
 
         # Add analysis instructions for structured data collection
-        # Pass self._classify_data_fields_with_llm as the classifier function
-        analysis_instructions = await build_analysis_instructions(config, self._classify_data_fields_with_llm)
+        if analysis_instructions is None:
+            analysis_instructions = await self.resolve_analysis_instructions(config, profile)
         if analysis_instructions:
-            instructions += "\n\n" + analysis_instructions
             logger.info(f"ANALYSIS_INSTRUCTIONS_ADDED | length={len(analysis_instructions)}")
 
-        # Add workflow (node-based) instructions if available
-        workflow_instructions = build_workflow_instructions(config)
-        if workflow_instructions:
-            instructions += "\n\n" + workflow_instructions
-            logger.info(f"WORKFLOW_INSTRUCTIONS_ADDED | length={len(workflow_instructions)}")
-
-        # Add first message handling
-        first_message = config.get("first_message", "")
-        force_first = os.getenv("FORCE_FIRST_MESSAGE", "true").lower() != "false"
-        if force_first and first_message:
-            instructions += f' IMPORTANT: Start the conversation by saying exactly: "{first_message}" Do not repeat or modify this greeting.'
-            logger.info(f"FIRST_MESSAGE_SET | first_message={first_message}")
+        if profile.workflow is not None:
+            logger.info(f"WORKFLOW_RUNTIME | states={len(profile.workflow)} | start={profile.workflow.start_id}")
+        elif profile.workflow_instructions:
+            logger.info(f"WORKFLOW_INSTRUCTIONS_ADDED | length={len(profile.workflow_instructions)}")
 
-       
-        calendar = await self._initialize_calendar(config)
+        if profile.first_message_instructions:
+            logger.info(f"FIRST_MESSAGE_SET | first_message={config.get('first_message', '')}")
 
-      
-
-        # Add data collection instructions
-        instructions += "\n\nDATA COLLECTION TOOLS:\nYou have access to tools for collecting customer information. YOU MUST use these tools when the user provides this information or when you collect it:\n- set_name: Set the customer's name\n- set_email: Set the customer's email\n- set_phone: Set the customer's phone number\n- set_notes: Set notes or summary of the conversation"
-        
-        # Add email collection instructions for letter-by-letter spelling
-        instructions += "\n\nEMAIL COLLECTION PROTOCOL:\nWhen collecting email addresses, follow this EXACT protocol to ensure accuracy:\n1. Ask the user to spell their email address LETTER BY LETTER\n2. Say EXACTLY: 'Please spell your email address letter by letter.'\n3. Do NOT add any justification, explanation, or conversational filler like 'it will help me with...' or 'so I can...'\n4. Listen carefully as they spell each letter\n5. For special characters, listen for:\n   - 'at' or 'at sign' or '@' for the @ symbol\n   - 'dot' or 'period' or '.' for periods\n   - 'underscore' or 'dash' or 'hyphen' for _ or -\n6. After receiving the spelled email, ALWAYS repeat it back to confirm: 'Let me confirm, your email is [email]? Is that correct?'\n7. Wait for confirmation before calling set_email\n8. If the user says it's incorrect, ask them to spell it again \n9. Only call set_email() after the user confirms the email is correct"
+        if calendar is _UNRESOLVED:
+            calendar = await self.resolve_calendar(config)
 
         if calendar:
-            instructions += "\n\nBOOKING CAPABILITIES:\nYou can help users book appointments. You have access to the following booking tools:\n- list_slots_on_day: Show available appointment slots for a specific day (shows 10 slots by default - use max_options=20 to show more)\n- choose_slot: Select a time slot for the appointment (can use time like '7:00pm' or slot number from list)\n- finalize_booking: Complete the booking when ALL information is collected (time slot, name, email, phone)\n\nCRITICAL BOOKING RULES:\n- ONLY start booking if the user explicitly requests it (e.g., 'I want to book', 'schedule an appointment', 'book a time')\n- Do NOT automatically start booking just because you have contact information (phone, email, name)\n- Do NOT call list_slots_on_day or any booking tools unless the user explicitly asks to book or schedule an appointment\n- Do NOT call finalize_booking or confirm_details until you have: 1) selected time slot, 2) customer name, 3) email, and 4) phone number. Only call ONE of these functions, not both."
             logger.info("BOOKING_TOOLS | Calendar booking tools added to instructions")
         else:
-            instructions += "\n\nBOOKING UNAVAILABLE:\nYou do NOT have access to a calendar or booking system. If the user asks to book an appointment or schedule a time, you must politely decline and explain that you don't have access to booking capabilities at the moment. You can offer to take their contact information (Name, Email, Phone) so someone can get back to them."
             logger.info("BOOKING_TOOLS | Booking unavailable - added explicit decline instructions")
 
-        # Create unified agent with both RAG and booking capabilities
-        # Use pre-warmed components if available
-        llm_provider = config.get("llm_provider_setting", "OpenAI")
-        llm_model = config.get("llm_model_setting", "gpt-4o-mini")
-        config_key = f"{llm_provider}_{llm_model}"
-        
-        prewarmed_llm = self._prewarmed_llms.get(config_key)
-        prewarmed_tts = self._prewarmed_tts.get("openai_nova")
-        prewarmed_vad = self._prewarmed_vad
-        
+        # Everything per assistant comes first, pre-joined by the profile's template, so the
+        # provider can reuse its cached prompt prefix across calls; per-call data goes last
+        template = profile.instruction_template
+        call_blocks = build_call_context_instructions(config)
+        instructions = template.render(analysis_instructions, bool(calendar), call_blocks)
+        # The prefix hash should only change when the assistant is edited
+        prefix = template.prefix(analysis_instructions, bool(calendar))
+        prefix_hash = template.prefix_hash(analysis_instructions, bool(calendar))
+        logger.info(f"INSTRUCTIONS_ASSEMBLED | length={len(instructions)} | static_prefix={len(prefix)} | prefix_hash={prefix_hash} | call_blocks={len(call_blocks)}")
+
+        # The current workflow state goes last; transitions only swap this block
+        workflow_runtime = WorkflowRuntime(profile.workflow) if profile.workflow is not None else None
+        base_instructions = instructions
+        if workflow_runtime is not None:
+            instructions = workflow_runtime.instructions(base_instructions)
+
+        # Create unified agent with both RAG and booking capabilities; the models (and the
+        # pooled transports behind them) belong to the session
         agent = UnifiedAgent(
             instructions=instructions,
             calendar=calendar,
             company_id=config.get("id"),
-            prewarmed_llm=prewarmed_llm,
-            prewarmed_tts=prewarmed_tts,
-            prewarmed_vad=prewarmed_vad
         )
+        if workflow_runtime is not None:
+            await agent.set_workflow(workflow_runtime, base_instructions)
         
         # Configure Call Transfer
         if config.get("advancedSettings", {}).get("transferEnabled") or config.get("transfer_enabled"):
@@ -240,7 +241,7 @@ Return a JSON object with two arrays. You must respond with valid JSON format on
         return agent
 
     async def _initialize_calendar(self, config: Dict[str, Any]) -> Optional[CalComCalendar]:
-        """Initialize calendar if credentials are available."""
+        """Create the calendar if credentials are available and Cal.com accepts them."""
         # Debug logging for calendar configuration
         cal_api_key = config.get('cal_api_key')
         cal_event_type_id = config.get('cal_event_type_id')
@@ -288,19 +289,31 @@ Return a JSON object with two arrays. You must respond with valid JSON format on
                 # Get timezone from config, default to Asia/Karachi for Pakistan
                 cal_timezone = config.get("cal_timezone") or "Asia/Karachi"
                 logger.info(f"CALENDAR_CONFIG | api_key={'*' * 10} | event_type_id={event_type_id} | timezone={cal_timezone}")
+                # Event type metadata comes from the process-wide cache and is refreshed in the
+                # background; only a cold miss waits on Cal.com, and only briefly
+                event_type_cache = get_event_type_cache()
+                metadata = event_type_cache.get(config.get("cal_api_key"), event_type_id)
+                if metadata is None:
+                    try:
+                        # Shielded: a fetch that outlasts the wait still fills the cache for the next call
+                        metadata = await asyncio.wait_for(
+                            asyncio.shield(event_type_cache.refresh(config.get("cal_api_key"), event_type_id)),
+                            timeout=CALENDAR_VERIFY_TIMEOUT_SECONDS,
+                        )
+                    except Exception as e:
+                        # Unverified credentials get no booking tools, as when initialization failed
+                        logger.warning(f"CALENDAR_UNVERIFIED | event_type_id={event_type_id} | error={str(e) or type(e).__name__} | booking tools left out")
+                        return None
+                if not metadata.valid:
+                    logger.error(f"CALENDAR_INIT_FAILED | event type {event_type_id} not accessible with this API key")
+                    return None
                 calendar = CalComCalendar(
                     api_key=config.get("cal_api_key"),
                     event_type_id=event_type_id,
                     timezone=cal_timezone
                 )
-                # Initialize the calendar
-                try:
-                    await calendar.initialize()
-                    logger.info("CALENDAR_INITIALIZED | calendar setup successful")
-                    return calendar
-                except Exception as e:
-                    logger.error(f"CALENDAR_INIT_FAILED | error={str(e)}")
-                    return None
+                logger.info(f"CALENDAR_INITIALIZED | calendar setup successful | event_length={metadata.length_minutes}")
+                return calendar
             else:
                 logger.error("CALENDAR_CONFIG_FAILED | invalid event_type_id")
                 return None
@@ -0,0 +1,210 @@
+"""
+Compiled, immutable assistant profiles.
+
+A profile is built once per (assistant id, updatedAt) from the flattened
+assistant config: model names are validated and the static instruction blocks
+are rendered up front, so concurrent calls on the same assistant share one
+read-only artifact instead of re-validating and re-building strings per call.
+"""
+
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Mapping, Tuple
+
+from config.settings import validate_model_names
+from integrations.assistant_cache import get_assistant_cache
+from services.workflow_runtime import (
+    CompiledWorkflow,
+    compile_workflow,
+    workflow_runtime_enabled,
+    WORKFLOW_RUNTIME_INSTRUCTIONS,
+)
+from utils.instruction_builder import (
+    build_call_management_instructions,
+    build_workflow_instructions,
+    build_first_message_instructions,
+    build_data_collection_instructions,
+    compact_instruction_blocks,
+    instruction_compaction_enabled,
+    BOOKING_INSTRUCTIONS,
+    BOOKING_UNAVAILABLE_INSTRUCTIONS,
+    InstructionTemplate,
+    get_structured_data_fields,
+)
+from utils.latency_logger import increment_counter
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILES = 1000
+
+
+@dataclass(frozen=True)
+class AssistantProfile:
+    """Validated assistant config plus its pre-rendered static instructions."""
+    assistant_id: Optional[str]
+    updated_at: Any
+    config: Mapping[str, Any]
+
+    # Validated provider/model choices
+    llm_provider: str
+    llm_model: str
+    voice_provider: str
+    voice_model: str
+    voice_name: str
+    stt_model: str
+
+    # Static instruction blocks (empty string when not applicable)
+    call_management_instructions: str
+    workflow_instructions: str
+    first_message_instructions: str
+    data_collection_instructions: str
+    booking_instructions: str
+    booking_unavailable_instructions: str
+
+    # All of the above joined once; calls only fill its slots
+    instruction_template: InstructionTemplate
+
+    # Workflow graph as a state machine (None when flattened into workflow_instructions)
+    workflow: Optional[CompiledWorkflow] = None
+
+    def call_config(self) -> Dict[str, Any]:
+        """Per-call copy of the config; top-level keys may be mutated freely."""
+        return dict(self.config)
+
+
+def compile_assistant_profile(config: Dict[str, Any], compact: Optional[bool] = None) -> AssistantProfile:
+    """
+    Validate model names and render static instructions for an assistant config.
+
+    Args:
+        config: Flattened assistant config
+        compact: Drop rules that do not apply or are repeated (default: INSTRUCTION_COMPACTION_ENABLED)
+    """
+    # Deep copy so the shared profile never aliases a caller's nested dicts
+    validated = validate_model_names(copy.deepcopy(config))
+    if compact is None:
+        compact = instruction_compaction_enabled()
+
+    prompt = validated.get("prompt", "You are a helpful assistant.")
+    call_management_instructions = build_call_management_instructions(validated, compact=compact)
+    # Only the current state goes into each turn's instructions when the runtime is on
+    workflow = compile_workflow(validated) if workflow_runtime_enabled() else None
+    workflow_instructions = WORKFLOW_RUNTIME_INSTRUCTIONS if workflow else build_workflow_instructions(validated)
+    first_message_instructions = build_first_message_instructions(validated)
+    data_collection_instructions = build_data_collection_instructions(validated, compact=compact)
+
+    if compact:
+        # The prompt comes first, so its wording wins over the built-in blocks
+        (
+            prompt,
+            call_management_instructions,
+            workflow_instructions,
+            first_message_instructions,
+            data_collection_instructions,
+        ) = compact_instruction_blocks([
+            prompt,
+            call_management_instructions,
+            workflow_instructions,
+            first_message_instructions,
+            data_collection_instructions,
+        ])
+
+    # Same block order as assemble_instructions() in AgentFactory.create_agent
+    instruction_template = InstructionTemplate(
+        head_blocks=[prompt, call_management_instructions],
+        tail_blocks=[workflow_instructions, first_message_instructions, data_collection_instructions],
+        booking=BOOKING_INSTRUCTIONS,
+        booking_unavailable=BOOKING_UNAVAILABLE_INSTRUCTIONS,
+        structured_data=get_structured_data_fields(validated),
+    )
+
+    return AssistantProfile(
+        assistant_id=validated.get("id"),
+        updated_at=validated.get("updated_at"),
+        config=MappingProxyType(validated),
+        llm_provider=validated.get("llm_provider_setting", "OpenAI"),
+        llm_model=validated.get("llm_model_setting", "gpt-4o-mini"),
+        voice_provider=validated.get("voice_provider_setting", "OpenAI"),
+        voice_model=validated.get("voice_model_setting", "gpt-4o-mini-tts"),
+        voice_name=validated.get("voice_name_setting", "alloy"),
+        stt_model=validated.get("stt_model", "whisper-1"),
+        call_management_instructions=call_management_instructions,
+        workflow_instructions=workflow_instructions,
+        first_message_instructions=first_message_instructions,
+        data_collection_instructions=data_collection_instructions,
+        booking_instructions=BOOKING_INSTRUCTIONS,
+        booking_unavailable_instructions=BOOKING_UNAVAILABLE_INSTRUCTIONS,
+        instruction_template=instruction_template,
+        workflow=workflow,
+    )
+
+
+class AssistantProfileCache:
+    """Bounded cache of compiled profiles keyed by (assistant id, updatedAt)."""
+
+    def __init__(self, max_entries: int = MAX_PROFILES):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[Tuple[str, str], AssistantProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+        get_assistant_cache().add_invalidation_listener(self._on_assistant_invalidated)
+
+    @staticmethod
+    def _key(config: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        assistant_id = config.get("id")
+        if not assistant_id:
+            return None
+        if config.get("workflow_node_count") and not config.get("sections_loaded", True):
+            # Workflow nodes failed to load; don't pin a profile without them
+            return None
+        return (str(assistant_id), str(config.get("updated_at")))
+
+    def get(self, config: Dict[str, Any]) -> AssistantProfile:
+        """Return the compiled profile for this config, compiling it on first use."""
+        key = self._key(config)
+        if key is None:
+            # Ad-hoc configs (e.g. web previews without an id) and incomplete ones are never cached
+            return compile_assistant_profile(config)
+
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+                increment_counter("assistant_profile.hits")
+                return profile
+
+        increment_counter("assistant_profile.misses")
+        profile = compile_assistant_profile(config)
+        logger.info(f"ASSISTANT_PROFILE_COMPILED | assistant_id={key[0]} | updated_at={key[1]}")
+
+        with self._lock:
+            self._profiles[key] = profile
+            self._profiles.move_to_end(key)
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+        return profile
+
+    def invalidate(self, assistant_id: str) -> None:
+        """Drop every compiled version of an assistant."""
+        with self._lock:
+            for key in [k for k in self._profiles if k[0] == assistant_id]:
+                del self._profiles[key]
+
+    def _on_assistant_invalidated(self, assistant_id: str, reason: str) -> None:
+        # Covers documents without updatedAt, whose key never changes on edit
+        self.invalidate(assistant_id)
+
+
+# Global profile cache
+_profile_cache: Optional[AssistantProfileCache] = None
+
+
+def get_assistant_profile(config: Dict[str, Any]) -> AssistantProfile:
+    """Get the compiled profile for a resolved assistant config."""
+    global _profile_cache
+    if _profile_cache is None:
+        _profile_cache = AssistantProfileCache()
+    return _profile_cache.get(config)
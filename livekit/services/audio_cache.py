@@ -0,0 +1,262 @@
+"""
+On-disk cache of pre-synthesized audio for fixed assistant phrases.
+
+Clips (e.g. the greeting) are keyed by the TTS configuration and the text, so
+an edited message or voice simply produces a new key. A clip is rendered once
+through the call's TTS instance, stored as raw 16-bit PCM and memory-mapped
+for playback, which starts without a TTS round trip.
+"""
+
+import os
+import mmap
+import time
+import json
+import struct
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
+
+from livekit import rtc
+
+from utils.latency_logger import increment_counter, observe
+
+logger = logging.getLogger(__name__)
+
+CLIP_SUFFIX = ".pcm"
+# magic, sample rate, channels
+_HEADER = struct.Struct("<4sIH")
+_MAGIC = b"LKA1"
+FRAME_MS = 20
+MAX_OPEN_CLIPS = 256
+
+
+@dataclass
+class AudioCacheConfig:
+    """Audio cache configuration settings."""
+    enabled: bool = True
+    cache_dir: str = "data/audio_cache"
+    max_bytes: int = 200 * 1024 * 1024
+    max_text_chars: int = 500
+
+    @classmethod
+    def from_env(cls) -> "AudioCacheConfig":
+        return cls(
+            enabled=os.getenv("AUDIO_CACHE_ENABLED", "true").lower() == "true",
+            cache_dir=os.getenv("AUDIO_CACHE_DIR", "data/audio_cache"),
+            max_bytes=int(float(os.getenv("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024),
+            max_text_chars=int(os.getenv("AUDIO_CACHE_MAX_TEXT_CHARS", "500")),
+        )
+
+
+@dataclass(frozen=True)
+class VoiceSpec:
+    """TTS settings a clip was rendered with."""
+    provider: str
+    model: str
+    voice: str
+    language: str
+    speed: float
+    volume: float
+    emotion: str
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "VoiceSpec":
+        return cls(
+            provider=str(config.get("voice_provider_setting", "OpenAI")),
+            model=str(config.get("voice_model_setting", "gpt-4o-mini-tts")),
+            voice=str(config.get("voice_name_setting", "alloy")),
+            language=str(config.get("language_setting", "en")),
+            speed=float(config.get("speed") or 1.0),
+            volume=float(config.get("volume") or 1.0),
+            # Cartesia accepts a single emotion or a list of them
+            emotion=json.dumps(config.get("emotion") or "", sort_keys=True),
+        )
+
+    def clip_key(self, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        payload = json.dumps({**asdict(self), "text": text_hash}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class AudioClipCache:
+    """Renders, stores and plays back cached clips."""
+
+    def __init__(self, config: Optional[AudioCacheConfig] = None):
+        self.config = config or AudioCacheConfig.from_env()
+        self._open: "OrderedDict[str, Tuple[mmap.mmap, int, int]]" = OrderedDict()
+        self._rendering: Dict[str, asyncio.Task] = {}
+
+    def cacheable(self, text: str) -> bool:
+        return self.config.enabled and bool(text) and len(text) <= self.config.max_text_chars
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.config.cache_dir, key + CLIP_SUFFIX)
+
+    # -------- playback
+
+    def open_clip(self, spec: VoiceSpec, text: str) -> Optional[AsyncIterator[rtc.AudioFrame]]:
+        """
+        Get a cached clip as audio frames for session.say(text, audio=...).
+
+        Returns:
+            An async iterator of frames, or None on a cache miss
+        """
+        if not self.cacheable(text):
+            return None
+        key = spec.clip_key(text)
+        clip = self._map(key)
+        if clip is None:
+            increment_counter("audio_cache.misses")
+            return None
+        increment_counter("audio_cache.hits")
+        return _iter_frames(*clip)
+
+    def has_clip(self, spec: VoiceSpec, text: str) -> bool:
+        return self.cacheable(text) and os.path.exists(self._path(spec.clip_key(text)))
+
+    def _map(self, key: str) -> Optional[Tuple[mmap.mmap, int, int]]:
+        clip = self._open.get(key)
+        if clip is not None:
+            self._open.move_to_end(key)
+            return clip
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, sample_rate, num_channels = _HEADER.unpack_from(mapped, 0)
+        except (FileNotFoundError, ValueError):
+            return None
+        except (OSError, struct.error) as e:
+            logger.warning(f"AUDIO_CACHE_READ_FAILED | key={key} | error={str(e)}")
+            return None
+        if magic != _MAGIC:
+            logger.warning(f"AUDIO_CACHE_BAD_CLIP | key={key}")
+            mapped.close()
+            return None
+
+        # Keep the mtime as a last-used marker for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        clip = (mapped, sample_rate, num_channels)
+        self._open[key] = clip
+        while len(self._open) > MAX_OPEN_CLIPS:
+            # Not closed explicitly: a call may still be playing from it
+            self._open.popitem(last=False)
+        return clip
+
+    # -------- rendering
+
+    def prerender(self, tts, spec: VoiceSpec, text: str) -> Optional[asyncio.Task]:
+        """Render a clip in the background unless it is cached or being rendered."""
+        if not self.cacheable(text) or self.has_clip(spec, text):
+            return None
+        key = spec.clip_key(text)
+        task = self._rendering.get(key)
+        if task is not None and not task.done():
+            return task
+        task = asyncio.get_running_loop().create_task(self.render(tts, spec, text))
+        task.add_done_callback(lambda _: self._rendering.pop(key, None))
+        self._rendering[key] = task
+        return task
+
+    async def render(self, tts, spec: VoiceSpec, text: str) -> bool:
+        """Synthesize text with the given TTS instance and store it."""
+        key = spec.clip_key(text)
+        start = time.perf_counter()
+        pcm = bytearray()
+        sample_rate = num_channels = None
+        try:
+            stream = tts.synthesize(text)
+            try:
+                async for audio in stream:
+                    frame = audio.frame
+                    sample_rate, num_channels = frame.sample_rate, frame.num_channels
+                    pcm.extend(frame.data.tobytes())
+            finally:
+                await stream.aclose()
+        except Exception as e:
+            increment_counter("audio_cache.render_failures")
+            logger.warning(f"AUDIO_CACHE_RENDER_FAILED | key={key} | provider={spec.provider} | error={str(e)}")
+            return False
+
+        if not pcm or sample_rate is None:
+            return False
+
+        await asyncio.to_thread(self._write_clip, key, sample_rate, num_channels, bytes(pcm))
+        duration_ms = (time.perf_counter() - start) * 1000
+        observe("audio_cache.render_ms", duration_ms)
+        increment_counter("audio_cache.renders")
+        logger.info(f"AUDIO_CACHE_RENDERED | key={key} | provider={spec.provider} | voice={spec.voice} | bytes={len(pcm)} | render_ms={duration_ms:.1f}")
+        return True
+
+    def _write_clip(self, key: str, sample_rate: int, num_channels: int, pcm: bytes) -> None:
+        os.makedirs(self.config.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, sample_rate, num_channels))
+            f.write(pcm)
+        # Readers only ever see complete clips
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        """Delete the least recently used clips beyond max_bytes."""
+        clips = []
+        for name in os.listdir(self.config.cache_dir):
+            if not name.endswith(CLIP_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.config.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            clips.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in clips)
+        for _, size, name in sorted(clips):
+            if total <= self.config.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.config.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            increment_counter("audio_cache.evictions")
+
+
+async def _iter_frames(mapped: mmap.mmap, sample_rate: int, num_channels: int) -> AsyncIterator[rtc.AudioFrame]:
+    samples_per_frame = sample_rate * FRAME_MS // 1000
+    frame_bytes = samples_per_frame * num_channels * 2
+    offset = _HEADER.size
+    end = len(mapped)
+    while offset < end:
+        data = mapped[offset:offset + frame_bytes]
+        offset += frame_bytes
+        samples = len(data) // (2 * num_channels)
+        if samples == 0:
+            break
+        yield rtc.AudioFrame(
+            data=data[:samples * num_channels * 2],
+            sample_rate=sample_rate,
+            num_channels=num_channels,
+            samples_per_channel=samples,
+        )
+
+
+# Global audio clip cache
+_audio_cache: Optional[AudioClipCache] = None
+
+
+def get_audio_cache() -> AudioClipCache:
+    """Get the global audio clip cache."""
+    global _audio_cache
+    if _audio_cache is None:
+        _audio_cache = AudioClipCache()
+    return _audio_cache
@@ -13,16 +13,21 @@ import asyncio
 import time
 from typing import Tuple
 
-try:
-    from openai import AsyncOpenAI
-except ImportError:
-    AsyncOpenAI = None
-
 from utils.latency_logger import measure_latency_context
 
 
 logger = logging.getLogger(__name__)
 
+
+def _async_openai_class():
+    # The OpenAI SDK is imported on first use to keep worker startup fast
+    try:
+        from openai import AsyncOpenAI
+    except ImportError:
+        return None
+    return AsyncOpenAI
+
+
 @dataclass
 class CallOutcomeAnalysis:
     """Result of call outcome analysis"""
@@ -40,6 +45,7 @@ class CallOutcomeService:
     def __init__(self):
         self.client = None
         api_key = os.getenv("OPENAI_API_KEY")
+        AsyncOpenAI = _async_openai_class()
         if AsyncOpenAI and api_key:
             try:
                 self.client = AsyncOpenAI(api_key=api_key)
@@ -8,7 +8,7 @@ import logging
 from typing import Optional, Dict, Any
 from livekit.agents import JobContext
 from integrations.mongo_client import MongoClient
-from utils.data_extractors import extract_did_from_room
+from utils.data_extractors import extract_did_from_room, get_room_name, get_room_metadata
 
 logger = logging.getLogger(__name__)
 
@@ -27,9 +27,11 @@ class ConfigResolver:
                 assistant_id = None
                 
                 # Try to get assistant_id from room metadata
-                if ctx.room.metadata:
+                # Read from the job's room info too, since this can run before ctx.connect() finishes
+                room_metadata_json = get_room_metadata(ctx)
+                if room_metadata_json:
                     try:
-                        room_metadata = json.loads(ctx.room.metadata)
+                        room_metadata = json.loads(room_metadata_json)
                         assistant_id = room_metadata.get("assistantId") or room_metadata.get("assistant_id")
                         logger.info(f"WEB_ASSISTANT_FROM_ROOM | assistant_id={assistant_id}")
                     except (json.JSONDecodeError, KeyError):
@@ -83,8 +85,9 @@ class ConfigResolver:
 
             # Fallback to room name extraction if not found in metadata
             if not called_did:
-                called_did = extract_did_from_room(ctx.room.name)
-                logger.info(f"INBOUND_ROOM_NAME_FALLBACK | room={ctx.room.name} | called_did={called_did}")
+                room_name = get_room_name(ctx)
+                called_did = extract_did_from_room(room_name)
+                logger.info(f"INBOUND_ROOM_NAME_FALLBACK | room={room_name} | called_did={called_did}")
 
             if called_did:
                 logger.info(f"INBOUND_LOOKUP | looking up assistant for DID={called_did}")
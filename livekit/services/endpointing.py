@@ -0,0 +1,406 @@
+"""
+Adaptive endpointing delays learned from observed turns.
+
+The assistant's configured min/max endpointing delays are a starting point.
+Every committed user turn (eou_metrics) is recorded per assistant, together
+with cut-offs (the user starts speaking again right after the turn was
+committed, i.e. it was committed too early) and false interruptions. After
+each window of turns the minimum delay is lowered while the cut-off and false
+interruption rates stay at the baseline measured with the configured delays,
+and raised again as soon as they go above it.
+
+The counters live on the assistant (advancedSettings.learnedEndpointing), not
+in the worker: every call adds its turns with $inc when it shuts down (or when
+a long call fills a window), so short job processes and concurrent workers all
+feed the same window and baseline. Whoever sees a full window closes it with a
+write conditioned on the window epoch, and new workers start from the saved
+delays.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import datetime
+import statistics
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Tuple
+
+from utils.latency_logger import increment_counter, set_gauge
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_DELAY = 0.4
+DEFAULT_MAX_DELAY = 0.8
+
+
+@dataclass
+class EndpointingConfig:
+    """Adaptive endpointing configuration settings."""
+    enabled: bool = True
+    window_turns: int = 20
+    floor_seconds: float = 0.15
+    step_up_seconds: float = 0.1
+    step_down_seconds: float = 0.05
+    tolerance: float = 0.02
+    baseline_windows: int = 3
+    smoothing: float = 0.3
+    cutoff_window_seconds: float = 1.5
+
+    @classmethod
+    def from_env(cls) -> "EndpointingConfig":
+        return cls(
+            enabled=os.getenv("ADAPTIVE_ENDPOINTING_ENABLED", "true").lower() == "true",
+            window_turns=int(os.getenv("ADAPTIVE_ENDPOINTING_WINDOW_TURNS", "20")),
+            floor_seconds=float(os.getenv("ADAPTIVE_ENDPOINTING_FLOOR_SECONDS", "0.15")),
+            step_up_seconds=float(os.getenv("ADAPTIVE_ENDPOINTING_STEP_UP_SECONDS", "0.1")),
+            step_down_seconds=float(os.getenv("ADAPTIVE_ENDPOINTING_STEP_DOWN_SECONDS", "0.05")),
+            tolerance=float(os.getenv("ADAPTIVE_ENDPOINTING_TOLERANCE", "0.02")),
+            baseline_windows=int(os.getenv("ADAPTIVE_ENDPOINTING_BASELINE_WINDOWS", "3")),
+            smoothing=float(os.getenv("ADAPTIVE_ENDPOINTING_SMOOTHING", "0.3")),
+            cutoff_window_seconds=float(os.getenv("ADAPTIVE_ENDPOINTING_CUTOFF_WINDOW_SECONDS", "1.5")),
+        )
+
+
+# Per-window counters; every call adds its turns to them with $inc
+WINDOW_COUNTERS = ("window_turns", "window_cutoffs", "window_false_interruptions", "window_transcription_delay")
+
+
+@dataclass
+class _AssistantEndpointing:
+    configured_min: float
+    configured_max: float
+    min_delay: float
+    max_delay: float
+    # Counters and rates aggregated over all workers, as saved on the assistant
+    learned: Dict[str, Any] = field(default_factory=dict)
+    # Turns of this process's calls not yet added to the saved counters
+    pending: Dict[str, float] = field(default_factory=dict)
+    eou_delays: List[float] = field(default_factory=list)
+
+
+class EndpointingController:
+    """Learns per-assistant endpointing delays from EOU metrics and interruptions."""
+
+    def __init__(self, store=None, config: Optional[EndpointingConfig] = None):
+        # Anything with async add_learned_endpointing_counts / close_learned_endpointing_window
+        # (MongoClient); without a store the counters only live in this process
+        self.store = store
+        self.config = config or EndpointingConfig.from_env()
+        self._assistants: Dict[str, _AssistantEndpointing] = {}
+        self._saving: Dict[str, asyncio.Task] = {}
+
+    # -------- delays
+
+    def delays(self, config: Dict[str, Any]) -> Tuple[float, float]:
+        """
+        Endpointing delays for a new session.
+
+        Returns:
+            (min_endpointing_delay, max_endpointing_delay)
+        """
+        configured_min, configured_max = _configured_delays(config)
+        assistant_id = config.get("id")
+        if not self.config.enabled or not assistant_id:
+            return configured_min, configured_max
+        state = self._state(str(assistant_id), config)
+        return state.min_delay, state.max_delay
+
+    def _state(self, assistant_id: str, config: Dict[str, Any]) -> _AssistantEndpointing:
+        configured_min, configured_max = _configured_delays(config)
+        state = self._assistants.get(assistant_id)
+        if state is not None and (state.configured_min, state.configured_max) == (configured_min, configured_max):
+            return state
+
+        # First call on this worker, or the assistant's delays were edited: start from the
+        # delays saved by earlier workers if they were learned against the same settings
+        state = _AssistantEndpointing(
+            configured_min=configured_min,
+            configured_max=configured_max,
+            min_delay=configured_min,
+            max_delay=configured_max,
+            learned=_fresh_learned(configured_min, configured_max),
+        )
+        learned = config.get("learned_endpointing") or {}
+        if (
+            learned.get("configured_min_delay") == configured_min
+            and learned.get("configured_max_delay") == configured_max
+            and learned.get("min_delay") is not None
+        ):
+            state.learned.update(learned)
+            state.min_delay, state.max_delay = _learned_delays(state.learned)
+        self._assistants[assistant_id] = state
+        return state
+
+    # -------- recording
+
+    def record_turn(self, config: Dict[str, Any], end_of_utterance_delay: float, transcription_delay: float) -> None:
+        """Record a committed user turn."""
+        assistant_id = config.get("id")
+        if not self.config.enabled or not assistant_id:
+            return
+        state = self._state(str(assistant_id), config)
+        state.eou_delays.append(max(0.0, float(end_of_utterance_delay)))
+        _add_counts(state.pending, {
+            "turns": 1,
+            "window_turns": 1,
+            "window_transcription_delay": round(max(0.0, float(transcription_delay)), 3),
+        })
+        if state.pending["window_turns"] >= self.config.window_turns:
+            # Long calls do not wait for shutdown to move the delays
+            self._flush_in_background(str(assistant_id), state)
+
+    def record_cutoff(self, config: Dict[str, Any]) -> None:
+        """Record a turn that was committed while the user was still talking."""
+        assistant_id = config.get("id")
+        if self.config.enabled and assistant_id:
+            _add_counts(self._state(str(assistant_id), config).pending, {"window_cutoffs": 1})
+            increment_counter("endpointing.cutoffs")
+
+    def record_false_interruption(self, config: Dict[str, Any]) -> None:
+        """Record a false interruption of the agent."""
+        assistant_id = config.get("id")
+        if self.config.enabled and assistant_id:
+            _add_counts(self._state(str(assistant_id), config).pending, {"window_false_interruptions": 1})
+            increment_counter("endpointing.false_interruptions")
+
+    # -------- saving
+
+    async def flush(self, config: Dict[str, Any]) -> None:
+        """Add the turns recorded for an assistant to its saved counters; run on call shutdown."""
+        assistant_id = config.get("id")
+        state = self._assistants.get(str(assistant_id)) if assistant_id else None
+        if state is None:
+            return
+        task = self._saving.get(str(assistant_id))
+        if task is not None and not task.done():
+            await asyncio.gather(task, return_exceptions=True)
+        await self._flush(str(assistant_id), state)
+
+    def _flush_in_background(self, assistant_id: str, state: _AssistantEndpointing) -> None:
+        if self.store is None:
+            self._flush_local(assistant_id, state)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = self._saving.get(assistant_id)
+        if task is not None and not task.done():
+            # A slow write is still in flight; the turns stay pending for the next flush
+            return
+        task = loop.create_task(self._flush(assistant_id, state))
+        task.add_done_callback(lambda _: self._saving.pop(assistant_id, None))
+        self._saving[assistant_id] = task
+
+    def _flush_local(self, assistant_id: str, state: _AssistantEndpointing) -> None:
+        counts, eou_delays = self._take_pending(state)
+        if not counts:
+            return
+        _add_counts(state.learned, counts)
+        if state.learned.get("window_turns", 0) >= self.config.window_turns:
+            set_fields, inc_fields = self._close_window(assistant_id, state.learned, eou_delays)
+            _apply(state.learned, set_fields, inc_fields)
+            state.min_delay, state.max_delay = _learned_delays(state.learned)
+
+    async def _flush(self, assistant_id: str, state: _AssistantEndpointing) -> None:
+        if self.store is None:
+            self._flush_local(assistant_id, state)
+            return
+        counts, eou_delays = self._take_pending(state)
+        if not counts:
+            return
+
+        learned = await self.store.add_learned_endpointing_counts(
+            assistant_id, state.configured_min, state.configured_max, counts
+        )
+        if learned is None:
+            # Database unavailable; keep the counts for the next flush
+            _add_counts(state.pending, counts)
+            return
+        state.learned = learned
+        if learned.get("window_turns", 0) < self.config.window_turns:
+            return
+
+        # The window is full across all workers; whoever closes it first at this epoch wins
+        set_fields, inc_fields = self._close_window(assistant_id, learned, eou_delays)
+        if await self.store.close_learned_endpointing_window(assistant_id, learned.get("window_epoch", 0), set_fields, inc_fields):
+            _apply(state.learned, set_fields, inc_fields)
+            state.min_delay, state.max_delay = _learned_delays(state.learned)
+
+    def _take_pending(self, state: _AssistantEndpointing) -> Tuple[Dict[str, float], List[float]]:
+        counts = {name: value for name, value in state.pending.items() if value}
+        eou_delays = state.eou_delays
+        state.pending = {}
+        state.eou_delays = []
+        return counts, eou_delays
+
+    def _close_window(self, assistant_id: str, learned: Dict[str, Any], eou_delays: List[float]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        Decide the next delays from the aggregated window counters.
+
+        Returns:
+            ($set fields, $inc fields) for the saved learned state; the window counters
+            are decremented by what was read so turns added meanwhile are kept
+        """
+        turns = learned["window_turns"]
+        cutoffs = learned.get("window_cutoffs", 0)
+        false_interruptions = learned.get("window_false_interruptions", 0)
+        transcription_total = learned.get("window_transcription_delay", 0.0)
+        window_cutoff_rate = cutoffs / turns
+        window_false_interruption_rate = false_interruptions / turns
+        transcription_mean = transcription_total / turns
+
+        configured_min = learned["configured_min_delay"]
+        configured_max = learned["configured_max_delay"]
+        min_delay = float(learned.get("min_delay", configured_min))
+        cutoff_rate = learned.get("cutoff_rate")
+        false_interruption_rate = learned.get("false_interruption_rate")
+        baseline_cutoff_rate = learned.get("baseline_cutoff_rate")
+        baseline_false_interruption_rate = learned.get("baseline_false_interruption_rate")
+
+        a = self.config.smoothing
+        if cutoff_rate is None or false_interruption_rate is None:
+            cutoff_rate = window_cutoff_rate
+            false_interruption_rate = window_false_interruption_rate
+        else:
+            cutoff_rate = (1 - a) * cutoff_rate + a * window_cutoff_rate
+            false_interruption_rate = (1 - a) * false_interruption_rate + a * window_false_interruption_rate
+
+        set_fields: Dict[str, Any] = {}
+        inc_fields: Dict[str, float] = {
+            "window_turns": -turns,
+            "window_cutoffs": -cutoffs,
+            "window_false_interruptions": -false_interruptions,
+            "window_transcription_delay": -transcription_total,
+            "window_epoch": 1,
+        }
+
+        previous = min_delay
+        if baseline_cutoff_rate is None or baseline_false_interruption_rate is None:
+            # The first windows set the bar; they run with the configured delays
+            inc_fields.update(baseline_turns=turns, baseline_cutoffs=cutoffs, baseline_false_interruptions=false_interruptions)
+            baseline_turns = learned.get("baseline_turns", 0) + turns
+            if baseline_turns >= self.config.baseline_windows * self.config.window_turns:
+                set_fields["baseline_cutoff_rate"] = round((learned.get("baseline_cutoffs", 0) + cutoffs) / baseline_turns, 4)
+                set_fields["baseline_false_interruption_rate"] = round(
+                    (learned.get("baseline_false_interruptions", 0) + false_interruptions) / baseline_turns, 4
+                )
+                cutoff_rate = set_fields["baseline_cutoff_rate"]
+                false_interruption_rate = set_fields["baseline_false_interruption_rate"]
+            reason = "baseline"
+        elif (
+            cutoff_rate > baseline_cutoff_rate + self.config.tolerance
+            or false_interruption_rate > baseline_false_interruption_rate + self.config.tolerance
+        ):
+            min_delay = min(configured_min, min_delay + self.config.step_up_seconds)
+            reason = "interruptions_up"
+        else:
+            # Waiting less than the STT needs for a final transcript saves nothing
+            floor = min(configured_min, max(self.config.floor_seconds, transcription_mean))
+            min_delay = max(floor, min_delay - self.config.step_down_seconds)
+            reason = "within_baseline"
+
+        min_delay = round(min_delay, 3)
+        # Keep the configured gap between the two delays
+        max_delay = round(max(min_delay, configured_max - (configured_min - min_delay)), 3)
+        set_fields.update({
+            "min_delay": min_delay,
+            "max_delay": max_delay,
+            "cutoff_rate": round(cutoff_rate, 4),
+            "false_interruption_rate": round(false_interruption_rate, 4),
+            "updated_at": datetime.datetime.utcnow(),
+        })
+
+        eou_log = ""
+        if eou_delays:
+            eou_log = f" | eou_p50={statistics.median(eou_delays):.3f}s | eou_p90={_percentile(eou_delays, 0.9):.3f}s"
+        set_gauge(f"endpointing.{assistant_id}.min_delay_ms", round(min_delay * 1000, 1))
+        logger.info(
+            f"ENDPOINTING_WINDOW | assistant_id={assistant_id} | turns={turns} | cutoff_rate={window_cutoff_rate:.3f} | "
+            f"false_interruption_rate={window_false_interruption_rate:.3f}{eou_log} | "
+            f"min_delay={previous:.3f}->{min_delay:.3f}s | reason={reason}"
+        )
+        return set_fields, inc_fields
+
+    # -------- session wiring
+
+    def observe_session(self, session, config: Dict[str, Any]) -> None:
+        """Feed a session's EOU metrics, user speech and false interruptions into the controller."""
+        if not self.config.enabled or not config.get("id"):
+            return
+        committed_at: List[Optional[float]] = [None]
+
+        def on_metrics(event) -> None:
+            metrics = getattr(event, "metrics", None)
+            if getattr(metrics, "type", None) != "eou_metrics":
+                return
+            committed_at[0] = time.monotonic()
+            self.record_turn(config, metrics.end_of_utterance_delay, metrics.transcription_delay)
+
+        def on_user_state(event) -> None:
+            if event.new_state != "speaking" or committed_at[0] is None:
+                return
+            if time.monotonic() - committed_at[0] <= self.config.cutoff_window_seconds:
+                self.record_cutoff(config)
+            committed_at[0] = None
+
+        def on_false_interruption(event) -> None:
+            self.record_false_interruption(config)
+
+        session.on("metrics_collected", on_metrics)
+        session.on("user_state_changed", on_user_state)
+        session.on("agent_false_interruption", on_false_interruption)
+
+
+def _configured_delays(config: Dict[str, Any]) -> Tuple[float, float]:
+    min_delay = float(config.get("voice_on_punctuation_seconds", DEFAULT_MIN_DELAY))
+    max_delay = float(config.get("voice_on_no_punctuation_seconds", DEFAULT_MAX_DELAY))
+    return min_delay, max(min_delay, max_delay)
+
+
+def _fresh_learned(configured_min: float, configured_max: float) -> Dict[str, Any]:
+    """Learned state before any turn: the configured delays and zeroed counters."""
+    learned: Dict[str, Any] = {
+        "configured_min_delay": configured_min,
+        "configured_max_delay": configured_max,
+        "min_delay": configured_min,
+        "max_delay": configured_max,
+        "turns": 0,
+        "window_epoch": 0,
+    }
+    learned.update({name: 0 for name in WINDOW_COUNTERS})
+    return learned
+
+
+def _learned_delays(learned: Dict[str, Any]) -> Tuple[float, float]:
+    min_delay = float(learned.get("min_delay", learned["configured_min_delay"]))
+    return min_delay, max(min_delay, float(learned.get("max_delay", learned["configured_max_delay"])))
+
+
+def _add_counts(target: Dict[str, Any], counts: Dict[str, float]) -> None:
+    for name, value in counts.items():
+        target[name] = target.get(name, 0) + value
+
+
+def _apply(learned: Dict[str, Any], set_fields: Dict[str, Any], inc_fields: Dict[str, float]) -> None:
+    """Apply a window close to a local copy, like the $set/$inc does on the saved one."""
+    learned.update(set_fields)
+    _add_counts(learned, inc_fields)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# Global endpointing controller
+_endpointing_controller: Optional[EndpointingController] = None
+
+
+def get_endpointing_controller(store=None) -> EndpointingController:
+    """Get the global endpointing controller."""
+    global _endpointing_controller
+    if _endpointing_controller is None:
+        _endpointing_controller = EndpointingController(store)
+    return _endpointing_controller
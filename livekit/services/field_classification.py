@@ -0,0 +1,293 @@
+"""
+Persisted cache of structured data field classifications.
+
+Whether a field is asked from the caller or extracted after the call is decided
+by an LLM (agent_factory.classify_fields_with_llm) and depends only on
+the fields themselves. Results are keyed by a hash of each field's name,
+description, type and askTiming and stored in memory and in the
+``field_classifications`` collection. They are computed when an assistant is
+saved (assistant change listener) or, on a cache miss, in the background while
+the call proceeds with the fallback classification, so call setup never waits
+on the LLM. The fallback is the one used without an API key: fields with an
+explicit askTiming are asked, the rest extracted after the call.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import datetime
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+from integrations.assistant_cache import get_assistant_cache
+from utils.latency_logger import increment_counter, observe
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+try:
+    from pymongo.errors import DuplicateKeyError
+except ImportError:
+    DuplicateKeyError = None
+
+logger = logging.getLogger(__name__)
+
+FIELD_CLASSIFICATIONS_COLLECTION = "field_classifications"
+# Field attributes the classification depends on
+KEY_ATTRIBUTES = ("name", "description", "type", "askTiming")
+# askTiming values that make a field asked without consulting the LLM
+EXPLICIT_ASK_TIMINGS = ("start", "middle", "end")
+
+
+@dataclass
+class FieldClassificationConfig:
+    """Field classification cache configuration settings."""
+    enabled: bool = True
+    max_entries: int = 1000
+    lookup_timeout_seconds: float = 0.5
+    claim_seconds: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "FieldClassificationConfig":
+        return cls(
+            enabled=os.getenv("FIELD_CLASSIFICATION_CACHE_ENABLED", "true").lower() == "true",
+            max_entries=int(os.getenv("FIELD_CLASSIFICATION_CACHE_MAX_ENTRIES", "1000")),
+            lookup_timeout_seconds=float(os.getenv("FIELD_CLASSIFICATION_LOOKUP_TIMEOUT_SECONDS", "0.5")),
+            claim_seconds=float(os.getenv("FIELD_CLASSIFICATION_CLAIM_SECONDS", "60")),
+        )
+
+
+def fields_key(structured_data: List[Dict[str, Any]]) -> str:
+    """Hash of the classification-relevant attributes of a field list."""
+    fields = sorted(
+        ([str(field.get(attr) or "") for attr in KEY_ATTRIBUTES] for field in structured_data),
+    )
+    return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()
+
+
+def fallback_classification(structured_data: List[Dict[str, Any]]) -> Dict[str, list]:
+    """Classification used until the LLM result is available: ask explicit fields, extract the rest."""
+    classification: Dict[str, list] = {"ask_user": [], "extract_from_conversation": []}
+    for field in structured_data:
+        bucket = "ask_user" if field.get("askTiming", "none") in EXPLICIT_ASK_TIMINGS else "extract_from_conversation"
+        classification[bucket].append(field.get("name", ""))
+    return classification
+
+
+class FieldClassificationCache:
+    """Memory + MongoDB cache of field classifications, filled in the background."""
+
+    def __init__(
+        self,
+        db_client,
+        classifier: Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, list]]],
+        config: Optional[FieldClassificationConfig] = None,
+    ):
+        self.db_client = db_client
+        # A plain function, not bound to whoever created the cache; raises on
+        # failure so that fallbacks are never stored
+        self.classifier = classifier
+        self.config = config or FieldClassificationConfig.from_env()
+        self._entries: "OrderedDict[str, Dict[str, list]]" = OrderedDict()
+        self._classifying: Dict[str, asyncio.Task] = {}
+        get_assistant_cache().add_invalidation_listener(self._on_assistant_changed)
+
+    def _collection(self):
+        if self.db_client is None or not self.db_client.is_available():
+            return None
+        return self.db_client.db[FIELD_CLASSIFICATIONS_COLLECTION]
+
+    # -------- lookups
+
+    async def classify(self, structured_data: List[Dict[str, Any]]) -> Dict[str, list]:
+        """
+        Classification for a call: the cached result, or the fallback while it is computed.
+
+        Args:
+            structured_data: The assistant's structured data fields
+
+        Returns:
+            {"ask_user": [...], "extract_from_conversation": [...]}
+        """
+        if not self.config.enabled:
+            return await self.classifier(structured_data)
+
+        key = fields_key(structured_data)
+        classification = await self.lookup(key)
+        if classification is not None:
+            return classification
+
+        increment_counter("field_classification.misses")
+        self.schedule(structured_data)
+        logger.info(f"FIELD_CLASSIFICATION_PENDING | key={key[:12]} | fields={len(structured_data)} | using fallback")
+        return fallback_classification(structured_data)
+
+    async def lookup(self, key: str) -> Optional[Dict[str, list]]:
+        """Cached classification for a fields key, from memory or MongoDB."""
+        classification = self._entries.get(key)
+        if classification is not None:
+            self._entries.move_to_end(key)
+            increment_counter("field_classification.memory_hits")
+            return classification
+
+        collection = self._collection()
+        if collection is None:
+            return None
+        start = time.perf_counter()
+        try:
+            doc = await asyncio.wait_for(
+                collection.find_one({"_id": key, "status": "done"}, {"classification": 1}),
+                timeout=self.config.lookup_timeout_seconds,
+            )
+        except Exception as e:
+            logger.warning(f"FIELD_CLASSIFICATION_LOOKUP_FAILED | key={key[:12]} | error={str(e) or type(e).__name__}")
+            return None
+        finally:
+            observe("field_classification.lookup_ms", (time.perf_counter() - start) * 1000)
+
+        if not doc or not doc.get("classification"):
+            return None
+        increment_counter("field_classification.db_hits")
+        self._remember(key, doc["classification"])
+        return doc["classification"]
+
+    def _remember(self, key: str, classification: Dict[str, list]) -> None:
+        self._entries[key] = classification
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.max_entries:
+            self._entries.popitem(last=False)
+
+    # -------- background classification
+
+    def schedule(self, structured_data: List[Dict[str, Any]]) -> Optional[asyncio.Task]:
+        """Classify a field list in the background unless that is already under way."""
+        key = fields_key(structured_data)
+        task = self._classifying.get(key)
+        if task is not None and not task.done():
+            return task
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        task = loop.create_task(self._classify_and_store(key, list(structured_data)))
+        task.add_done_callback(lambda _: self._classifying.pop(key, None))
+        self._classifying[key] = task
+        return task
+
+    async def _classify_and_store(self, key: str, structured_data: List[Dict[str, Any]]) -> None:
+        if await self.lookup(key) is not None:
+            return
+        if not await self._claim(key):
+            # Another worker is classifying the same fields
+            return
+
+        start = time.perf_counter()
+        try:
+            classification = await self.classifier(structured_data)
+        except Exception as e:
+            increment_counter("field_classification.failures")
+            logger.error(f"FIELD_CLASSIFICATION_FAILED | key={key[:12]} | error={str(e) or type(e).__name__}")
+            await self._release(key)
+            return
+        duration_ms = (time.perf_counter() - start) * 1000
+        observe("field_classification.llm_ms", duration_ms)
+
+        self._remember(key, classification)
+        collection = self._collection()
+        if collection is not None:
+            try:
+                await collection.update_one(
+                    {"_id": key},
+                    {"$set": {
+                        "status": "done",
+                        "classification": classification,
+                        "fields": [field.get("name", "") for field in structured_data],
+                        "created_at": datetime.datetime.utcnow(),
+                    }, "$unset": {"claimed_at": ""}},
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.warning(f"FIELD_CLASSIFICATION_STORE_FAILED | key={key[:12]} | error={str(e)}")
+        logger.info(f"FIELD_CLASSIFICATION_STORED | key={key[:12]} | fields={len(structured_data)} | llm_ms={duration_ms:.1f}")
+
+    async def _claim(self, key: str) -> bool:
+        """Mark a key as being classified; False if another worker holds a live claim."""
+        collection = self._collection()
+        if collection is None:
+            return True
+        now = datetime.datetime.utcnow()
+        expired = now - datetime.timedelta(seconds=self.config.claim_seconds)
+        try:
+            # Matches a missing doc (upsert) or an expired claim; anything else collides on _id
+            await collection.update_one(
+                {"_id": key, "status": {"$ne": "done"}, "claimed_at": {"$not": {"$gt": expired}}},
+                {"$set": {"status": "pending", "claimed_at": now}},
+                upsert=True,
+            )
+            return True
+        except Exception as e:
+            if DuplicateKeyError is not None and isinstance(e, DuplicateKeyError):
+                return False
+            # Without a claim every worker would call the LLM; the next call retries
+            logger.warning(f"FIELD_CLASSIFICATION_CLAIM_FAILED | key={key[:12]} | error={str(e)}")
+            return False
+
+    async def _release(self, key: str) -> None:
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await collection.delete_one({"_id": key, "status": "pending"})
+        except Exception:
+            pass
+
+    # -------- assistant changes
+
+    def _on_assistant_changed(self, assistant_id: str, reason: str) -> None:
+        if not self.config.enabled or reason == "delete":
+            return
+        try:
+            asyncio.get_running_loop().create_task(self._warm_assistant(assistant_id))
+        except RuntimeError:
+            pass
+
+    async def _warm_assistant(self, assistant_id: str) -> None:
+        """Classify a saved assistant's fields before its next call needs them."""
+        if self.db_client is None or not self.db_client.is_available():
+            return
+        if ObjectId is None or not ObjectId.is_valid(assistant_id):
+            return
+        try:
+            doc = await self.db_client.db["assistants"].find_one(
+                {"_id": ObjectId(assistant_id)},
+                {"analysisSettings.structuredData": 1},
+            )
+        except Exception as e:
+            logger.warning(f"FIELD_CLASSIFICATION_WARM_FAILED | assistant_id={assistant_id} | error={str(e)}")
+            return
+        structured_data = ((doc or {}).get("analysisSettings") or {}).get("structuredData") or []
+        if needs_classification(structured_data):
+            self.schedule(structured_data)
+
+
+def needs_classification(structured_data: List[Dict[str, Any]]) -> bool:
+    """Whether any field is left for the LLM (no explicit askTiming)."""
+    return any(field.get("askTiming", "none") not in EXPLICIT_ASK_TIMINGS for field in structured_data or [])
+
+
+# Global field classification cache
+_field_classification_cache: Optional[FieldClassificationCache] = None
+
+
+def get_field_classification_cache(db_client, classifier) -> FieldClassificationCache:
+    """Get the global field classification cache."""
+    global _field_classification_cache
+    if _field_classification_cache is None:
+        _field_classification_cache = FieldClassificationCache(db_client, classifier)
+    return _field_classification_cache
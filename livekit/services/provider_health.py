@@ -0,0 +1,223 @@
+"""
+Rolling health scores for LLM/TTS/STT providers.
+
+Every provider instance reports its own latency (LLM TTFT, TTS TTFB, STT
+request duration) and errors through its 'metrics_collected' and 'error'
+events. They are folded into per-(kind, provider) moving averages, and a
+provider is degraded while its latency is over budget or its error rate is
+too high. Provider chains are ordered with these scores when a session is
+built. Samples older than PROVIDER_HEALTH_STALE_SECONDS are dropped, so a
+provider that was routed around is tried again once its bad samples expire.
+"""
+
+import os
+import time
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Tuple, Any
+
+from utils.latency_logger import increment_counter, set_gauge
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderHealthConfig:
+    """Provider health configuration settings."""
+    enabled: bool = True
+    fallback_enabled: bool = True
+    alpha: float = 0.2
+    min_samples: int = 3
+    max_error_rate: float = 0.3
+    stale_seconds: float = 300.0
+    llm_ttft_budget_seconds: float = 1.5
+    tts_ttfb_budget_seconds: float = 1.0
+    stt_budget_seconds: float = 1.5
+
+    @classmethod
+    def from_env(cls) -> "ProviderHealthConfig":
+        return cls(
+            enabled=os.getenv("PROVIDER_HEALTH_ENABLED", "true").lower() == "true",
+            fallback_enabled=os.getenv("PROVIDER_FALLBACK_ENABLED", "true").lower() == "true",
+            alpha=float(os.getenv("PROVIDER_HEALTH_ALPHA", "0.2")),
+            min_samples=int(os.getenv("PROVIDER_HEALTH_MIN_SAMPLES", "3")),
+            max_error_rate=float(os.getenv("PROVIDER_HEALTH_MAX_ERROR_RATE", "0.3")),
+            stale_seconds=float(os.getenv("PROVIDER_HEALTH_STALE_SECONDS", "300")),
+            llm_ttft_budget_seconds=float(os.getenv("PROVIDER_HEALTH_LLM_TTFT_BUDGET_SECONDS", "1.5")),
+            tts_ttfb_budget_seconds=float(os.getenv("PROVIDER_HEALTH_TTS_TTFB_BUDGET_SECONDS", "1.0")),
+            stt_budget_seconds=float(os.getenv("PROVIDER_HEALTH_STT_BUDGET_SECONDS", "1.5")),
+        )
+
+    def latency_budget(self, kind: str) -> float:
+        return {
+            "llm": self.llm_ttft_budget_seconds,
+            "tts": self.tts_ttfb_budget_seconds,
+            "stt": self.stt_budget_seconds,
+        }.get(kind, self.llm_ttft_budget_seconds)
+
+
+@dataclass
+class _ProviderStats:
+    latency_ewma: Optional[float] = None
+    error_rate: float = 0.0
+    samples: int = 0
+    updated_at: float = 0.0
+
+
+class ProviderHealth:
+    """Tracks provider latency and errors and orders provider chains by health."""
+
+    def __init__(self, config: Optional[ProviderHealthConfig] = None):
+        self.config = config or ProviderHealthConfig.from_env()
+        self._stats: Dict[Tuple[str, str], _ProviderStats] = {}
+        # Weak, so a finished call's instances drop out and a reused id() is never mistaken for them
+        self._watched: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+    # -------- recording
+
+    def watch(self, kind: str, provider: str, instance: Any) -> None:
+        """Feed an LLM/TTS/STT instance's own metrics and errors into its provider's score."""
+        if not self.config.enabled or not hasattr(instance, "on"):
+            return
+        try:
+            if instance in self._watched:
+                return
+            self._watched.add(instance)
+        except TypeError:
+            # Not weak-referenceable; flag the instance itself
+            if getattr(instance, "_provider_health_watched", False):
+                return
+            setattr(instance, "_provider_health_watched", True)
+
+        def on_metrics(metrics) -> None:
+            latency = _metric_latency(kind, metrics)
+            if latency is not None:
+                self.record_latency(kind, provider, latency)
+
+        def on_error(error) -> None:
+            self.record_error(kind, provider, error)
+
+        instance.on("metrics_collected", on_metrics)
+        instance.on("error", on_error)
+
+    def record_latency(self, kind: str, provider: str, seconds: float) -> None:
+        """Record a successful request and its latency."""
+        stats = self._fresh_stats(kind, provider)
+        a = self.config.alpha
+        stats.latency_ewma = seconds if stats.latency_ewma is None else (1 - a) * stats.latency_ewma + a * seconds
+        stats.error_rate = (1 - a) * stats.error_rate
+        stats.samples += 1
+        stats.updated_at = time.monotonic()
+        set_gauge(f"provider_health.{kind}.{provider}.latency_ms", round(stats.latency_ewma * 1000, 1))
+
+    def record_error(self, kind: str, provider: str, error: Any = None) -> None:
+        """Record a failed request."""
+        stats = self._fresh_stats(kind, provider)
+        a = self.config.alpha
+        stats.error_rate = (1 - a) * stats.error_rate + a
+        stats.samples += 1
+        stats.updated_at = time.monotonic()
+        increment_counter(f"provider_health.{kind}.errors")
+        set_gauge(f"provider_health.{kind}.{provider}.error_rate", round(stats.error_rate, 3))
+        logger.warning(f"PROVIDER_ERROR | kind={kind} | provider={provider} | error_rate={stats.error_rate:.2f} | error={str(getattr(error, 'error', error))[:200]}")
+
+    def _fresh_stats(self, kind: str, provider: str) -> _ProviderStats:
+        stats = self._stats.get((kind, provider))
+        if stats is None or time.monotonic() - stats.updated_at > self.config.stale_seconds:
+            # Old samples say little about the provider now; start over
+            stats = _ProviderStats()
+            self._stats[(kind, provider)] = stats
+        return stats
+
+    def _current(self, kind: str, provider: str) -> Optional[_ProviderStats]:
+        stats = self._stats.get((kind, provider))
+        if stats is None or time.monotonic() - stats.updated_at > self.config.stale_seconds:
+            return None
+        return stats
+
+    # -------- scoring
+
+    def chain(self, kind: str, primary: str, fallbacks: Tuple[str, ...] = ("OpenAI",)) -> List[str]:
+        """Provider chain for a new session: the configured provider, then fallbacks, ordered by health."""
+        chain = [primary]
+        if self.config.fallback_enabled:
+            chain.extend(p for p in fallbacks if p != primary)
+        ordered = self.order(kind, chain)
+        logger.info(f"PROVIDER_CHAIN | kind={kind} | chain={'>'.join(ordered)}")
+        return ordered
+
+    def degraded(self, kind: str, provider: str) -> bool:
+        """Whether the provider is over its latency budget or error rate."""
+        stats = self._current(kind, provider)
+        if stats is None or stats.samples < self.config.min_samples:
+            return False
+        if stats.error_rate > self.config.max_error_rate:
+            return True
+        return stats.latency_ewma is not None and stats.latency_ewma > self.config.latency_budget(kind)
+
+    def score(self, kind: str, provider: str) -> float:
+        """Expected latency in seconds, penalized by errors (lower is better)."""
+        stats = self._current(kind, provider)
+        budget = self.config.latency_budget(kind)
+        if stats is None or stats.samples < self.config.min_samples:
+            # Unknown providers count as meeting the budget
+            return budget
+        latency = stats.latency_ewma if stats.latency_ewma is not None else budget
+        return latency * (1 + 4 * stats.error_rate)
+
+    def order(self, kind: str, chain: List[str]) -> List[str]:
+        """
+        Order a provider chain for a new session.
+
+        The configured primary stays first unless it is degraded, in which case
+        the healthiest provider of the chain is moved in front of it.
+        """
+        if not self.config.enabled or len(chain) < 2 or not self.degraded(kind, chain[0]):
+            return list(chain)
+
+        healthy = [p for p in chain if not self.degraded(kind, p)]
+        best = min(healthy or chain, key=lambda p: self.score(kind, p))
+        ordered = [best] + [p for p in chain if p != best]
+        if best != chain[0]:
+            increment_counter(f"provider_health.{kind}.reroutes")
+        scores = ",".join(f"{p}={self.score(kind, p):.2f}" for p in chain)
+        logger.warning(f"PROVIDER_ROUTING | kind={kind} | primary={chain[0]} | selected={best} | reason=primary_degraded | scores={scores}")
+        return ordered
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current scores, for logging and debugging."""
+        return {
+            f"{kind}.{provider}": {
+                "latency_ms": round(stats.latency_ewma * 1000, 1) if stats.latency_ewma is not None else None,
+                "error_rate": round(stats.error_rate, 3),
+                "samples": stats.samples,
+                "degraded": self.degraded(kind, provider),
+            }
+            for (kind, provider), stats in self._stats.items()
+        }
+
+
+def _metric_latency(kind: str, metrics: Any) -> Optional[float]:
+    if kind == "llm":
+        value = getattr(metrics, "ttft", None)
+    elif kind == "tts":
+        value = getattr(metrics, "ttfb", None)
+    else:
+        # Streaming STT reports no per-request duration
+        value = getattr(metrics, "duration", None) or None
+    if value is None or value < 0:
+        return None
+    return float(value)
+
+
+# Global provider health tracker
+_provider_health: Optional[ProviderHealth] = None
+
+
+def get_provider_health() -> ProviderHealth:
+    """Get the global provider health tracker."""
+    global _provider_health
+    if _provider_health is None:
+        _provider_health = ProviderHealth()
+    return _provider_health
@@ -0,0 +1,158 @@
+"""
+Process-level pool of the transports behind LLM/TTS/STT plugins.
+
+Plugin instances emit per-stream events (metrics_collected, error) to every
+listener, and each session subscribes to its own models, so instances are
+built per call and closed with it. What is expensive to rebuild - the HTTP
+session or API client with its warm TCP/TLS connections - is stateless and
+pooled here instead: one transport per key (e.g. ("http", "Cartesia")), leased
+by every call using that provider. Transports that no call has used for a
+while are closed.
+"""
+
+import os
+import time
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, Tuple
+
+from utils.latency_logger import increment_counter, set_gauge
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[Any, ...]
+
+
+@dataclass
+class ProviderPoolConfig:
+    """Provider pool configuration settings."""
+    enabled: bool = True
+    idle_ttl_seconds: float = 600.0
+    reap_interval_seconds: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "ProviderPoolConfig":
+        return cls(
+            enabled=os.getenv("PROVIDER_POOL_ENABLED", "true").lower() == "true",
+            idle_ttl_seconds=float(os.getenv("PROVIDER_POOL_IDLE_TTL_SECONDS", "600")),
+            reap_interval_seconds=float(os.getenv("PROVIDER_POOL_REAP_INTERVAL_SECONDS", "60")),
+        )
+
+
+@dataclass
+class _PoolEntry:
+    instance: Any
+    leases: int
+    last_used: float
+
+
+class ProviderPool:
+    """Shares provider transports between the calls of a job process."""
+
+    def __init__(self, config: Optional[ProviderPoolConfig] = None):
+        self.config = config or ProviderPoolConfig.from_env()
+        self._entries: Dict[PoolKey, _PoolEntry] = {}
+        self._reaper_task: Optional[asyncio.Task] = None
+
+    def acquire(self, key: PoolKey, factory: Callable[[], Any]) -> Any:
+        """
+        Get the transport for key, creating it on first use.
+
+        Every acquire must be paired with a release(key) when the session ends.
+        """
+        if not self.config.enabled:
+            return factory()
+
+        entry = self._entries.get(key)
+        if entry is None:
+            increment_counter("provider_pool.misses")
+            entry = _PoolEntry(instance=factory(), leases=0, last_used=time.monotonic())
+            self._entries[key] = entry
+            set_gauge("provider_pool.size", len(self._entries))
+        else:
+            increment_counter("provider_pool.hits")
+            logger.info(f"PROVIDER_POOL_HIT | key={_format_key(key)}")
+
+        entry.leases += 1
+        entry.last_used = time.monotonic()
+        self._ensure_reaper()
+        return entry.instance
+
+    def release(self, key: PoolKey) -> None:
+        """Return a lease taken with acquire()."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.leases = max(entry.leases - 1, 0)
+        entry.last_used = time.monotonic()
+
+    # -------- idle eviction
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper_task is not None and not self._reaper_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._reaper_task = loop.create_task(self._reap_idle())
+
+    async def _reap_idle(self) -> None:
+        while self._entries:
+            await asyncio.sleep(self.config.reap_interval_seconds)
+            await self.evict_idle()
+
+    async def evict_idle(self) -> int:
+        """Close transports without leases that have been idle longer than the TTL."""
+        now = time.monotonic()
+        idle = [
+            key for key, entry in self._entries.items()
+            if entry.leases == 0 and now - entry.last_used > self.config.idle_ttl_seconds
+        ]
+        for key in idle:
+            entry = self._entries.pop(key)
+            await close_instance(entry.instance, _format_key(key))
+            increment_counter("provider_pool.evictions")
+            logger.info(f"PROVIDER_POOL_EVICTED | key={_format_key(key)}")
+        set_gauge("provider_pool.size", len(self._entries))
+        return len(idle)
+
+    async def aclose(self) -> None:
+        """Close every pooled transport."""
+        if self._reaper_task is not None:
+            self._reaper_task.cancel()
+        entries, self._entries = self._entries, {}
+        for key, entry in entries.items():
+            await close_instance(entry.instance, _format_key(key))
+        set_gauge("provider_pool.size", 0)
+
+
+async def close_instance(instance: Any, label: str) -> None:
+    """Close a plugin instance or transport (aclose() or close()); failures are logged."""
+    close = getattr(instance, "aclose", None) or getattr(instance, "close", None)
+    if not callable(close):
+        return
+    try:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        logger.warning(f"PROVIDER_CLOSE_FAILED | instance={label} | error={str(e)}")
+
+
+def _format_key(key: PoolKey) -> str:
+    return ":".join(str(part) for part in key if part is not None)
+
+
+# Global provider pool
+_provider_pool: Optional[ProviderPool] = None
+
+
+def get_provider_pool() -> ProviderPool:
+    """Get the global provider pool."""
+    global _provider_pool
+    if _provider_pool is None:
+        _provider_pool = ProviderPool()
+    return _provider_pool
@@ -0,0 +1,107 @@
+"""
+Lazy registry of LiveKit provider plugins.
+
+Plugin packages (and the SDKs they pull in) are imported the first time an
+assistant config asks for them instead of when the worker module is loaded, so
+new worker processes start faster. LiveKit registers plugins on import and
+requires that to happen on the main thread; the job entrypoint and prewarm both
+run there.
+"""
+
+import time
+import logging
+import importlib
+import threading
+from types import ModuleType
+from typing import Optional, Dict, List
+
+from utils.latency_logger import increment_counter, observe
+
+logger = logging.getLogger(__name__)
+
+# Registry name -> plugin module
+PLUGIN_MODULES: Dict[str, str] = {
+    "openai": "livekit.plugins.openai",
+    "silero": "livekit.plugins.silero",
+    "deepgram": "livekit.plugins.deepgram",
+    "cartesia": "livekit.plugins.cartesia",
+    "groq": "livekit.plugins.groq",
+}
+
+# Provider names used in assistant configs -> plugin serving them
+PROVIDER_PLUGINS: Dict[str, str] = {
+    "OpenAI": "openai",
+    "Cerebras": "openai",  # OpenAI-compatible endpoint
+    "Groq": "groq",
+    "Deepgram": "deepgram",
+    "Cartesia": "cartesia",
+}
+
+_loaded: Dict[str, ModuleType] = {}
+_unavailable: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def load_plugin(name: str) -> Optional[ModuleType]:
+    """
+    Import a plugin on first use.
+
+    Args:
+        name: Registry name (e.g. "deepgram")
+
+    Returns:
+        The plugin module, or None if it is not installed
+    """
+    module = _loaded.get(name)
+    if module is not None:
+        return module
+    if name in _unavailable:
+        return None
+
+    module_name = PLUGIN_MODULES.get(name)
+    if module_name is None:
+        raise KeyError(f"unknown provider plugin: {name}")
+
+    with _lock:
+        module = _loaded.get(name)
+        if module is not None:
+            return module
+
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            # Logged once; later lookups return None without retrying the import
+            _unavailable[name] = str(e)
+            logger.warning(f"PLUGIN_UNAVAILABLE | plugin={name} | error={str(e)}")
+            return None
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        observe(f"plugin_import.{name}_ms", duration_ms)
+        increment_counter("plugin_import.loaded")
+        logger.info(f"PLUGIN_LOADED | plugin={name} | import_ms={duration_ms:.1f}")
+        _loaded[name] = module
+        return module
+
+
+def plugin_available(name: str) -> bool:
+    """Whether a plugin can be imported (imports it if needed)."""
+    return load_plugin(name) is not None
+
+
+def load_provider(provider: str) -> Optional[ModuleType]:
+    """Load the plugin serving a provider name from an assistant config."""
+    name = PROVIDER_PLUGINS.get(provider)
+    if name is None:
+        return None
+    return load_plugin(name)
+
+
+def loaded_plugins() -> List[str]:
+    """Names of the plugins imported so far."""
+    return sorted(_loaded)
+
+
+def load_all_plugins() -> List[str]:
+    """Import every known plugin (e.g. for the 'download-files' CLI command)."""
+    return [name for name in PLUGIN_MODULES if load_plugin(name) is not None]
@@ -0,0 +1,140 @@
+"""
+Pre-session quota gate backed by a per-user cache of remaining minutes.
+
+The cache is filled from DatabaseClient.check_minutes_available, decremented
+locally as calls end, and refreshed in the background once it is older than the
+TTL, so checking a call's quota usually costs no Mongo round trip. A denial is
+always confirmed against the database before a call is rejected.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+
+from utils.latency_logger import increment_counter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QuotaGateConfig:
+    """Quota gate configuration settings."""
+    enabled: bool = True
+    ttl_seconds: float = 60.0
+    max_stale_seconds: float = 600.0
+
+    @classmethod
+    def from_env(cls) -> "QuotaGateConfig":
+        return cls(
+            enabled=os.getenv("QUOTA_GATE_ENABLED", "true").lower() == "true",
+            ttl_seconds=float(os.getenv("QUOTA_CACHE_TTL_SECONDS", "60")),
+            max_stale_seconds=float(os.getenv("QUOTA_CACHE_MAX_STALE_SECONDS", "600")),
+        )
+
+
+@dataclass
+class _QuotaEntry:
+    remaining_minutes: Optional[float]  # None = unlimited
+    is_active: bool
+    fetched_at: float
+
+    @property
+    def available(self) -> bool:
+        if not self.is_active:
+            return False
+        return self.remaining_minutes is None or self.remaining_minutes > 0
+
+
+class QuotaGate:
+    """Decides whether a user may start a call without a round trip in the common case."""
+
+    def __init__(self, db_client, config: Optional[QuotaGateConfig] = None):
+        self.db_client = db_client
+        self.config = config or QuotaGateConfig.from_env()
+        self._entries: Dict[str, _QuotaEntry] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def check(self, user_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Check whether the user has minutes left.
+
+        Returns:
+            {"allowed": bool, "remaining_minutes": float|None, "source": "cache"|"database"|...}
+        """
+        if not self.config.enabled or not user_id or self.db_client is None:
+            return {"allowed": True, "remaining_minutes": None, "source": "disabled"}
+
+        entry = self._entries.get(user_id)
+        age = time.monotonic() - entry.fetched_at if entry else None
+
+        if entry is not None and age <= self.config.max_stale_seconds and entry.available:
+            increment_counter("quota_gate.cache_hits")
+            if age > self.config.ttl_seconds:
+                # Serve the cached allowance and refresh off the call path
+                self._refresh_in_background(user_id)
+            return {"allowed": True, "remaining_minutes": entry.remaining_minutes, "source": "cache"}
+
+        # Miss, too stale, or a cached denial that must be confirmed (e.g. after a top-up)
+        increment_counter("quota_gate.cache_misses")
+        entry = await self._refresh(user_id)
+        if entry is None:
+            # Fail open like check_minutes_available does
+            return {"allowed": True, "remaining_minutes": None, "source": "error"}
+        return {"allowed": entry.available, "remaining_minutes": entry.remaining_minutes, "source": "database"}
+
+    def record_usage(self, user_id: Optional[str], minutes_deducted: float, deduction_result: Optional[Dict[str, Any]] = None) -> None:
+        """Update the cached balance after a call's minutes were deducted."""
+        entry = self._entries.get(user_id) if user_id else None
+        if entry is None:
+            return
+
+        if deduction_result and deduction_result.get("success"):
+            # The ledger returns authoritative totals; limit 0 means unlimited
+            if deduction_result.get("minutes_limit"):
+                entry.remaining_minutes = deduction_result.get("remaining_minutes", 0)
+            else:
+                entry.remaining_minutes = None
+            entry.fetched_at = time.monotonic()
+        elif entry.remaining_minutes is not None:
+            entry.remaining_minutes = max(0, entry.remaining_minutes - minutes_deducted)
+
+    def invalidate(self, user_id: str) -> None:
+        """Forget the cached balance of a user."""
+        self._entries.pop(user_id, None)
+
+    async def _refresh(self, user_id: str) -> Optional[_QuotaEntry]:
+        result = await self.db_client.check_minutes_available(user_id)
+        if result.get("error"):
+            logger.warning(f"QUOTA_CHECK_FAILED | user={user_id} | error={result.get('error')}")
+            return None
+
+        entry = _QuotaEntry(
+            remaining_minutes=None if result.get("unlimited") else result.get("remaining_minutes", 0),
+            is_active=result.get("is_active", True),
+            fetched_at=time.monotonic(),
+        )
+        self._entries[user_id] = entry
+        return entry
+
+    def _refresh_in_background(self, user_id: str) -> None:
+        task = self._refreshing.get(user_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.get_running_loop().create_task(self._refresh(user_id))
+        task.add_done_callback(lambda _: self._refreshing.pop(user_id, None))
+        self._refreshing[user_id] = task
+
+
+# Global quota gate
+_quota_gate: Optional[QuotaGate] = None
+
+
+def get_quota_gate(db_client) -> QuotaGate:
+    """Get the global quota gate."""
+    global _quota_gate
+    if _quota_gate is None:
+        _quota_gate = QuotaGate(db_client)
+    return _quota_gate
@@ -0,0 +1,174 @@
+"""
+Dependency-graph driven call setup.
+
+Call setup is a handful of steps (room connect, config resolution, quota check,
+session and agent creation, calendar and field classification lookups) of
+which many only depend on the job metadata. The pipeline starts every step as
+soon as the steps it depends on have finished, runs the whole graph under one
+deadline and records each step as a span on the call's LatencyProfiler.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+
+from utils.latency_logger import LatencyProfiler, increment_counter, observe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETUP_DEADLINE_SECONDS = 20.0
+
+
+class SetupAborted(Exception):
+    """Raised by a step to stop setup on purpose (no assistant, quota exceeded, ...)."""
+
+    def __init__(self, reason: str, hang_up: bool = False, log_prefix: str = "SETUP_ABORTED"):
+        super().__init__(reason)
+        self.reason = reason
+        # Whether the caller should be disconnected (e.g. rejected over-quota calls)
+        self.hang_up = hang_up
+        self.log_prefix = log_prefix
+
+
+class SetupFailed(Exception):
+    """A required step failed or the setup deadline passed."""
+
+    def __init__(self, step: str, error: BaseException):
+        super().__init__(f"setup step '{step}' failed: {error}")
+        self.step = step
+        self.error = error
+
+
+@dataclass
+class SetupStep:
+    """One node of the setup graph."""
+    name: str
+    fn: Callable[[Dict[str, Any]], Awaitable[Any]]
+    deps: Tuple[str, ...] = ()
+    # Optional steps fall back to 'default' instead of failing the call
+    required: bool = True
+    default: Any = None
+
+
+class SetupPipeline:
+    """Runs setup steps concurrently in dependency order under a single deadline."""
+
+    def __init__(self, call_id: str, profiler: Optional[LatencyProfiler] = None, deadline_seconds: Optional[float] = None):
+        self.call_id = call_id
+        self.profiler = profiler
+        if deadline_seconds is None:
+            deadline_seconds = float(os.getenv("CALL_SETUP_DEADLINE_SECONDS", str(DEFAULT_SETUP_DEADLINE_SECONDS)))
+        self.deadline_seconds = deadline_seconds
+        self.steps: Dict[str, SetupStep] = {}
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[[Dict[str, Any]], Awaitable[Any]],
+        deps: Tuple[str, ...] = (),
+        required: bool = True,
+        default: Any = None,
+    ) -> "SetupPipeline":
+        """
+        Add a step.
+
+        Args:
+            name: Step name, also the key of its result
+            fn: Coroutine function called with the results of the steps so far
+            deps: Names of the steps that must finish first
+            required: Whether a failure of this step fails the whole setup
+            default: Result used when an optional step fails
+        """
+        if name in self.steps:
+            raise ValueError(f"duplicate setup step: {name}")
+        self.steps[name] = SetupStep(name=name, fn=fn, deps=tuple(deps), required=required, default=default)
+        return self
+
+    def _check_graph(self) -> None:
+        for step in self.steps.values():
+            for dep in step.deps:
+                if dep not in self.steps:
+                    raise ValueError(f"setup step '{step.name}' depends on unknown step '{dep}'")
+
+        # Depth-first search for cycles
+        state: Dict[str, int] = {}
+
+        def visit(name: str) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"setup steps form a cycle through '{name}'")
+            state[name] = 1
+            for dep in self.steps[name].deps:
+                visit(dep)
+            state[name] = 2
+
+        for name in self.steps:
+            visit(name)
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run every step.
+
+        Returns:
+            {step name: result}
+
+        Raises:
+            SetupAborted: A step stopped the setup
+            SetupFailed: A required step raised, or the deadline passed
+        """
+        self._check_graph()
+        results: Dict[str, Any] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        start = time.perf_counter()
+
+        async def run_step(step: SetupStep) -> Any:
+            if step.deps:
+                await asyncio.gather(*(tasks[dep] for dep in step.deps))
+            step_start = time.time()
+            try:
+                result = await step.fn(results)
+            except (SetupAborted, asyncio.CancelledError):
+                raise
+            except Exception as e:
+                self._record(step.name, step_start, {"error": str(e)})
+                if step.required:
+                    raise SetupFailed(step.name, e) from e
+                increment_counter("call_setup.optional_step_failures")
+                logger.warning(f"SETUP_STEP_FAILED | call_id={self.call_id} | step={step.name} | error={str(e)} | using default")
+                result = step.default
+            else:
+                self._record(step.name, step_start)
+            results[step.name] = result
+            return result
+
+        for step in self.steps.values():
+            tasks[step.name] = asyncio.ensure_future(run_step(step))
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks.values()), timeout=self.deadline_seconds)
+        except asyncio.TimeoutError:
+            pending = sorted(name for name in tasks if name not in results)
+            increment_counter("call_setup.deadline_exceeded")
+            logger.error(f"SETUP_DEADLINE_EXCEEDED | call_id={self.call_id} | deadline={self.deadline_seconds}s | pending={','.join(pending)}")
+            raise SetupFailed(pending[0] if pending else "deadline", asyncio.TimeoutError(f"setup exceeded {self.deadline_seconds}s"))
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+            # Collect the outcome of cancelled siblings so none is left unretrieved
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        total_ms = (time.perf_counter() - start) * 1000
+        observe("call_setup.total_ms", total_ms)
+        logger.info(f"SETUP_COMPLETE | call_id={self.call_id} | total_ms={total_ms:.1f} | steps={len(self.steps)}")
+        return results
+
+    def _record(self, name: str, step_start: float, metadata: Optional[Dict[str, Any]] = None) -> None:
+        step_end = time.time()
+        observe(f"call_setup.{name}_ms", (step_end - step_start) * 1000)
+        if self.profiler is not None:
+            self.profiler.span(name, step_start, step_end, metadata)
@@ -7,7 +7,6 @@ import os
 import re
 from dataclasses import dataclass
 from typing import Optional
-import httpx
 from zoneinfo import ZoneInfo
 
 from livekit import api
@@ -16,6 +15,7 @@ from livekit.agents.llm import ChatContext, ChatMessage
 from livekit.protocol.sip import TransferSIPParticipantRequest
 
 from services.call_outcome_service import CallOutcomeService
+from services.workflow_runtime import WorkflowRuntime
 from integrations.calendar_api import Calendar, SlotUnavailableError
 from utils.latency_logger import measure_latency_context
 
@@ -161,27 +161,8 @@ class UnifiedAgent(Agent):
         instructions: str, 
         calendar: Optional[Calendar] = None,
         company_id: Optional[str] = None,
-        prewarmed_llm: Optional[object] = None,
-        prewarmed_tts: Optional[object] = None,
-        prewarmed_vad: Optional[object] = None
     ) -> None:
-        # Use pre-warmed components if available, otherwise use defaults
-        if prewarmed_llm and prewarmed_vad and prewarmed_tts:
-            super().__init__(instructions=instructions, llm=prewarmed_llm, vad=prewarmed_vad, tts=prewarmed_tts)
-        elif prewarmed_llm and prewarmed_vad:
-            super().__init__(instructions=instructions, llm=prewarmed_llm, vad=prewarmed_vad)
-        elif prewarmed_llm and prewarmed_tts:
-            super().__init__(instructions=instructions, llm=prewarmed_llm, tts=prewarmed_tts)
-        elif prewarmed_vad and prewarmed_tts:
-            super().__init__(instructions=instructions, vad=prewarmed_vad, tts=prewarmed_tts)
-        elif prewarmed_llm:
-            super().__init__(instructions=instructions, llm=prewarmed_llm)
-        elif prewarmed_vad:
-            super().__init__(instructions=instructions, vad=prewarmed_vad)
-        elif prewarmed_tts:
-            super().__init__(instructions=instructions, tts=prewarmed_tts)
-        else:
-            super().__init__(instructions=instructions)
+        super().__init__(instructions=instructions)
         
         self.calendar = calendar
         self.company_id = company_id
@@ -210,6 +191,10 @@ class UnifiedAgent(Agent):
         }
         self._transfer_requested = False
         self._room_name = None  # Store room name for transfer operations
+
+        # Workflow state machine (set via set_workflow when the assistant has one)
+        self._workflow: Optional[WorkflowRuntime] = None
+        self._workflow_base_instructions = instructions
         
         # Pre-compiled regexes for performance
         self._email_regex = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", re.I)
@@ -1085,6 +1070,8 @@ class UnifiedAgent(Agent):
             backend_url = os.getenv("BACKEND_URL", "http://localhost:4000")
             booking_endpoint = f"{backend_url}/api/v1/bookings"
             
+            import httpx
+
             async with httpx.AsyncClient(timeout=10.0) as client:
                 response = await client.post(
                     booking_endpoint,
@@ -1213,6 +1200,30 @@ class UnifiedAgent(Agent):
         logging.info("ANALYSIS_FIELDS_SET | count=%d | fields=%s", 
                     len(fields), [f.get('name', 'unnamed') for f in fields])
 
+    async def set_workflow(self, runtime: WorkflowRuntime, base_instructions: str) -> None:
+        """Run the assistant's workflow; base_instructions are the instructions without the state block."""
+        self._workflow = runtime
+        self._workflow_base_instructions = base_instructions
+        # Only agents with a workflow get the transition tool
+        await self.update_tools(self.tools + [self._transition_to_state_tool()])
+        logging.info("WORKFLOW_SET | states=%d | start=%s", len(runtime.workflow), runtime.current_id)
+
+    def _transition_to_state_tool(self):
+        @function_tool(name="transition_to_state")
+        async def transition_to_state(ctx: RunContext, state_id: str) -> str:
+            """Move the conversation to another workflow state when a transition condition of the current state is met.
+            
+            Args:
+                state_id: The id of the target state, as listed in the current state's TRANSITIONS.
+            """
+            changed, message = self._workflow.transition(state_id)
+            if changed:
+                # Only the trailing state block changes; the rest of the prompt stays cached
+                await self.update_instructions(self._workflow.instructions(self._workflow_base_instructions))
+            return message
+
+        return transition_to_state
+
     @function_tool(name="start_new_booking")
     async def start_new_booking(self, ctx: RunContext, dummy: Optional[str] = None) -> str:
         """Start a new booking process, clearing previous state.
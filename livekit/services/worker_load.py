@@ -0,0 +1,315 @@
+"""
+Worker load reporting for LiveKit dispatch.
+
+LiveKit stops sending jobs to a worker whose reported load is at or above
+WorkerOptions.load_threshold. The default load is the host CPU only, so a
+worker keeps accepting calls while its job processes' event loops are already
+lagging behind their audio. WorkerLoad combines:
+
+- active jobs relative to WORKER_MAX_JOBS (0 by default: not part of the load)
+- event-loop lag of the job processes, relative to WORKER_LOOP_LAG_BUDGET_MS
+- CPU usage, and RSS of the worker's process tree relative to WORKER_MAX_RSS_MB
+
+and reports the highest of them. Each job runs in its own process, so job
+processes measure their own loop lag (LoopLagMonitor) and leave it, with their
+metrics snapshot, in a small file in WORKER_LOAD_DIR for the worker process to
+read. The directory defaults to one per worker process (its pid), exported to
+the job processes it starts, so workers sharing a host do not read each
+other's jobs. The worker process also serves the current load on a local HTTP
+endpoint (WORKER_METRICS_PORT); /metrics lists the worker process's own
+metrics and each running job process's separately.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List
+
+from utils.latency_logger import set_gauge, get_metrics_snapshot
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+LAG_SUFFIX = ".lag"
+LAG_DIR_ENV = "WORKER_LOAD_DIR"
+
+
+def _default_lag_dir() -> str:
+    """Per worker process; job processes inherit it through LAG_DIR_ENV."""
+    return os.path.join(tempfile.gettempdir(), "livekit_worker_load", str(os.getpid()))
+
+
+@dataclass
+class WorkerLoadConfig:
+    """Worker load configuration settings."""
+    load_threshold: float = 0.75
+    max_jobs: int = 0  # 0 = job count is not part of the load
+    loop_lag_budget_ms: float = 200.0
+    max_rss_mb: float = 0.0  # 0 = RSS is not part of the load
+    lag_dir: str = field(default_factory=_default_lag_dir)
+    lag_interval_seconds: float = 0.25
+    report_interval_seconds: float = 1.0
+    report_stale_seconds: float = 5.0
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 8082  # 0 = no metrics endpoint
+
+    @classmethod
+    def from_env(cls) -> "WorkerLoadConfig":
+        return cls(
+            load_threshold=float(os.getenv("WORKER_LOAD_THRESHOLD", "0.75")),
+            max_jobs=int(os.getenv("WORKER_MAX_JOBS", "0")),
+            loop_lag_budget_ms=float(os.getenv("WORKER_LOOP_LAG_BUDGET_MS", "200")),
+            max_rss_mb=float(os.getenv("WORKER_MAX_RSS_MB", "0")),
+            lag_dir=os.getenv(LAG_DIR_ENV) or _default_lag_dir(),
+            lag_interval_seconds=float(os.getenv("WORKER_LOOP_LAG_INTERVAL_SECONDS", "0.25")),
+            report_interval_seconds=float(os.getenv("WORKER_LOAD_REPORT_INTERVAL_SECONDS", "1.0")),
+            report_stale_seconds=float(os.getenv("WORKER_LOAD_REPORT_STALE_SECONDS", "5.0")),
+            metrics_host=os.getenv("WORKER_METRICS_HOST", "127.0.0.1"),
+            metrics_port=int(os.getenv("WORKER_METRICS_PORT", "8082")),
+        )
+
+
+class LoopLagMonitor:
+    """Measures how late the running event loop wakes up; runs in job processes."""
+
+    def __init__(self, config: Optional[WorkerLoadConfig] = None):
+        self.config = config or WorkerLoadConfig.from_env()
+        self.lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._path = os.path.join(self.config.lag_dir, f"{os.getpid()}{LAG_SUFFIX}")
+
+    def ensure_started(self) -> None:
+        """Start measuring on the running loop if not already started."""
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        interval = self.config.lag_interval_seconds
+        samples_per_report = max(1, round(self.config.report_interval_seconds / interval))
+        window: List[float] = []
+        try:
+            while True:
+                start = time.perf_counter()
+                await asyncio.sleep(interval)
+                window.append(max(0.0, (time.perf_counter() - start - interval) * 1000))
+                if len(window) >= samples_per_report:
+                    # Worst wake-up of the period: audio glitches on the spikes, not the average
+                    self.lag_ms = max(window)
+                    window.clear()
+                    set_gauge("worker_load.loop_lag_ms", round(self.lag_ms, 1))
+                    await asyncio.to_thread(self._write_report)
+        finally:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+
+    def _write_report(self) -> None:
+        try:
+            os.makedirs(self.config.lag_dir, exist_ok=True)
+            tmp_path = f"{self._path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"loop_lag_ms": round(self.lag_ms, 1), "metrics": get_metrics_snapshot()}, f, default=str)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.debug(f"LOOP_LAG_REPORT_FAILED | error={str(e)}")
+
+
+class WorkerLoad:
+    """WorkerOptions.load_fnc: combined load of the worker in [0, 1]."""
+
+    def __init__(self, config: Optional[WorkerLoadConfig] = None):
+        self.config = config or WorkerLoadConfig.from_env()
+        self.last: Dict[str, Any] = {"load": 0.0}
+        self._overloaded = False
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._server_started = False
+        self._lock = threading.Lock()
+        # Job processes started by this worker report into its directory
+        os.environ[LAG_DIR_ENV] = self.config.lag_dir
+
+    def __call__(self, worker=None) -> float:
+        # Called by the worker from a thread pool every few seconds
+        self.ensure_metrics_server()
+        components = {
+            "loop_lag": self._loop_lag_ms() / max(1.0, self.config.loop_lag_budget_ms),
+            "cpu": self._cpu(),
+        }
+        if self.config.max_jobs > 0:
+            components["jobs"] = self._active_jobs(worker) / self.config.max_jobs
+        rss_mb = self._rss_mb()
+        if self.config.max_rss_mb > 0 and rss_mb is not None:
+            components["rss"] = rss_mb / self.config.max_rss_mb
+
+        load = min(1.0, max(components.values()))
+        overloaded = load >= self.config.load_threshold
+        with self._lock:
+            self.last = {
+                "load": round(load, 3),
+                "threshold": self.config.load_threshold,
+                "accepting_jobs": not overloaded,
+                "active_jobs": self._active_jobs(worker),
+                "loop_lag_ms": round(self._loop_lag_ms(), 1),
+                "rss_mb": round(rss_mb, 1) if rss_mb is not None else None,
+                "components": {name: round(value, 3) for name, value in components.items()},
+                "updated_at": time.time(),
+            }
+        set_gauge("worker_load.load", round(load, 3))
+
+        if overloaded != self._overloaded:
+            self._overloaded = overloaded
+            parts = " | ".join(f"{name}={value:.2f}" for name, value in components.items())
+            if overloaded:
+                logger.warning(f"WORKER_LOAD_HIGH | load={load:.2f} | threshold={self.config.load_threshold} | {parts}")
+            else:
+                logger.info(f"WORKER_LOAD_OK | load={load:.2f} | threshold={self.config.load_threshold} | {parts}")
+        return load
+
+    # -------- components
+
+    def _active_jobs(self, worker) -> int:
+        jobs = getattr(worker, "active_jobs", None)
+        if jobs is not None:
+            return len(jobs)
+        # Without the worker, every job process reporting lag is a running job
+        return len(self._lag_reports())
+
+    def _loop_lag_ms(self) -> float:
+        return max((report.get("loop_lag_ms", 0.0) for report in self._lag_reports().values()), default=0.0)
+
+    def _lag_reports(self) -> Dict[str, Dict[str, Any]]:
+        """Latest report of each running job process, by pid."""
+        reports: Dict[str, Dict[str, Any]] = {}
+        now = time.time()
+        try:
+            names = os.listdir(self.config.lag_dir)
+        except FileNotFoundError:
+            return reports
+        for name in names:
+            if not name.endswith(LAG_SUFFIX):
+                continue
+            path = os.path.join(self.config.lag_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.config.report_stale_seconds:
+                    # Left behind by a job process that was killed
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    reports[name[:-len(LAG_SUFFIX)]] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return reports
+
+    def _cpu(self) -> float:
+        if psutil is not None:
+            # Since the previous call; the first call returns 0
+            return psutil.cpu_percent(interval=None) / 100
+        try:
+            return os.getloadavg()[0] / (os.cpu_count() or 1)
+        except OSError:
+            return 0.0
+
+    def _rss_mb(self) -> Optional[float]:
+        if psutil is None:
+            return None
+        try:
+            process = psutil.Process()
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for p in processes:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    # -------- metrics endpoint
+
+    def ensure_metrics_server(self) -> None:
+        """Serve the current load on http://WORKER_METRICS_HOST:WORKER_METRICS_PORT/ once per process."""
+        if self._server_started or self.config.metrics_port <= 0:
+            return
+        self._server_started = True
+        handler = _metrics_handler(self)
+        try:
+            self._server = ThreadingHTTPServer((self.config.metrics_host, self.config.metrics_port), handler)
+        except OSError as e:
+            logger.warning(f"WORKER_METRICS_SERVER_FAILED | port={self.config.metrics_port} | error={str(e)}")
+            return
+        thread = threading.Thread(target=self._server.serve_forever, name="worker-metrics", daemon=True)
+        thread.start()
+        logger.info(f"WORKER_METRICS_SERVER_STARTED | address=http://{self.config.metrics_host}:{self.config.metrics_port}/load")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.last)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics of the worker process and of each running job process; calls count in the latter."""
+        return {
+            "load": self.snapshot(),
+            "worker_process": get_metrics_snapshot(),
+            "job_processes": {pid: report.get("metrics", {}) for pid, report in self._lag_reports().items()},
+        }
+
+
+def _metrics_handler(worker_load: WorkerLoad):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path in ("/", "/load"):
+                body = worker_load.snapshot()
+            elif self.path == "/metrics":
+                body = worker_load.metrics()
+            else:
+                self.send_error(404)
+                return
+            payload = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            # Scraped every few seconds; keep it out of the worker logs
+            pass
+
+    return MetricsHandler
+
+
+# Global instances (one per process)
+_worker_load: Optional[WorkerLoad] = None
+_loop_lag_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_worker_load() -> WorkerLoad:
+    """Get the worker process's load function."""
+    global _worker_load
+    if _worker_load is None:
+        _worker_load = WorkerLoad()
+    return _worker_load
+
+
+def get_loop_lag_monitor() -> LoopLagMonitor:
+    """Get the loop lag monitor of this job process."""
+    global _loop_lag_monitor
+    if _loop_lag_monitor is None:
+        _loop_lag_monitor = LoopLagMonitor()
+    return _loop_lag_monitor
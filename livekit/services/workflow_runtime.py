@@ -0,0 +1,182 @@
+"""
+Workflow state machine runtime.
+
+build_workflow_instructions() flattens the whole React Flow graph (every state,
+prompt and transition) into the system prompt, so each turn pays for states the
+call never reaches. Here the graph is compiled once per assistant version into
+an explicit state machine (CompiledWorkflow, held by the AssistantProfile) and
+each call tracks its current state (WorkflowRuntime). The instructions carry a
+short static description of the runtime plus only the current state's block:
+its instruction, data action and outgoing transitions. The agent moves between
+states with the transition_to_state tool, which validates the edge and swaps
+the state block, so per-turn prompt size no longer grows with the graph.
+
+The state block is appended after the per-call context, keeping the static
+prefix byte-identical across calls and turns. Set WORKFLOW_RUNTIME_ENABLED=false
+to fall back to the flattened graph.
+"""
+
+import os
+import time
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Mapping, Tuple
+
+from utils.instruction_builder import parse_workflow_nodes
+from utils.latency_logger import increment_counter
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW_RUNTIME_INSTRUCTIONS = """CONVERSATION WORKFLOW (STATE MACHINE):
+You MUST strictly follow a conversation flow. You are always in exactly ONE state at a time; only the CURRENT WORKFLOW STATE section at the end of these instructions applies.
+- Act according to the current state's instructions.
+- Monitor the user's input for the current state's TRANSITIONS.
+- When a transition condition is met, call transition_to_state(state_id=...) with the target state id BEFORE responding, then follow the new state's instructions.
+- Do NOT move to a state that is not listed as a transition of the current state."""
+
+CURRENT_STATE_HEADER = "CURRENT WORKFLOW STATE:"
+
+
+def workflow_runtime_enabled() -> bool:
+    """Whether workflows run as a state machine instead of being flattened into the prompt."""
+    return os.getenv("WORKFLOW_RUNTIME_ENABLED", "true").lower() == "true"
+
+
+@dataclass(frozen=True)
+class WorkflowTransition:
+    """An outgoing edge of a workflow state."""
+    condition: str
+    to: str
+    target_title: str
+
+
+@dataclass(frozen=True)
+class WorkflowState:
+    """A workflow node with its outgoing transitions."""
+    id: str
+    type: str
+    title: str
+    input_prompt: str
+    first_dialogue: str
+    question: str
+    field_name: str
+    transitions: Tuple[WorkflowTransition, ...]
+
+    def render(self) -> str:
+        """This state's block, in the wording of build_workflow_instructions()."""
+        node_type = self.type.upper()
+        lines = [f"[{self.id}] - {self.title}:"]
+
+        if node_type == "QUESTION":
+            lines.append(f"   - CORE INSTRUCTION: Ask the user \"{self.question}\"")
+            lines.append(f"   - DATA ACTION: When the user provides the {self.field_name}, you MUST call collect_analysis_data(field_name='{self.field_name}', field_value=USER_RESPONSE, field_type='string')")
+
+        if self.input_prompt:
+            lines.append(f"   - CORE INSTRUCTION: {self.input_prompt}")
+        if self.first_dialogue:
+            lines.append(f"   - ENTRY DIALOGUE (optional context): \"{self.first_dialogue}\"")
+
+        if self.transitions:
+            lines.append("   - TRANSITIONS (call transition_to_state when a condition is met):")
+            for trans in self.transitions:
+                lines.append(f"     * IF {trans.condition} -> transition_to_state(state_id='{trans.to}') ({trans.target_title})")
+        elif node_type in ["END", "TERMINATE"]:
+            lines.append("   - ACTION: POLITELY END THE CALL")
+        elif node_type == "TRANSFER":
+            lines.append("   - ACTION: Use the transfer_required() tool IMMEDIATELY to transfer the call to the configured department or agent.")
+
+        return "\n".join(lines)
+
+
+class CompiledWorkflow:
+    """An assistant's workflow graph compiled into states; immutable and shared by calls."""
+
+    def __init__(self, states: List[WorkflowState], start_id: str):
+        self.states: Mapping[str, WorkflowState] = MappingProxyType({state.id: state for state in states})
+        self.start_id = start_id
+        # Rendered up front; every turn of every call only picks one
+        self._blocks: Mapping[str, str] = MappingProxyType({
+            state.id: CURRENT_STATE_HEADER + "\n" + state.render() for state in states
+        })
+
+    def state_instructions(self, state_id: str) -> str:
+        """The CURRENT WORKFLOW STATE block for a state."""
+        return self._blocks.get(state_id, "")
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+
+def compile_workflow(config: Dict[str, Any]) -> Optional[CompiledWorkflow]:
+    """Compile an assistant's nodes/edges into a state machine; None without nodes."""
+    processed_nodes, start_node = parse_workflow_nodes(config)
+    if not processed_nodes or start_node is None:
+        return None
+
+    states = [
+        WorkflowState(
+            id=str(node["id"]),
+            type=node["type"] or "task",
+            title=str(node["title"]),
+            input_prompt=node["input_prompt"],
+            first_dialogue=node["first_dialogue"],
+            question=node["question"],
+            field_name=node["fieldName"],
+            transitions=tuple(
+                WorkflowTransition(condition=trans["condition"], to=str(trans["to"]), target_title=str(trans["target_title"]))
+                for trans in node["transitions"]
+            ),
+        )
+        for node in processed_nodes
+    ]
+    return CompiledWorkflow(states, start_id=str(start_node["id"]))
+
+
+class WorkflowRuntime:
+    """Per-call position in a compiled workflow."""
+
+    def __init__(self, workflow: CompiledWorkflow):
+        self.workflow = workflow
+        self.current_id = workflow.start_id
+        self.history: List[Tuple[str, float]] = [(workflow.start_id, time.time())]
+
+    @property
+    def current(self) -> WorkflowState:
+        return self.workflow.states[self.current_id]
+
+    def instructions(self, base_instructions: str) -> str:
+        """Full instructions for the current state: the call's instructions plus the state block."""
+        block = self.workflow.state_instructions(self.current_id)
+        if not block:
+            return base_instructions
+        return base_instructions + "\n\n" + block
+
+    def transition(self, state_id: str) -> Tuple[bool, str]:
+        """
+        Move to a state along an outgoing edge of the current state.
+
+        Args:
+            state_id: Target state id
+
+        Returns:
+            (whether the state changed, message for the LLM)
+        """
+        state_id = (state_id or "").strip().strip("[]'\"")
+        current = self.current
+        if state_id == current.id:
+            return False, f"Already in state '{state_id}'."
+
+        targets = {trans.to for trans in current.transitions}
+        if state_id not in targets:
+            increment_counter("workflow.invalid_transitions")
+            logger.warning(f"WORKFLOW_TRANSITION_REJECTED | from={current.id} | to={state_id} | allowed={sorted(targets)}")
+            if not targets:
+                return False, f"State '{current.id}' has no transitions; keep following its instructions."
+            return False, f"No transition from '{current.id}' to '{state_id}'. Allowed: {', '.join(sorted(targets))}."
+
+        self.current_id = state_id
+        self.history.append((state_id, time.time()))
+        increment_counter("workflow.transitions")
+        logger.info(f"WORKFLOW_TRANSITION | from={current.id} | to={state_id} | step={len(self.history) - 1}")
+        return True, f"Now in state '{state_id}' ({self.current.title}). Follow its instructions."
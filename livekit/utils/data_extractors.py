@@ -79,3 +79,13 @@ def extract_call_sid_from_metadata(ctx_metadata: dict) -> Optional[str]:
             break
     
     return call_sid
+
+
+def get_room_name(ctx) -> str:
+    """Room name; falls back to the job's room info before the room is connected."""
+    return ctx.room.name or ctx.job.room.name
+
+
+def get_room_metadata(ctx) -> str:
+    """Room metadata; falls back to the job's room info before the room is connected."""
+    return ctx.room.metadata or ctx.job.room.metadata
@@ -2,72 +2,92 @@
 Instruction building utilities for agent configuration.
 """
 
+import os
+import hashlib
 import logging
-from typing import Dict, Any, List
+import datetime
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from zoneinfo import ZoneInfo
 
 logger = logging.getLogger(__name__)
 
 
+DATA_COLLECTION_TOOLS_INSTRUCTIONS = "DATA COLLECTION TOOLS:\nYou have access to tools for collecting customer information. YOU MUST use these tools when the user provides this information or when you collect it:\n- set_name: Set the customer's name\n- set_email: Set the customer's email\n- set_phone: Set the customer's phone number\n- set_notes: Set notes or summary of the conversation"
 
-async def build_analysis_instructions(config: Dict[str, Any], classify_data_fields_func) -> str:
-    """Build analysis instructions based on assistant configuration."""
+EMAIL_COLLECTION_PROTOCOL = "EMAIL COLLECTION PROTOCOL:\nWhen collecting email addresses, follow this EXACT protocol to ensure accuracy:\n1. Ask the user to spell their email address LETTER BY LETTER\n2. Say EXACTLY: 'Please spell your email address letter by letter.'\n3. Do NOT add any justification, explanation, or conversational filler like 'it will help me with...' or 'so I can...'\n4. Listen carefully as they spell each letter\n5. For special characters, listen for:\n   - 'at' or 'at sign' or '@' for the @ symbol\n   - 'dot' or 'period' or '.' for periods\n   - 'underscore' or 'dash' or 'hyphen' for _ or -\n6. After receiving the spelled email, ALWAYS repeat it back to confirm: 'Let me confirm, your email is [email]? Is that correct?'\n7. Wait for confirmation before calling set_email\n8. If the user says it's incorrect, ask them to spell it again \n9. Only call set_email() after the user confirms the email is correct"
+
+BOOKING_INSTRUCTIONS = "BOOKING CAPABILITIES:\nYou can help users book appointments. You have access to the following booking tools:\n- list_slots_on_day: Show available appointment slots for a specific day (shows 10 slots by default - use max_options=20 to show more)\n- choose_slot: Select a time slot for the appointment (can use time like '7:00pm' or slot number from list)\n- finalize_booking: Complete the booking when ALL information is collected (time slot, name, email, phone)\n\nCRITICAL BOOKING RULES:\n- ONLY start booking if the user explicitly requests it (e.g., 'I want to book', 'schedule an appointment', 'book a time')\n- Do NOT automatically start booking just because you have contact information (phone, email, name)\n- Do NOT call list_slots_on_day or any booking tools unless the user explicitly asks to book or schedule an appointment\n- Do NOT call finalize_booking or confirm_details until you have: 1) selected time slot, 2) customer name, 3) email, and 4) phone number. Only call ONE of these functions, not both."
+
+BOOKING_UNAVAILABLE_INSTRUCTIONS = "BOOKING UNAVAILABLE:\nYou do NOT have access to a calendar or booking system. If the user asks to book an appointment or schedule a time, you must politely decline and explain that you don't have access to booking capabilities at the moment. You can offer to take their contact information (Name, Email, Phone) so someone can get back to them."
+
+
+def get_structured_data_fields(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Structured data fields of an assistant (top level or nested in analysisSettings)."""
+    return (config.get("analysisSettings") or {}).get("structuredData", []) or config.get("structured_data_fields", []) or []
+
+
+async def classify_structured_data(structured_data: List[Dict[str, Any]], classify_data_fields_func) -> Dict[str, list]:
+    """Classify fields into ask_user / extract_from_conversation, asking for all of them on failure."""
+    try:
+        return await classify_data_fields_func(structured_data)
+    except Exception as e:
+        logger.error(f"CLASSIFICATION_ERROR | error={str(e)}")
+        # Fallback to basic classification
+        return {
+            "ask_user": [field.get("name", "") for field in structured_data],
+            "extract_from_conversation": []
+        }
+
+
+def render_analysis_instructions(structured_data: List[Dict[str, Any]], classification: Dict[str, list]) -> str:
+    """Render the data collection / extraction instructions for a classification."""
     instructions = []
     
-    # Add structured data collection instructions
-    # Check both locations for structured data (top level and nested in analysisSettings)
-    structured_data = config.get("analysisSettings", {}).get("structuredData", []) or config.get("structured_data_fields", [])
+    # Create field lookup
+    field_map = {field.get("name", ""): field for field in structured_data}
     
-    # Handle case where structured_data is None
-    if structured_data is None:
-        structured_data = []
-        
-    logger.info(f"ANALYSIS_INSTRUCTIONS_DEBUG | structured_data_count={len(structured_data)} | data={structured_data}")
-    if structured_data:
-        # Use LLM to classify fields
-        try:
-            classification = await classify_data_fields_func(structured_data)
-        except Exception as e:
-            logger.error(f"CLASSIFICATION_ERROR | error={str(e)}")
-            # Fallback to basic classification
-            classification = {
-                "ask_user": [field.get("name", "") for field in structured_data],
-                "extract_from_conversation": []
-            }
-        
-        # Create field lookup
-        field_map = {field.get("name", ""): field for field in structured_data}
-        
-        # Build instructions for fields to ask
-        ask_fields = []
-        for field_name in classification.get("ask_user", []):
-            field = field_map.get(field_name)
-            if field:
-                ask_fields.append(f"- {field.get('name', '')}: {field.get('description', '')} (type: {field.get('type', 'string')})")
-        
-        if ask_fields:
-            instructions.append("DATA COLLECTION FIELDS:")
-            instructions.append("You have access to the collect_analysis_data(field_name, field_value, field_type) function.")
-            instructions.append("Use this tool to record the following information when it is provided or when you ask for it according to your main prompt:")
-            instructions.extend(ask_fields)
-            instructions.append("\nFollow your main instructions for the conversation flow regarding when to ask for these details.")
-        
-        # Build instructions for fields to extract
-        extract_fields = []
-        for field_name in classification.get("extract_from_conversation", []):
-            field = field_map.get(field_name)
-            if field:
-                extract_fields.append(f"- {field.get('name', '')}: {field.get('description', '')} (type: {field.get('type', 'string')})")
-        
-        if extract_fields:
-            instructions.append("\nAI-EXTRACTED FIELDS (DO NOT ASK DIRECTLY):")
-            instructions.append("The following fields will be automatically extracted from the conversation. You do not need to ask for these directly:")
-            instructions.extend(extract_fields)
+    # Build instructions for fields to ask
+    ask_fields = []
+    for field_name in classification.get("ask_user", []):
+        field = field_map.get(field_name)
+        if field:
+            ask_fields.append(f"- {field.get('name', '')}: {field.get('description', '')} (type: {field.get('type', 'string')})")
+    
+    if ask_fields:
+        instructions.append("DATA COLLECTION FIELDS:")
+        instructions.append("You have access to the collect_analysis_data(field_name, field_value, field_type) function.")
+        instructions.append("Use this tool to record the following information when it is provided or when you ask for it according to your main prompt:")
+        instructions.extend(ask_fields)
+        instructions.append("\nFollow your main instructions for the conversation flow regarding when to ask for these details.")
+    
+    # Build instructions for fields to extract
+    extract_fields = []
+    for field_name in classification.get("extract_from_conversation", []):
+        field = field_map.get(field_name)
+        if field:
+            extract_fields.append(f"- {field.get('name', '')}: {field.get('description', '')} (type: {field.get('type', 'string')})")
+    
+    if extract_fields:
+        instructions.append("\nAI-EXTRACTED FIELDS (DO NOT ASK DIRECTLY):")
+        instructions.append("The following fields will be automatically extracted from the conversation. You do not need to ask for these directly:")
+        instructions.extend(extract_fields)
     
     return "\n".join(instructions) if instructions else ""
 
 
-def build_call_management_instructions(config: Dict[str, Any]) -> str:
-    """Build call management instructions from configuration."""
+async def build_analysis_instructions(config: Dict[str, Any], classify_data_fields_func) -> str:
+    """Build analysis instructions based on assistant configuration."""
+    structured_data = get_structured_data_fields(config)
+    logger.info(f"ANALYSIS_INSTRUCTIONS_DEBUG | structured_data_count={len(structured_data)} | data={structured_data}")
+    if not structured_data:
+        return ""
+    classification = await classify_structured_data(structured_data, classify_data_fields_func)
+    return render_analysis_instructions(structured_data, classification)
+
+
+def build_call_management_instructions(config: Dict[str, Any], compact: bool = False) -> str:
+    """Build call management instructions from configuration (compact: without restated rules)."""
     instructions = []
     
     # End call message
@@ -91,7 +111,9 @@ def build_call_management_instructions(config: Dict[str, Any]) -> str:
     # Call duration limit
     max_call_duration = config.get("max_call_duration", 30)
     instructions.append(f"CALL_DURATION_LIMIT: This call will automatically end after {max_call_duration} minutes to prevent excessive charges")
-    instructions.append(f"CALL_MONITORING: Be aware that the system will automatically terminate this call after {max_call_duration} minutes")
+    if not compact:
+        # Restates CALL_DURATION_LIMIT
+        instructions.append(f"CALL_MONITORING: Be aware that the system will automatically terminate this call after {max_call_duration} minutes")
     
     # Call transfer (cold transfer only)
     transfer_enabled = config.get("transfer_enabled", False)
@@ -119,14 +141,79 @@ def build_call_management_instructions(config: Dict[str, Any]) -> str:
 
 
 
-def build_workflow_instructions(config: Dict[str, Any]) -> str:
-    """Build conversation flow instructions from visual nodes and edges."""
-    nodes = config.get("nodes", [])
-    edges = config.get("edges", [])
-    
-    if not nodes:
-        return ""
-    
+def instruction_compaction_enabled() -> bool:
+    """Whether compiled instructions drop rules that do not apply or are repeated."""
+    return os.getenv("INSTRUCTION_COMPACTION_ENABLED", "false").lower() == "true"
+
+
+def needs_email_protocol(config: Dict[str, Any]) -> bool:
+    """Whether the assistant can end up collecting an email address."""
+    if (config.get("dataCollectionSettings") or {}).get("collectEmail"):
+        return True
+    if config.get("cal_api_key") and config.get("cal_event_type_id"):
+        # Bookings require an email
+        return True
+    if "email" in (config.get("prompt") or "").lower():
+        return True
+    return any(
+        "email" in f"{field.get('name', '')} {field.get('description', '')}".lower()
+        for field in get_structured_data_fields(config)
+    )
+
+
+def build_data_collection_instructions(config: Dict[str, Any], compact: bool = False) -> str:
+    """Build the data collection tool rules; compact leaves out the email protocol when no email is collected."""
+    if compact and not needs_email_protocol(config):
+        return DATA_COLLECTION_TOOLS_INSTRUCTIONS
+    return DATA_COLLECTION_TOOLS_INSTRUCTIONS + "\n\n" + EMAIL_COLLECTION_PROTOCOL
+
+
+# Lines shorter than this (headers, list markers, short rules) are never deduplicated
+MIN_DEDUPE_LINE_CHARS = 40
+
+
+def compact_instruction_blocks(blocks: List[str]) -> List[str]:
+    """
+    Drop lines already stated by an earlier block (or earlier in the same block).
+
+    Lines are compared case- and whitespace-insensitively; the first occurrence
+    wins, so the assistant's own prompt keeps its wording. Blocks keep their
+    positions, emptied ones become "".
+    """
+    seen = set()
+    compacted = []
+    for block in blocks:
+        lines = []
+        for line in (block or "").split("\n"):
+            key = " ".join(line.split()).lower()
+            if len(key) >= MIN_DEDUPE_LINE_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            lines.append(line)
+        compacted.append("\n".join(lines).strip("\n") if any(line.strip() for line in lines) else "")
+    return compacted
+
+
+def build_first_message_instructions(config: Dict[str, Any]) -> str:
+    """Build the instruction pinning the opening greeting, if one is configured."""
+    first_message = config.get("first_message", "")
+    force_first = os.getenv("FORCE_FIRST_MESSAGE", "true").lower() != "false"
+    if force_first and first_message:
+        return f'IMPORTANT: Start the conversation by saying exactly: "{first_message}" Do not repeat or modify this greeting.'
+    return ""
+
+
+def parse_workflow_nodes(config: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Flatten React Flow nodes and edges into states with their outgoing transitions.
+
+    Returns:
+        (processed nodes in graph order, start node or None when there are no nodes)
+    """
+    nodes = config.get("nodes", []) or []
+    edges = config.get("edges", []) or []
+
     # Pre-process nodes into a more accessible format, handling React Flow 'data' nesting
     processed_nodes = []
     for node in nodes:
@@ -178,15 +265,24 @@ def build_workflow_instructions(config: Dict[str, Any]) -> str:
                 "target_title": node_map[target_id]["title"]
             })
 
-    instructions = ["\nCONVERSATION WORKFLOW (STATE MACHINE):"]
-    instructions.append("You MUST strictly follow this conversation flow. You are always in exactly ONE state at a time.")
-    
     # Identify the actual start node
     start_node = next((n for n in processed_nodes if n.get("is_start")), None)
     if not start_node and processed_nodes:
         # Fallback to the first node if no start node identified
         start_node = processed_nodes[0]
-        
+
+    return processed_nodes, start_node
+
+
+def build_workflow_instructions(config: Dict[str, Any]) -> str:
+    """Build conversation flow instructions from visual nodes and edges."""
+    processed_nodes, start_node = parse_workflow_nodes(config)
+    if not processed_nodes:
+        return ""
+
+    instructions = ["\nCONVERSATION WORKFLOW (STATE MACHINE):"]
+    instructions.append("You MUST strictly follow this conversation flow. You are always in exactly ONE state at a time.")
+    
     if start_node:
         instructions.append(f"\n1. START_STATE: You begin in state '[{start_node['id']}]' ({start_node['title']}).")
         if start_node['first_dialogue']:
@@ -235,6 +331,185 @@ def build_workflow_instructions(config: Dict[str, Any]) -> str:
     return "\n".join(instructions)
 
 
+def build_collection_requirements(config: Dict[str, Any]) -> str:
+    """Build the mandatory name/email/phone collection instruction from dataCollectionSettings."""
+    data_collection = config.get("dataCollectionSettings", {}) or {}
+    collection_prompts = []
+    
+    if data_collection.get("collectName"):
+        collection_prompts.append("You MUST ask for and collect the user's Name.")
+    
+    if data_collection.get("collectEmail"):
+        collection_prompts.append("You MUST ask for and collect the user's Email address.")
+        
+    if data_collection.get("collectPhone"):
+        collection_prompts.append("You MUST verify the user's Phone Number.")
+
+    if not collection_prompts:
+        return ""
+    return "CRITICAL: " + " ".join(collection_prompts) + " You cannot proceed with assistance until you have these details."
+
+
+def build_time_context(config: Dict[str, Any], now: Optional[datetime.datetime] = None) -> str:
+    """Build the current-time context used for booking, if a calendar is configured."""
+    if not (config.get("cal_api_key") and config.get("cal_event_type_id")):
+        return ""
+    tz_name = (config.get("cal_timezone") or "Asia/Karachi")
+    try:
+        tz = ZoneInfo(tz_name)
+    except Exception as e:
+        logger.warning(f"Invalid timezone '{tz_name}': {str(e)}, falling back to UTC")
+        tz_name = "UTC"
+        tz = ZoneInfo(tz_name)
+    now_local = now.astimezone(tz) if now is not None else datetime.datetime.now(tz)
+    return (
+        f"- Current local time: {now_local.isoformat()}\n"
+        f"- Timezone: {tz_name}\n"
+        f"- When the user says a date like '7th October', always interpret it as the next FUTURE occurrence in {tz_name}. "
+        f"Never call tools with past dates; if a parsed date is in the past year, bump it to the next year."
+    )
+
+
+def build_call_context_instructions(config: Dict[str, Any], now: Optional[datetime.datetime] = None) -> List[str]:
+    """
+    Build the per-call instruction blocks (campaign, collection requirements, caller, time).
+
+    Ordered from the most to the least widely shared, so calls of the same campaign
+    still share the longest possible prompt prefix.
+    """
+    call_context = config.get("call_context") or {}
+    blocks = []
+
+    campaign_prompt = call_context.get("campaign_prompt")
+    if campaign_prompt:
+        blocks.append(f"CAMPAIGN INSTRUCTIONS:\n{campaign_prompt}")
+
+    collection_requirements = build_collection_requirements(config)
+    if collection_requirements:
+        blocks.append(collection_requirements)
+
+    contact = call_context.get("contact")
+    if contact:
+        context_str = f"You are calling {contact.get('name') or 'the customer'}."
+        if contact.get("email"):
+            context_str += f" Their email is {contact['email']}."
+        blocks.append(f"CONTEXT: {context_str}")
+
+    time_context = build_time_context(config, now)
+    if time_context:
+        blocks.append(f"CONTEXT:\n{time_context}")
+
+    return blocks
+
+
+CALL_CONTEXT_HEADER = "CALL-SPECIFIC CONTEXT (applies to this call only):"
+
+
+def assemble_instructions(static_blocks: List[str], call_blocks: List[str]) -> str:
+    """
+    Join the instructions so that provider prompt-prefix caching works.
+
+    Args:
+        static_blocks: Per-assistant text; joined into a prefix that is byte-identical across calls
+        call_blocks: Per-call text (see build_call_context_instructions); always goes last
+
+    Returns:
+        The full instructions
+    """
+    prefix = "\n\n".join(block for block in static_blocks if block)
+    call_blocks = [block for block in call_blocks if block]
+    if not call_blocks:
+        return prefix
+    return prefix + "\n\n" + CALL_CONTEXT_HEADER + "\n" + "\n\n".join(call_blocks)
+
+
+MAX_RENDERED_PREFIXES = 8
+
+
+class InstructionTemplate:
+    """
+    An assistant's instructions compiled once, with slots for what varies.
+
+    The static blocks are joined at compile time; render() only fills the
+    analysis fields, the booking variant and the per-call context, and
+    returns the same output as assemble_instructions() for the same blocks.
+    Templates belong to a compiled AssistantProfile and are shared by all
+    concurrent calls of that assistant version.
+    """
+
+    def __init__(
+        self,
+        head_blocks: List[str],
+        tail_blocks: List[str],
+        booking: str,
+        booking_unavailable: str,
+        structured_data: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.structured_data = list(structured_data or [])
+        self._analysis: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], str] = {}
+        self._head = "\n\n".join(block for block in head_blocks if block)
+        self._tail = "\n\n".join(block for block in tail_blocks if block)
+        self._booking = booking
+        self._booking_unavailable = booking_unavailable
+        # (full static prefix, its short hash) by (analysis instructions, calendar available)
+        self._prefixes: Dict[Tuple[str, bool], Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def analysis_instructions(self, classification: Dict[str, list]) -> str:
+        """Analysis field instructions for a classification of this assistant's fields."""
+        key = (tuple(classification.get("ask_user", [])), tuple(classification.get("extract_from_conversation", [])))
+        rendered = self._analysis.get(key)
+        if rendered is None:
+            rendered = render_analysis_instructions(self.structured_data, classification)
+            with self._lock:
+                if len(self._analysis) >= MAX_RENDERED_PREFIXES:
+                    self._analysis.clear()
+                self._analysis[key] = rendered
+        return rendered
+
+    def prefix(self, analysis_instructions: str, calendar_available: bool) -> str:
+        """The byte-stable static part of the instructions."""
+        return self._prefix(analysis_instructions, calendar_available)[0]
+
+    def prefix_hash(self, analysis_instructions: str, calendar_available: bool) -> str:
+        """Short hash of the static part, for spotting prefix changes in the logs."""
+        return self._prefix(analysis_instructions, calendar_available)[1]
+
+    def _prefix(self, analysis_instructions: str, calendar_available: bool) -> Tuple[str, str]:
+        key = (analysis_instructions or "", bool(calendar_available))
+        entry = self._prefixes.get(key)
+        if entry is not None:
+            return entry
+
+        booking = self._booking if calendar_available else self._booking_unavailable
+        prefix = "\n\n".join(part for part in (self._head, key[0], self._tail, booking) if part)
+        entry = (prefix, hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:12])
+        with self._lock:
+            if len(self._prefixes) >= MAX_RENDERED_PREFIXES:
+                # Only changes when the field classification does; keep the newest
+                self._prefixes.clear()
+            self._prefixes[key] = entry
+        return entry
+
+    def render(self, analysis_instructions: str, calendar_available: bool, call_blocks: List[str]) -> str:
+        """
+        Fill the slots.
+
+        Args:
+            analysis_instructions: Rendered structured data field instructions
+            calendar_available: Whether booking tools are available to this call
+            call_blocks: Per-call blocks from build_call_context_instructions()
+
+        Returns:
+            The full instructions
+        """
+        prefix = self.prefix(analysis_instructions, calendar_available)
+        call_blocks = [block for block in call_blocks if block]
+        if not call_blocks:
+            return prefix
+        return prefix + "\n\n" + CALL_CONTEXT_HEADER + "\n" + "\n\n".join(call_blocks)
+
+
 def build_agent_instructions(config: Dict[str, Any]) -> str:
     """Build comprehensive agent instructions from configuration."""
     instructions = []
@@ -7,7 +7,7 @@ import time
 import logging
 import functools
 import asyncio
-from typing import Optional, Dict, Any, Callable, Union
+from typing import Optional, Dict, Any, Callable, Union, Tuple
 from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -412,6 +412,7 @@ class LatencyProfiler:
         self.operation = operation
         self.start_time = time.time()
         self.checkpoints: Dict[str, float] = {}
+        self.spans: Dict[str, Tuple[float, float]] = {}
         self.metadata: Dict[str, Any] = {}
     
     def checkpoint(self, name: str, metadata: Optional[Dict[str, Any]] = None):
@@ -420,6 +421,12 @@ class LatencyProfiler:
         if metadata:
             self.metadata[name] = metadata
     
+    def span(self, name: str, start: float, end: float, metadata: Optional[Dict[str, Any]] = None):
+        """Record a step with its own start and end (steps may overlap, unlike checkpoints)."""
+        self.spans[name] = (start, end)
+        if metadata:
+            self.metadata[name] = metadata
+
     def finish(self, success: bool = True, error: Optional[str] = None):
         """Finish profiling and log all measurements."""
         total_duration = (time.time() - self.start_time) * 1000
@@ -449,6 +456,16 @@ class LatencyProfiler:
             )
             
             prev_time = checkpoint_time
+
+        # Log spans with their offset from the start, so overlapping steps can be lined up
+        for span_name, (span_start, span_end) in self.spans.items():
+            log_latency_measurement(
+                operation=f"{self.operation}.{span_name}",
+                duration_ms=(span_end - span_start) * 1000,
+                call_id=self.call_id,
+                metadata={"offset_ms": round((span_start - self.start_time) * 1000, 1), **self.metadata.get(span_name, {})},
+                success=success
+            )
         
         # Log final segment
         if self.checkpoints:
@@ -461,3 +478,84 @@ class LatencyProfiler:
                 call_id=self.call_id,
                 success=success
             )
+
+
+# Process-wide counters (cache hits/misses, background worker stats, ...)
+_counters: Dict[str, float] = {}
+
+
+def increment_counter(name: str, value: float = 1) -> None:
+    """Increment a process-wide counter."""
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def get_counter(name: str) -> float:
+    """Get the current value of a process-wide counter."""
+    return _counters.get(name, 0)
+
+
+# Process-wide gauges (current values, e.g. connections in use)
+_gauges: Dict[str, float] = {}
+
+# Process-wide observations: name -> {"count", "sum", "max"}
+_observations: Dict[str, Dict[str, float]] = {}
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Set a process-wide gauge to its current value."""
+    _gauges[name] = value
+
+
+def adjust_gauge(name: str, delta: float) -> float:
+    """Add delta to a process-wide gauge and return the new value."""
+    _gauges[name] = _gauges.get(name, 0) + delta
+    return _gauges[name]
+
+
+def get_gauge(name: str) -> float:
+    """Get the current value of a process-wide gauge."""
+    return _gauges.get(name, 0)
+
+
+def observe(name: str, value: float) -> None:
+    """Record one observation (e.g. a duration in ms) for a process-wide summary."""
+    summary = _observations.get(name)
+    if summary is None:
+        summary = _observations[name] = {"count": 0, "sum": 0.0, "max": 0.0}
+    summary["count"] += 1
+    summary["sum"] += value
+    if value > summary["max"]:
+        summary["max"] = value
+
+
+def get_metrics_snapshot() -> Dict[str, Any]:
+    """Get a point-in-time copy of all process-wide metrics."""
+    return {
+        "counters": dict(_counters),
+        "gauges": dict(_gauges),
+        "observations": {
+            name: {**summary, "avg": summary["sum"] / summary["count"] if summary["count"] else 0.0}
+            for name, summary in _observations.items()
+        },
+    }
+
+
+def log_metrics_snapshot(prefix: Optional[str] = None) -> None:
+    """
+    Log process-wide metrics on a single line.
+    
+    Args:
+        prefix: Only log metrics whose name starts with this prefix
+    """
+    snapshot = get_metrics_snapshot()
+    values = {**snapshot["counters"], **snapshot["gauges"]}
+    for name, summary in snapshot["observations"].items():
+        values[f"{name}.avg"] = round(summary["avg"], 2)
+        values[f"{name}.max"] = round(summary["max"], 2)
+    parts = [
+        f"{name}={value:g}"
+        for name, value in sorted(values.items())
+        if not prefix or name.startswith(prefix)
+    ]
+    if parts:
+        logger.info("METRICS_SNAPSHOT | " + " | ".join(parts))
@@ -0,0 +1,149 @@
+"""
+Compressed, chunked transcript encoding for the 'calls' collection.
+
+A transcript is serialized as JSON lines, compressed as one stream (zstd when
+the 'zstandard' package is installed, zlib otherwise) and split into fixed-size
+chunks stored in a side collection. Decoding streams chunk by chunk, so
+transcript items can be yielded without holding the whole payload in memory.
+"""
+
+import os
+import json
+import zlib
+import logging
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator, Iterable
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_CHUNKS_COLLECTION = "call_transcript_chunks"
+DEFAULT_CHUNK_SIZE = 255 * 1024
+
+
+def default_codec() -> str:
+    """zstd if available, else zlib (overridable with CALL_TRANSCRIPT_CODEC)."""
+    codec = os.getenv("CALL_TRANSCRIPT_CODEC", "").lower()
+    if codec in ("zstd", "zlib"):
+        if codec == "zstd" and zstandard is None:
+            logger.warning("TRANSCRIPT_CODEC_UNAVAILABLE | codec=zstd | falling back to zlib")
+            return "zlib"
+        return codec
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _compressor(codec: str):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return zlib.compressobj(6)
+
+
+def _decompressor(codec: str):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("transcript was stored with zstd but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if codec == "zlib":
+        return zlib.decompressobj()
+    raise ValueError(f"unknown transcript codec: {codec}")
+
+
+def encode_transcript(
+    transcription: List[Dict[str, Any]],
+    codec: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple[List[bytes], Dict[str, Any]]:
+    """
+    Compress a transcript into fixed-size chunks.
+
+    Args:
+        transcription: List of {"role", "content"} items
+        codec: "zstd" or "zlib" (default_codec() if omitted)
+        chunk_size: Size of every chunk but the last, in bytes
+
+    Returns:
+        (chunks, summary) where summary is the compact description kept on the call document
+    """
+    codec = codec or default_codec()
+    compressor = _compressor(codec)
+
+    raw_bytes = 0
+    parts = []
+    for item in transcription:
+        line = (json.dumps(item, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        raw_bytes += len(line)
+        parts.append(compressor.compress(line))
+    parts.append(compressor.flush())
+    payload = b"".join(parts)
+
+    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)] or [b""]
+
+    roles: Dict[str, int] = {}
+    for item in transcription:
+        role = item.get("role", "unknown")
+        roles[role] = roles.get(role, 0) + 1
+
+    summary = {
+        "storage": "chunked",
+        "collection": TRANSCRIPT_CHUNKS_COLLECTION,
+        "codec": codec,
+        "chunks": len(chunks),
+        "chunk_size": chunk_size,
+        "items": len(transcription),
+        "turns_by_role": roles,
+        "raw_bytes": raw_bytes,
+        "stored_bytes": len(payload),
+        "preview": (transcription[0].get("content", "")[:200] if transcription else ""),
+    }
+    return chunks, summary
+
+
+class TranscriptStreamDecoder:
+    """Incrementally decompresses chunks and yields complete transcript items."""
+
+    def __init__(self, codec: str):
+        self._decompressor = _decompressor(codec)
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """Decode one chunk; returns the items completed by it."""
+        self._buffer += self._decompressor.decompress(bytes(chunk))
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return [json.loads(line) for line in lines if line]
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Decode whatever is left after the last chunk."""
+        tail = self._buffer
+        if hasattr(self._decompressor, "flush"):
+            tail += self._decompressor.flush()
+        self._buffer = b""
+        return [json.loads(line) for line in tail.split(b"\n") if line]
+
+
+def decode_transcript(chunks: Iterable[bytes], codec: str) -> List[Dict[str, Any]]:
+    """Rebuild a whole transcript from its chunks (in order)."""
+    decoder = TranscriptStreamDecoder(codec)
+    items = []
+    for chunk in chunks:
+        items.extend(decoder.feed(chunk))
+    items.extend(decoder.finish())
+    return items
+
+
+async def iter_transcript(chunk_docs: AsyncIterator[Dict[str, Any]], codec: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream transcript items from chunk documents sorted by 'n'.
+
+    Args:
+        chunk_docs: Async iterator of {"n", "data"} documents (e.g. a Motor cursor)
+        codec: Codec recorded in the call's transcript summary
+    """
+    decoder = TranscriptStreamDecoder(codec)
+    async for doc in chunk_docs:
+        for item in decoder.feed(doc["data"]):
+            yield item
+    for item in decoder.finish():
+        yield item